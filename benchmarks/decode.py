@@ -0,0 +1,78 @@
+from typing import Callable, List, Tuple, Optional, Any
+from time import perf_counter
+import tracemalloc
+import argparse
+import glob
+import json
+import os
+
+import msgspec
+
+from benchmarks.stub_server import StubConfig, match_details_payload, MATCH_ID_OFFSET
+from utils.payloads import MatchDetails
+
+
+def load_payloads(matches: int, payload_kb: int, recordings: Optional[str]) -> List[bytes]:
+    """
+    Returns the raw 'matchDetails' payloads: the recorded ones ('matchDetails_<id>.json') if a directory
+    is given, otherwise synthesized ones of the stand-in server.
+    """
+    if recordings:
+        payloads = []
+        for file_path in sorted(glob.glob(os.path.join(recordings, 'matchDetails_*.json')))[:matches]:
+            with open(file_path, 'rb') as file:
+                payloads.append(file.read())
+        return payloads
+
+    config = StubConfig(payload_kb=payload_kb)
+    return [json.dumps(match_details_payload(str(MATCH_ID_OFFSET + index), config)).encode()
+            for index in range(matches)]
+
+
+def decode_dicts(payload: bytes) -> Any:
+    return json.loads(payload)
+
+
+def decode_structs(payload: bytes) -> Any:
+    # The blocks of 'content' are decoded on access, both are read as 'FotmobDetails' does
+    details = msgspec.json.decode(payload, type=MatchDetails, strict=False)
+    if details.content:
+        details.content.match_facts()
+        details.content.lineup()
+    return details
+
+
+def measure(decode: Callable, payloads: List[bytes]) -> Tuple[float, float]:
+    """
+    Returns the time per match (in milliseconds) and the peak memory (in MB) of decoding one payload
+    at a time, as 'FotmobDetails' does.
+    """
+    started = perf_counter()
+    for payload in payloads:
+        decode(payload)
+    elapsed = perf_counter() - started
+
+    tracemalloc.start()
+    for payload in payloads:
+        decode(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / len(payloads) * 1000, peak / 1024 / 1024
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare decoding matchDetails into dictionaries and structs.')
+    parser.add_argument('--matches', type=int, default=200)
+    parser.add_argument('--payload-kb', type=int, default=150)
+    parser.add_argument('--recordings', default=None)
+    arguments = parser.parse_args()
+
+    raw_payloads = load_payloads(arguments.matches, arguments.payload_kb, arguments.recordings)
+    if not raw_payloads:
+        parser.error('No payloads to decode.')
+
+    size = sum(len(payload) for payload in raw_payloads) / len(raw_payloads) / 1024
+    print(f'{len(raw_payloads)} payloads of {size:.0f} KB on average')
+    for name, function in [('dicts', decode_dicts), ('structs', decode_structs)]:
+        milliseconds, memory = measure(function, raw_payloads)
+        print(f'{name:<8} {milliseconds:8.3f} ms/match  {memory:8.2f} MB peak')
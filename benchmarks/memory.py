@@ -0,0 +1,99 @@
+from typing import Callable, List, NamedTuple, Tuple, Any
+from time import perf_counter
+import tracemalloc
+import argparse
+
+# A full-history backfill of one league: 10 seasons of a 20-team double round-robin
+SEASONS = 10
+MATCHES_PER_SEASON = 380
+
+
+def _values(leagues: int) -> List[Tuple[Any, ...]]:
+    return [(match_id, 2015 + match_id // MATCHES_PER_SEASON % SEASONS, match_id % 20, match_id % 19,
+             match_id % 5, match_id % 4, '4-3-3', '4-4-2', f'2024-08-{match_id % 28 + 1:02d} 15:00:00',
+             f'Stadium {match_id % 20}', 20000 + match_id, 'Full-Time')
+            for match_id in range(leagues * SEASONS * MATCHES_PER_SEASON)]
+
+
+def build_lists(values: List[Tuple[Any, ...]]) -> List[List[list]]:
+    return [
+        [[value[0], value[1], value[2], value[3]] for value in values],
+        [[value[0], value[4], value[5]] for value in values],
+        [[value[0], value[6], value[7]] for value in values],
+        [[value[0], value[8], value[9], value[10], value[11]] for value in values]
+    ]
+
+
+def build_rows(values: List[Tuple[Any, ...]]) -> List[List[tuple]]:
+    # The rows of 'utils.database.rows' are plain tuples
+    return [
+        [(value[0], value[1], value[2], value[3]) for value in values],
+        [(value[0], value[4], value[5]) for value in values],
+        [(value[0], value[6], value[7]) for value in values],
+        [(value[0], value[8], value[9], value[10], value[11]) for value in values]
+    ]
+
+
+# The NamedTuple row types used before, for comparison
+class MatchRow(NamedTuple):
+    match_id: int
+    season: int
+    home_id: int
+    away_id: int
+
+
+class MatchResultRow(NamedTuple):
+    match_id: int
+    score_ht: int
+    score_at: int
+
+
+class MatchLineupRow(NamedTuple):
+    match_id: int
+    lineup_ht: str
+    lineup_at: str
+
+
+class MatchDetailRow(NamedTuple):
+    match_id: int
+    utc_time: str
+    stadium: str
+    attendance: int
+    reason: str
+
+
+def build_named_rows(values: List[Tuple[Any, ...]]) -> List[List[tuple]]:
+    return [
+        [MatchRow(value[0], value[1], value[2], value[3]) for value in values],
+        [MatchResultRow(value[0], value[4], value[5]) for value in values],
+        [MatchLineupRow(value[0], value[6], value[7]) for value in values],
+        [MatchDetailRow(value[0], value[8], value[9], value[10], value[11]) for value in values]
+    ]
+
+
+def measure(build: Callable, values: List[Tuple[Any, ...]]) -> Tuple[float, float]:
+    """
+    Returns the memory (in MB) held by the built rows and the time (in seconds) spent building them.
+    The field values are created beforehand, so only the row containers are measured.
+    """
+    tracemalloc.start()
+    started = perf_counter()
+    rows = build(values)
+    elapsed = perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return current / 1024 / 1024, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the memory and build time of list, tuple and NamedTuple rows '
+                                                 'on a backfill.')
+    parser.add_argument('--leagues', type=int, default=1)
+    arguments = parser.parse_args()
+
+    field_values = _values(arguments.leagues)
+    print(f'{len(field_values) * 4} rows ({arguments.leagues} league(s), {SEASONS} seasons, 4 tables)')
+    for name, function in [('lists', build_lists), ('tuples', build_rows), ('namedtuples', build_named_rows)]:
+        memory, seconds = measure(function, field_values)
+        print(f'{name:<12} {memory:8.2f} MB  {seconds:6.3f} s')
@@ -0,0 +1,129 @@
+from typing import Dict, Optional
+import subprocess
+import tempfile
+import shutil
+import socket
+import glob
+import os
+
+from psycopg2 import connect
+
+from utils.constants import DATABASE_FIRST_TABLES, DATABASE_SUMMARY_TABLES, EAFC_SCHEMA
+from utils.database.initializer import queries, index_queries
+from utils.database.connector import create_watermarks
+from utils.database.work_queue import create_queue
+from utils.fixture_calendar import create_calendars
+
+BENCHMARK_DATABASE = 'football_competitions'
+BENCHMARK_USER = 'benchmark'
+
+# The scripts write the fut.gg catalogue into '<EAFC_SCHEMA>.players' (nine columns of 'cards' without 'gender')
+EAFC_PLAYERS_QUERY = """
+    CREATE TABLE {name_schema}.players (
+        eaid INT PRIMARY KEY,
+        first_name VARCHAR(50),
+        last_name VARCHAR(50),
+        league VARCHAR(80),
+        club VARCHAR(80),
+        nation VARCHAR(30),
+        rarity VARCHAR(50),
+        position VARCHAR(5),
+        foot VARCHAR(15)
+    );
+"""
+
+
+def _find_binary(name: str) -> str:
+    """
+    Finds a PostgreSQL server binary on PATH or in the usual Debian/Ubuntu installation directories.
+    """
+    path = shutil.which(name)
+    if path:
+        return path
+
+    candidates = sorted(glob.glob(f'/usr/lib/postgresql/*/bin/{name}'), reverse=True)
+    if candidates:
+        return candidates[0]
+
+    raise RuntimeError(f'The PostgreSQL binary "{name}" was not found, a local PostgreSQL server is required.')
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class DisposablePostgres:
+    """
+    A throwaway PostgreSQL cluster in a temporary directory, removed on exit.
+
+    Attributes:
+        port (int): Port the server listens on (127.0.0.1 only).
+        environment (Dict[str, str]): PG_* variables that point 'connect_to_database' at the cluster.
+    """
+    def __init__(self, port: Optional[int] = None):
+        self.port = port or _free_port()
+        self.directory: Optional[str] = None
+        self.environment: Dict[str, str] = {
+            'PG_HOST': '127.0.0.1', 'PG_PORT': str(self.port), 'PG_USER': BENCHMARK_USER,
+            'PG_PASSWORD': '', 'PG_DATABASE': BENCHMARK_DATABASE
+        }
+
+    def connect(self):
+        return connect(database=BENCHMARK_DATABASE, user=BENCHMARK_USER, host='127.0.0.1', port=self.port)
+
+    def __enter__(self) -> 'DisposablePostgres':
+        self.directory = tempfile.mkdtemp(prefix='football_benchmark_pg_')
+        data_directory = os.path.join(self.directory, 'data')
+
+        subprocess.run([_find_binary('initdb'), '-D', data_directory, '-U', BENCHMARK_USER,
+                        '-A', 'trust', '--no-sync'], check=True, capture_output=True)
+        # Durability is irrelevant for a benchmark database and fsync would only add noise
+        subprocess.run([_find_binary('pg_ctl'), '-D', data_directory, '-l', os.path.join(self.directory, 'log'),
+                        '-o', f'-p {self.port} -k {self.directory} -c listen_addresses=127.0.0.1 '
+                              f'-c fsync=off -c synchronous_commit=off -c full_page_writes=off',
+                        '-w', 'start'], check=True, capture_output=True)
+
+        with connect(database='postgres', user=BENCHMARK_USER, host='127.0.0.1', port=self.port) as connection:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f'CREATE DATABASE {BENCHMARK_DATABASE};')
+        return self
+
+    def __exit__(self, *args) -> None:
+        subprocess.run([_find_binary('pg_ctl'), '-D', os.path.join(self.directory, 'data'),
+                        '-m', 'immediate', 'stop'], capture_output=True)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def reset_league(self, name_schema: str) -> None:
+        """
+        Recreates the league schema with all its tables and indexes, and the EAFC_SCHEMA schema,
+        and removes their items from the work queue.
+        """
+        with self.connect() as connection, connection.cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA IF EXISTS {name_schema} CASCADE;')
+            cursor.execute(f'CREATE SCHEMA {name_schema};')
+            for name_table in DATABASE_FIRST_TABLES + DATABASE_SUMMARY_TABLES:
+                cursor.execute(queries(name_schema, name_table))
+                for query in index_queries(name_schema, name_table):
+                    cursor.execute(query)
+
+            cursor.execute(f'DROP SCHEMA IF EXISTS {EAFC_SCHEMA} CASCADE;')
+            cursor.execute(f'CREATE SCHEMA {EAFC_SCHEMA};')
+            cursor.execute(EAFC_PLAYERS_QUERY.format(name_schema=EAFC_SCHEMA))
+
+            create_queue(cursor)
+            create_calendars(cursor)
+            create_watermarks(cursor)
+            cursor.execute('DELETE FROM public.league_runs WHERE name_schema = %s;', (name_schema,))
+            cursor.execute('DELETE FROM public.ingestion_watermarks WHERE name_schema = %s;', (name_schema,))
+            cursor.execute('DELETE FROM public.work_queue WHERE name_schema IN (%s, %s);', (name_schema, EAFC_SCHEMA))
+
+    def count_rows(self, name_schema: str, tables: list) -> int:
+        with self.connect() as connection, connection.cursor() as cursor:
+            total = 0
+            for name_table in tables:
+                cursor.execute(f'SELECT COUNT(*) FROM {name_schema}.{name_table};')
+                total += cursor.fetchone()[0]
+            return total
@@ -0,0 +1,186 @@
+from typing import Dict, List, Optional, Any
+from time import perf_counter
+from datetime import datetime
+import subprocess
+import importlib
+import argparse
+import json
+import math
+import sys
+import os
+
+from utils.constants import PROJECT_DIRECTORY, LOG_CATALOG, EAFC_SCHEMA
+
+# Scripts in the order of the DAG, with the tables whose rows count as their output
+SCRIPTS: Dict[str, List[str]] = {
+    'matches': ['teams', 'matches'],
+    'stadiums': ['stadiums'],
+    'match_details': ['match_results', 'match_lineups', 'match_details', 'match_players'],
+    'players': ['players']
+}
+BENCHMARK_CATALOG = 'benchmarks'
+# Relative drop of throughput (or growth of p99 latency) reported as a regression against a baseline
+REGRESSION_THRESHOLD = 0.2
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """
+    Returns the nearest-rank percentile of the values, or None if there are none.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_worker(script_name: str, league: str) -> Dict[str, Any]:
+    """
+    Runs one script end to end in the current process and measures the latency of every fetch.
+    Executed in a subprocess, so that each run starts with fresh constants, metrics and connections.
+    """
+    from utils.fetcher import Fetcher
+
+    latencies: List[float] = []
+    fetch_data = Fetcher.fetch_data
+
+    def timed_fetch_data(self, *args, **kwargs):
+        started = perf_counter()
+        try:
+            return fetch_data(self, *args, **kwargs)
+        finally:
+            latencies.append(perf_counter() - started)
+
+    Fetcher.fetch_data = timed_fetch_data
+
+    started = perf_counter()
+    if script_name == 'players':
+        from scripts.eafc.futgg import PlayersParser
+        PlayersParser(EAFC_SCHEMA).get_basic_info()
+    else:
+        importlib.import_module(f'scripts.{script_name}').main(league)
+    elapsed = perf_counter() - started
+
+    return {'elapsed': elapsed, 'requests': len(latencies),
+            'p50': percentile(latencies, 0.5), 'p99': percentile(latencies, 0.99)}
+
+
+def run_benchmark(league: str, concurrency_levels: List[int], payload_sizes: List[int],
+                  latency: float, jitter: float, error_rate: float, teams: int, cards: int,
+                  recordings: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Runs every script against the stand-in server and a disposable PostgreSQL
+    for each combination of concurrency level and payload size.
+
+    Returns:
+        One result per script and combination: throughput (rows per second) and p50/p99 fetch latency.
+    """
+    from benchmarks.postgres import DisposablePostgres
+    from benchmarks.stub_server import StubServer, StubConfig
+    from utils.link_mapper import format_string
+
+    name_schema = format_string(league)
+    results = []
+
+    with DisposablePostgres() as postgres:
+        for payload_kb in payload_sizes:
+            config = StubConfig(latency=latency, jitter=jitter, error_rate=error_rate,
+                                teams=teams, payload_kb=payload_kb, cards=cards, recordings=recordings)
+
+            with StubServer(config) as server:
+                for concurrency in concurrency_levels:
+                    postgres.reset_league(name_schema)
+                    environment = dict(os.environ, **postgres.environment,
+                                       FOTMOB_API_URL=f'{server.url}/api/', FUTGG_URL=f'{server.url}/',
+                                       MAX_WORKERS=str(concurrency))
+
+                    for script_name, tables in SCRIPTS.items():
+                        completed = subprocess.run(
+                            [sys.executable, '-m', 'benchmarks.run', '--worker', script_name, '--league', league],
+                            cwd=PROJECT_DIRECTORY, env=environment, capture_output=True, text=True
+                        )
+                        if completed.returncode != 0:
+                            raise RuntimeError(f'The benchmark of "{script_name}" failed:\n{completed.stderr}')
+
+                        measurement = json.loads(completed.stdout.strip().splitlines()[-1])
+                        rows = postgres.count_rows(EAFC_SCHEMA if script_name == 'players' else name_schema, tables)
+                        result = {
+                            'script': script_name, 'concurrency': concurrency, 'payload_kb': payload_kb,
+                            'rows': rows, 'rows_per_second': rows / measurement['elapsed'], **measurement
+                        }
+                        results.append(result)
+                        print(format_result(result), flush=True)
+
+    return results
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    def milliseconds(value: Optional[float]) -> str:
+        return '-' if value is None else f'{value * 1000:.1f} ms'
+
+    return (f'{result["script"]:<14} workers={result["concurrency"]:<3} payload={result["payload_kb"]:>4} KB  '
+            f'{result["rows"]:>6} rows in {result["elapsed"]:7.2f} s  {result["rows_per_second"]:9.1f} rows/s  '
+            f'p50={milliseconds(result["p50"]):>9}  p99={milliseconds(result["p99"]):>9}')
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]]) -> List[str]:
+    """
+    Returns a description of every result that is slower than the same run of the baseline.
+    """
+    def key(result):
+        return result['script'], result['concurrency'], result['payload_kb']
+
+    baseline_results = {key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get(key(result))
+        if previous is None:
+            continue
+        if result['rows_per_second'] < previous['rows_per_second'] * (1 - REGRESSION_THRESHOLD):
+            regressions.append(f'{format_result(result)} (baseline {previous["rows_per_second"]:.1f} rows/s)')
+        elif previous['p99'] and result['p99'] and result['p99'] > previous['p99'] * (1 + REGRESSION_THRESHOLD):
+            regressions.append(f'{format_result(result)} (baseline p99 {previous["p99"] * 1000:.1f} ms)')
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the scrapers against a local stand-in server.')
+    parser.add_argument('--league', default='Premier League')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--payload-kb', type=int, nargs='+', default=[20, 150, 500])
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--teams', type=int, default=20)
+    parser.add_argument('--cards', type=int, default=3000)
+    parser.add_argument('--recordings', default=None, help='Directory with recorded payloads.')
+    parser.add_argument('--baseline', default=None, help='Report of a previous run to compare against.')
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.worker:
+        print(json.dumps(run_worker(arguments.worker, arguments.league)))
+        return 0
+
+    results = run_benchmark(arguments.league, arguments.concurrency, arguments.payload_kb,
+                            arguments.latency, arguments.jitter, arguments.error_rate,
+                            arguments.teams, arguments.cards, arguments.recordings)
+
+    report_directory = os.path.join(PROJECT_DIRECTORY, LOG_CATALOG, BENCHMARK_CATALOG)
+    os.makedirs(report_directory, exist_ok=True)
+    report_path = os.path.join(report_directory, f'benchmark_{datetime.now():%Y%m%d_%H%M%S}.json')
+    with open(report_path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f'The report was written to "{report_path}".')
+
+    if arguments.baseline:
+        with open(arguments.baseline, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file))
+        for regression in regressions:
+            print(f'REGRESSION: {regression}')
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
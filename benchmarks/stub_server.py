@@ -0,0 +1,311 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from typing import Optional, Dict, List, Any
+from functools import lru_cache
+from datetime import datetime, timedelta
+import argparse
+import threading
+import random
+import json
+import time
+import os
+
+# Every synthesized league has the same teams, their IDs start from TEAM_ID_OFFSET
+TEAM_ID_OFFSET = 8000
+MATCH_ID_OFFSET = 4000000
+SEASONS = ['2024/2025', '2023/2024', '2022/2023']
+FORMATIONS = ['4-3-3', '4-2-3-1', '3-5-2', '4-4-2', '5-3-2']
+CARDS_PER_PAGE = 30
+
+
+class StubConfig:
+    """
+    Behaviour of the stand-in server.
+
+    Attributes:
+        latency (float): Base delay of every response in seconds.
+        jitter (float): Maximum random delay added to 'latency' in seconds.
+        error_rate (float): Probability of answering a request with HTTP 500.
+        teams (int): Number of teams in a league, a season has teams * (teams - 1) matches.
+        payload_kb (int): Approximate size of the 'matchDetails' payloads in kilobytes.
+        cards (int): Number of cards in the fut.gg catalogue.
+        recordings (Optional[str]): Directory with recorded payloads named '<endpoint>_<id>.json'
+            (e.g. 'matchDetails_4506263.json'), served instead of the synthesized ones when present.
+        seed (int): Seed of the random generator of latencies and errors.
+    """
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, error_rate: float = 0.0,
+                 teams: int = 20, payload_kb: int = 150, cards: int = 3000,
+                 recordings: Optional[str] = None, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.teams = teams
+        self.payload_kb = payload_kb
+        self.cards = cards
+        self.recordings = recordings
+        self.seed = seed
+
+
+def _team(index: int) -> Dict[str, Any]:
+    return {'id': TEAM_ID_OFFSET + index, 'name': f'Team {index}'}
+
+
+def _fixtures(teams: int) -> List[tuple]:
+    """
+    Returns the (home, away) pairs of a double round-robin season.
+    """
+    return [(home, away) for home in range(teams) for away in range(teams) if home != away]
+
+
+def _match_id(season_index: int, fixture_index: int, fixtures: int) -> int:
+    return MATCH_ID_OFFSET + season_index * fixtures + fixture_index
+
+
+def league_payload(league_id: str, season: Optional[str], config: StubConfig) -> Dict[str, Any]:
+    season = season or SEASONS[0]
+    season_index = SEASONS.index(season) if season in SEASONS else 0
+    kickoff = datetime(int(season[:4]), 8, 10, 15)
+
+    fixtures = _fixtures(config.teams)
+    matches = []
+    for index, (home, away) in enumerate(fixtures):
+        utc_time = kickoff + timedelta(days=index // (config.teams // 2) * 7)
+        matches.append({
+            'id': _match_id(season_index, index, len(fixtures)),
+            'home': _team(home),
+            'away': _team(away),
+            'status': {
+                'utcTime': utc_time.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                'finished': True,
+                'started': True,
+                'cancelled': False
+            }
+        })
+
+    return {
+        'details': {'id': int(league_id), 'name': f'League {league_id}'},
+        'allAvailableSeasons': SEASONS,
+        'matches': {'allMatches': matches}
+    }
+
+
+def team_payload(team_id: str) -> Dict[str, Any]:
+    index = int(team_id) - TEAM_ID_OFFSET
+    return {
+        'details': {'id': int(team_id), 'name': f'Team {index}'},
+        'overview': {
+            'venue': {
+                'widget': {'name': f'Stadium {index}', 'city': f'City {index}',
+                           'location': [51.0 + index / 100, -0.1 - index / 100]},
+                'statPairs': [['Surface', 'Grass'], ['Capacity', 20000 + index * 1000], ['Opened', 1900 + index]]
+            }
+        }
+    }
+
+
+def _players(team_id: int, rng: random.Random) -> Dict[str, Any]:
+    starters = []
+    for number in range(11):
+        substitution = [{'time': rng.randint(46, 89), 'type': 'subOut'}] if number >= 8 else []
+        starters.append({
+            'id': team_id * 100 + number, 'name': f'Player {team_id}-{number}',
+            'positionId': number + 1, 'usualPlayingPositionId': min(number, 3),
+            'performance': {'rating': round(rng.uniform(5.5, 9.0), 1), 'substitutionEvents': substitution}
+        })
+    subs = []
+    for number in range(11, 20):
+        substitution = [{'time': rng.randint(46, 89), 'type': 'subIn'}] if number < 14 else []
+        subs.append({
+            'id': team_id * 100 + number, 'name': f'Player {team_id}-{number}',
+            'usualPlayingPositionId': 2,
+            'performance': {'rating': round(rng.uniform(5.5, 8.0), 1) if substitution else None,
+                            'substitutionEvents': substitution}
+        })
+    return {'id': team_id, 'formation': rng.choice(FORMATIONS), 'starters': starters, 'subs': subs}
+
+
+def match_details_payload(match_id: str, config: StubConfig) -> Dict[str, Any]:
+    rng = random.Random(int(match_id))
+    fixtures = _fixtures(config.teams)
+    home, away = fixtures[(int(match_id) - MATCH_ID_OFFSET) % len(fixtures)]
+    utc_time = datetime(2024, 8, 10, 15) + timedelta(days=rng.randint(0, 270))
+
+    # Most of a real payload is statistics, momentum and player data the scripts never read
+    filler = [{'title': f'Statistic {index}', 'key': f'stat_{index}',
+               'stats': [rng.randint(0, 100), rng.randint(0, 100)], 'type': 'text', 'highlighted': 'equal'}
+              for index in range(config.payload_kb * 1024 // 110)]
+
+    return {
+        'general': {'matchId': match_id, 'matchTimeUTCDate': utc_time.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                    'finished': True, 'started': True},
+        'header': {
+            'teams': [dict(_team(home), score=rng.randint(0, 4)), dict(_team(away), score=rng.randint(0, 4))],
+            'status': {'finished': True, 'started': True, 'cancelled': False,
+                       'utcTime': utc_time.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                       'reason': {'short': 'FT', 'long': 'Full-Time'}}
+        },
+        'content': {
+            'matchFacts': {'infoBox': {'Stadium': {'name': f'Stadium {home}'},
+                                       'Attendance': rng.randint(5000, 60000)}},
+            'lineup2': {'homeTeam': _players(TEAM_ID_OFFSET + home, rng),
+                        'awayTeam': _players(TEAM_ID_OFFSET + away, rng)},
+            'stats': {'Periods': {'All': {'stats': filler}}}
+        }
+    }
+
+
+def _card(eaid: int) -> Dict[str, Any]:
+    return {
+        'eaId': eaid, 'firstName': f'First {eaid}', 'lastName': f'Last {eaid}',
+        'league': {'name': f'League {eaid % 50}'}, 'club': {'name': f'Club {eaid % 700}'} if eaid % 9 else None,
+        'nation': {'name': f'Nation {eaid % 150}'}, 'rarityName': 'Rare', 'position': 'ST', 'foot': 'Right'
+    }
+
+
+def cards_payload(page: int, config: StubConfig) -> Dict[str, Any]:
+    first = (page - 1) * CARDS_PER_PAGE
+    return {'data': [_card(eaid) for eaid in range(first + 1, min(first + CARDS_PER_PAGE, config.cards) + 1)]}
+
+
+def players_page_html(page: Optional[int], config: StubConfig) -> str:
+    """
+    Returns an HTML page of the fut.gg catalogue: 20 cards per page and a link to the last page.
+    """
+    last_page = (config.cards + 19) // 20
+    page = page or 1
+    cards = 20 if page < last_page else config.cards - 20 * (last_page - 1)
+    cards_html = ''.join('<div class="-my-1"><a>card</a></div>' for _ in range(cards))
+    return (f'<html><body>{cards_html}'
+            f'<div class="pagination__control pagination__control--next"><a href="?page={last_page}">Next</a></div>'
+            f'</body></html>')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answers the FOTMOB ('/api/leagues', '/api/teams', '/api/matchDetails') and fut.gg
+    ('/players/', '/api/fut/players/') requests of the scripts.
+    """
+    server: 'StubServer'
+
+    def log_message(self, format: str, *args) -> None:
+        # Per-request logging to stderr would dominate the measurements
+        pass
+
+    def do_GET(self) -> None:
+        config = self.server.config
+        time.sleep(config.latency + self.server.random() * config.jitter)
+
+        if self.server.random() < config.error_rate:
+            self._send(500, b'{"error": true}', 'application/json')
+            return None
+
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        body = self.server.payload(url.path, tuple(sorted(params.items())))
+
+        if body is None:
+            self._send(404, b'{"error": true, "message": "Data not found"}', 'application/json')
+        else:
+            content_type = 'text/html' if url.path.rstrip('/') == '/players' else 'application/json'
+            self._send(200, body, content_type)
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    A local stand-in for FOTMOB and fut.gg, serving recorded or synthesized payloads
+    with a configurable latency and error rate.
+
+    Used as a context manager, the server runs in a background thread:
+
+        with StubServer(StubConfig(latency=0.1)) as server:
+            os.environ['FOTMOB_API_URL'] = f'{server.url}/api/'
+    """
+    daemon_threads = True
+
+    def __init__(self, config: StubConfig, port: int = 0):
+        super().__init__(('127.0.0.1', port), StubHandler)
+        self.config = config
+        self._random = random.Random(config.seed)
+        self._random_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # Payloads are built once per path, so the server does not distort the measurements
+        self.payload = lru_cache(maxsize=None)(self._payload)
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def random(self) -> float:
+        with self._random_lock:
+            return self._random.random()
+
+    def _recorded(self, endpoint: str, identifier: Optional[str]) -> Optional[bytes]:
+        if not self.config.recordings or identifier is None:
+            return None
+        file_path = os.path.join(self.config.recordings, f'{endpoint}_{identifier}.json')
+        if os.path.exists(file_path):
+            with open(file_path, 'rb') as file:
+                return file.read()
+        return None
+
+    def _payload(self, path: str, params: tuple) -> Optional[bytes]:
+        params = dict(params)
+        path = path.rstrip('/')
+
+        if path == '/api/leagues':
+            identifier = params.get('id')
+            recorded = self._recorded('leagues', f'{identifier}_{params["season"].replace("/", "_")}'
+                                      if 'season' in params else identifier)
+            payload = recorded or league_payload(identifier, params.get('season'), self.config)
+        elif path == '/api/teams':
+            payload = self._recorded('teams', params.get('id')) or team_payload(params['id'])
+        elif path == '/api/matchDetails':
+            payload = (self._recorded('matchDetails', params.get('matchId'))
+                       or match_details_payload(params['matchId'], self.config))
+        elif path == '/api/fut/players':
+            payload = cards_payload(int(params.get('page', 1)), self.config)
+        elif path == '/players':
+            return players_page_html(int(params['page']) if 'page' in params else None, self.config).encode()
+        else:
+            return None
+
+        return payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+
+    def __enter__(self) -> 'StubServer':
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve FOTMOB and fut.gg stand-in payloads.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--teams', type=int, default=20)
+    parser.add_argument('--payload-kb', type=int, default=150)
+    parser.add_argument('--cards', type=int, default=3000)
+    parser.add_argument('--recordings', default=None)
+    arguments = parser.parse_args()
+
+    stub_config = StubConfig(arguments.latency, arguments.jitter, arguments.error_rate, arguments.teams,
+                             arguments.payload_kb, arguments.cards, arguments.recordings)
+    with StubServer(stub_config, arguments.port) as stub_server:
+        print(f'Serving on {stub_server.url} (FOTMOB_API_URL={stub_server.url}/api/ FUTGG_URL={stub_server.url}/)')
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
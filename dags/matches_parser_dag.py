@@ -1,9 +1,19 @@
-from airflow.operators.python import PythonOperator
+from airflow.operators.python import PythonOperator, ShortCircuitOperator
 from datetime import datetime, timedelta
+from time import perf_counter
 from airflow import DAG
+import importlib
+import logging
 import sys
 import os
 
+# The scheduler re-parses this file every few seconds, so the time spent building the DAG is measured.
+# Everything below must stay cheap: the scripts (and with them 'requests', 'psycopg2' and 'decouple')
+# are imported only when a task runs, and the leagues come from a lightweight manifest
+PARSE_STARTED = perf_counter()
+# Budget (in seconds) of building the DAG, without the import of Airflow itself
+DAG_PARSE_TIME_BUDGET = 0.5
+
 # Get the absolute path to the parent directory of the curresnt file
 # and append this path to sys.path so that Python can find modules from this directory.
 # Path: <your_abspath>/football-competitions/
@@ -11,9 +21,9 @@ PROJECT_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), os.p
 RESOURCE_CATALOG = 'resources'
 
 sys.path.append(PROJECT_DIRECTORY)
-from utils.link_mapper import format_string
-from utils.constants import HASHMAP_LEAGUE_IDS
-from scripts import matches, stadiums, match_details
+from utils.link_mapper import league_manifest, league_weight
+
+LOGGER = logging.getLogger(__name__)
 
 # Current date from which the DAG should start executing
 DATE_START_PARSE = datetime(2024, 7, 1, 18)
@@ -26,6 +36,32 @@ default_args = {
     'email_on_retry': True,
 }
 
+
+def league_has_work(league: str) -> bool:
+    """
+    Checks the fixture calendar of the league: if none of its matches has finished since
+    the last successful run, the downstream tasks are skipped and the league makes no database
+    writes and at most the two requests refreshing its calendar (see 'scripts.matches.league_has_work').
+    """
+    from scripts.matches import league_has_work as has_work
+
+    return has_work(league)
+
+
+def run_script(script_name: str, league: str, **context) -> None:
+    """
+    Imports 'scripts.<script_name>' when the task runs and calls its 'main' for the league.
+
+    Triggering the DAG with the configuration {"profile": true} profiles every task of the run
+    (see 'utils.profiler'), otherwise the PROFILE environment variable of the worker decides.
+    """
+    dag_run = context.get('dag_run')
+    profile = True if dag_run and dag_run.conf and dag_run.conf.get('profile') else None
+
+    script = importlib.import_module(f'scripts.{script_name}')
+    script.main(league, profile=profile)
+
+
 with DAG(
     dag_id="matches_parser",
     default_args=default_args,
@@ -33,31 +69,56 @@ with DAG(
     schedule=timedelta(days=1),
     catchup=False,
 ) as dag:
-    for league in HASHMAP_LEAGUE_IDS:
-        formatted_league = format_string.format_string(league)
+    for league, formatted_league in league_manifest():
+        # When the workers are saturated, the tasks of the top leagues are queued before the long tail
+        # (see 'utils.link_mapper.league_weight'); the weights are set absolutely, as Airflow would
+        # otherwise sum the weights of the downstream tasks
+        priority = dict(priority_weight=int(league_weight(league) * 10), weight_rule='absolute')
+
+        # The failed fetches of previous runs are retried even if the league has no new matches
+        retry_task = PythonOperator(
+            task_id=f'retry_failed_{formatted_league}',
+            python_callable=run_script,
+            op_args=['retry_failed', league],
+            dag=dag,
+            **priority,
+        )
+
+        calendar_check = ShortCircuitOperator(
+            task_id=f'calendar_{formatted_league}',
+            python_callable=league_has_work,
+            op_args=[league],
+            dag=dag,
+            **priority,
+        )
 
         matches_parse = PythonOperator(
             task_id=f'matches_{formatted_league}',
-            python_callable=matches.main,
-            op_args=[league],
-            provide_context=True,
+            python_callable=run_script,
+            op_args=['matches', league],
             dag=dag,
+            **priority,
         )
 
         stadiums_task = PythonOperator(
             task_id=f'stadiums_{formatted_league}',
-            python_callable=stadiums.main,
-            op_args=[league],
-            provide_context=True,
+            python_callable=run_script,
+            op_args=['stadiums', league],
             dag=dag,
+            **priority,
         )
 
         results_task = PythonOperator(
             task_id=f'match_details_{formatted_league}',
-            python_callable=match_details.main,
-            op_args=[league],
-            provide_context=True,
+            python_callable=run_script,
+            op_args=['match_details', league],
             dag=dag,
+            **priority,
         )
 
-        matches_parse >> stadiums_task >> results_task
+        retry_task >> calendar_check >> matches_parse >> stadiums_task >> results_task
+
+DAG_PARSE_TIME = perf_counter() - PARSE_STARTED
+if DAG_PARSE_TIME > DAG_PARSE_TIME_BUDGET:
+    LOGGER.warning(f'Parsing the DAG "matches_parser" took {DAG_PARSE_TIME:.3f} sec, '
+                   f'which exceeds the budget of {DAG_PARSE_TIME_BUDGET} sec.')
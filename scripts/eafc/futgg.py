@@ -0,0 +1,155 @@
+from utils.database.connector import connect_to_database, ThreadConnections
+from utils.database.rows import CardRow
+from utils.database import work_queue
+from utils.constants import FUTGG_URL, MAX_WORKERS
+from utils.metrics import METRICS, export_run_metrics
+from utils.html_parsers import parse_futgg_last_page, count_futgg_cards
+from utils.parse_pool import ParsePool
+from utils.profiler import profile_run
+from utils.logger import configure_logger
+from utils.fetcher import Fetcher
+from typing import Optional, List
+from time import perf_counter
+from psycopg2 import errors
+import threading
+import math
+
+
+LOGGER = configure_logger(__name__, 'players.log')
+
+class PlayersParser(Fetcher):
+    """
+    Crawls the card catalogue of fut.gg into the 'players' table of an EA FC schema.
+
+    Args:
+        name_schema (str): The EA FC schema of the season, e.g. 'eafc24'.
+    """
+    def __init__(self, name_schema: str):
+        super().__init__()
+        self.name_schema = name_schema
+        self.insert_iteration = 0
+        self.inserted_cards = 0
+        self.futgg_url = f'{FUTGG_URL}players/'
+        # self.url_card = 'https://www.fut.gg/api/fut/player-item-definitions/'
+        self.futgg_json = f'{FUTGG_URL}api/fut/players/?page='
+        # The HTML pages are parsed in the processes of the pool, created for the run by 'get_basic_info'
+        self.parse_pool: Optional[ParsePool] = None
+        # The pages are processed by the threads of the queue consumer, the counters are shared by them
+        self._insert_lock = threading.Lock()
+
+    def get_last_page(self, html_content: str) -> Optional[int]:
+        try:
+            return self.parse_pool.parse(parse_futgg_last_page, html_content, script='players')
+        
+        except Exception as e:
+            LOGGER.error(f'Error parsing last page number: {e}')
+            return None
+
+    def calculate_total_cards(self, html_content: str, last_page_number: int) -> Optional[int]:
+        try:
+            cards_on_last_page = self.parse_pool.parse(count_futgg_cards, html_content, script='players')
+            
+            all_cards = 20 * (last_page_number - 1) + cards_on_last_page
+            return all_cards
+        except Exception as e:
+            LOGGER.error(f'Error counting cards on the last page: {e}')
+            return None
+
+    def get_total_pages(self) -> int:
+        html_content = self.fetch_data(self.futgg_url)
+        if not html_content:
+            LOGGER.error('Failed to retrieve the initial HTML content.')
+            return 0
+
+        last_page_number = self.get_last_page(html_content)
+        if last_page_number is None:
+            LOGGER.error('Failed to determine the last page number.')
+            return 0
+
+        html_content = self.fetch_data(f'{self.futgg_url}?page={last_page_number}')
+        if not html_content:
+            LOGGER.error(f'Failed to retrieve the HTML content for the last page: {last_page_number}.')
+            return 0
+        
+        total_cards = self.calculate_total_cards(html_content, last_page_number)
+        if total_cards is None:
+            LOGGER.error('Failed to determine the total number of cards.')
+            return 0
+
+        return math.ceil(total_cards / 30)
+
+    def insert_to_database(self, values: List[CardRow], connection) -> None:
+        insert_query = f"""
+                        INSERT INTO {self.name_schema}.players VALUES (
+                            %s, %s, %s, %s, %s, %s, %s, %s, %s
+                        ) ON CONFLICT DO NOTHING;
+                        """
+        try:
+            with METRICS.timer('db_write_seconds', table='players'), connection.cursor() as cursor:
+                cursor.executemany(insert_query, values)
+                connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        METRICS.increment('db_rows_written_total', len(values), table='players')
+        with self._insert_lock:
+            self.inserted_cards += len(values)
+
+    def parse_page(self, page: int) -> List[CardRow]:
+        self.insert_iteration += 1
+        print(self.insert_iteration)
+        json_content = self.fetch_data(f'{self.futgg_json}{page}', 'json')
+        if not json_content:
+            LOGGER.warning(f'Failed to retrieve the element code from the provided link "{self.futgg_json}{page}".')
+            return []
+
+        parse_started = perf_counter()
+        package_eaid = []
+        for card in json_content['data']:
+            if card['club'] is not None:
+                club_name = card['club']['name']
+            else:
+                club_name = None
+            
+            package_eaid.append((
+                card['eaId'],
+                card['firstName'],
+                card['lastName'],
+                card['league']['name'],
+                club_name,
+                card['nation']['name'],
+                card['rarityName'],
+                card['position'],
+                card['foot']
+            ))
+        METRICS.observe('parse_seconds', perf_counter() - parse_started, script='players')
+        return package_eaid
+
+    def consume_queue(self) -> int:
+        """
+        Processes the 'players' pages of the work queue (see 'utils.database.work_queue'),
+        until the queue is drained by this and all other workers.
+        Every thread of the queue writes on a connection of its own.
+        """
+        connections = ThreadConnections()
+
+        def process(schema: str, pages: List[str]) -> None:
+            for page in pages:
+                package_eaid = self.parse_page(int(page))
+                if package_eaid:
+                    self.insert_to_database(package_eaid, connections.get())
+
+        with connections:
+            return work_queue.drain('players', process, self.name_schema, batch_size=10, workers=MAX_WORKERS)
+
+    def get_basic_info(self, profile: Optional[bool] = None) -> None:
+        started = perf_counter()
+        with profile_run('players', self.name_schema, profile), ParsePool() as self.parse_pool:
+            total_pages = self.get_total_pages()
+
+            with connect_to_database() as connection:
+                # The pages are queued, so that workers on other hosts ('scripts.queue_worker') can share them
+                work_queue.enqueue(connection, 'players', self.name_schema, range(1, total_pages + 1))
+            self.consume_queue()
+
+        export_run_metrics('players', self.name_schema, self.inserted_cards, perf_counter() - started)
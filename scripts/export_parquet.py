@@ -0,0 +1,281 @@
+from typing import Dict, List, Tuple, Any, Optional
+from psycopg2 import extensions
+from time import perf_counter
+import shutil
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.constants import PROJECT_DIRECTORY, EXPORT_CATALOG, EXPORT_FILE_LOG
+from utils.database.connector import connect_to_database, get_watermarks
+from utils.metrics import METRICS, export_run_metrics
+from utils.link_mapper import league_manifest
+from utils.logger import configure_logger
+
+# Configure logger for the current module
+LOGGER = configure_logger(__name__, EXPORT_FILE_LOG)
+
+# Tables keyed by 'match_id' are partitioned by season, a season is rewritten whenever its rows changed
+MATCH_TABLES: List[str] = ['matches', 'match_results', 'match_details', 'match_lineups']
+# Small reference tables are exported as a full snapshot on every run.
+# NUMERIC coordinates are cast to double precision, which is how analytics read them anyway
+SNAPSHOT_COLUMNS: Dict[str, str] = {
+    'teams': 'team_id, title',
+    'stadiums': 'stadium, city, capacity, opened, surface, latitude::FLOAT8, longitude::FLOAT8'
+}
+# Number of rows read from a server-side cursor and written to a file at once
+BATCH_SIZE = 50000
+STATE_FILE = '_state.json'
+
+# Columns of the exported files, the match tables are prefixed with 'season' taken from 'matches'
+EXPORT_SCHEMAS: Dict[str, pa.Schema] = {
+    'matches': pa.schema([('season', pa.int16()), ('match_id', pa.int32()),
+                          ('home_id', pa.int32()), ('away_id', pa.int32())]),
+    'match_results': pa.schema([('season', pa.int16()), ('match_id', pa.int32()),
+                                ('score_ht', pa.int32()), ('score_at', pa.int32())]),
+    'match_details': pa.schema([('season', pa.int16()), ('match_id', pa.int32()),
+                                ('utc_time', pa.timestamp('s')), ('stadium', pa.string()),
+                                ('attendance', pa.int32()), ('reason', pa.string())]),
+    'match_lineups': pa.schema([('season', pa.int16()), ('match_id', pa.int32()),
+                                ('lineup_ht', pa.string()), ('lineup_at', pa.string())]),
+    'teams': pa.schema([('team_id', pa.int32()), ('title', pa.string())]),
+    'stadiums': pa.schema([('stadium', pa.string()), ('city', pa.string()), ('capacity', pa.int32()),
+                           ('opened', pa.int16()), ('surface', pa.string()),
+                           ('latitude', pa.float64()), ('longitude', pa.float64())])
+}
+
+
+class ParquetExporter:
+    """
+    A class to export the league schemas into a partitioned, compressed Parquet dataset.
+
+    The dataset is laid out as '<table>/league=<schema>/season=<season>/part-<first>-<last>.parquet'
+    for the match tables and '<table>/league=<schema>/snapshot.parquet' for the reference tables,
+    so it can be read with partition discovery (e.g. 'pyarrow.dataset' or DuckDB hive partitioning).
+
+    A match table is only looked at when its ingestion watermark (see 'utils.database.connector') changed
+    since the last run. Its seasons are then compared by their version: the number of rows and the sum of
+    the hashes of the rows, and a season is exported again as a whole whenever its version changed.
+    Late rows (e.g. a postponed match with a lower 'match_id'), updated rows and deleted rows all change
+    the version, and unlike the 'xmin' of the rows it does not depend on which transaction wrote them.
+
+    Args:
+        export_directory (str): Root directory of the dataset.
+
+    Attributes:
+        state (Dict[str, Dict[str, Dict[str, Any]]]): The exported watermark ('watermark') and version
+            of every season ('seasons') per schema and table.
+        exported_rows (int): Number of rows written by the current run.
+    """
+    def __init__(self, export_directory: str = os.path.join(PROJECT_DIRECTORY, EXPORT_CATALOG)):
+        self.export_directory = export_directory
+        self.state_path = os.path.join(export_directory, STATE_FILE)
+        self.state: Dict[str, Dict[str, Dict[str, Any]]] = self._read_state()
+        self.exported_rows = 0
+
+    def _read_state(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as file:
+                return json.load(file)
+        return {}
+
+    def _write_state(self) -> None:
+        # The state is replaced atomically, so an interrupted run never loses the exported versions
+        temporary_path = f'{self.state_path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(self.state, file, indent=2)
+        os.replace(temporary_path, self.state_path)
+
+    def _write_file(self, name_table: str, rows: List[Tuple[Any, ...]], *partition: str) -> str:
+        """
+        Writes rows of a table into one zstd-compressed Parquet file of the given partition.
+
+        Returns:
+            Path of the written file.
+        """
+        directory = os.path.join(self.export_directory, name_table, *partition[:-1])
+        os.makedirs(directory, exist_ok=True)
+        file_path = os.path.join(directory, partition[-1])
+
+        schema = EXPORT_SCHEMAS[name_table]
+        columns = list(zip(*rows)) if rows else [[] for _ in schema.names]
+        table = pa.Table.from_arrays([pa.array(column, type=field.type)
+                                      for column, field in zip(columns, schema)], schema=schema)
+
+        temporary_path = f'{file_path}.tmp'
+        with METRICS.timer('export_write_seconds', table=name_table):
+            pq.write_table(table, temporary_path, compression='zstd')
+        os.replace(temporary_path, file_path)
+
+        self.exported_rows += len(rows)
+        return file_path
+
+    def _season_query(self, name_schema: str, name_table: str, columns: str, where: str = 'TRUE') -> str:
+        """
+        Returns a query over the rows of a match table together with their season, without the final clauses.
+        The columns and the condition refer to the table as 'exported' and to its season as 'matches.season'.
+        """
+        if name_table == 'matches':
+            # 'matches' holds the season itself, its columns are listed to keep the season first
+            columns = columns.replace('exported.*', 'exported.match_id, exported.home_id, exported.away_id')
+            return f"""
+                SELECT {columns.replace('matches.', 'exported.')}
+                FROM {name_schema}.matches AS exported
+                WHERE {where.replace('matches.', 'exported.')}
+            """
+        return f"""
+            SELECT {columns}
+            FROM {name_schema}.{name_table} AS exported
+            JOIN {name_schema}.matches AS matches USING (match_id)
+            WHERE {where}
+        """
+
+    def season_versions(self, connection: extensions.connection, name_schema: str,
+                        name_table: str) -> Dict[str, List[Any]]:
+        """
+        Returns the version of every season of a match table: the number of rows and the sum of the
+        64-bit hashes of their text (kept as a string, the sum exceeds the integers of JSON).
+        """
+        query = self._season_query(name_schema, name_table, 'matches.season, count(*), '
+                                                            'sum(hashtextextended(exported::TEXT, 0))')
+        with connection.cursor() as cursor:
+            cursor.execute(f'{query} GROUP BY 1;')
+            return {str(season): [rows, str(checksum)] for season, rows, checksum in cursor.fetchall()}
+
+    def export_season(self, connection: extensions.connection, name_schema: str, name_table: str,
+                      season: str) -> int:
+        """
+        Rewrites the files of one season of a match table, one file per batch.
+
+        Returns:
+            Number of exported rows.
+        """
+        directory = os.path.join(self.export_directory, name_table, f'league={name_schema}', f'season={season}')
+        previous_files = set(os.listdir(directory)) if os.path.isdir(directory) else set()
+        written_files = set()
+        query = self._season_query(name_schema, name_table, 'matches.season, exported.*', 'matches.season = %s')
+
+        exported_rows = 0
+        # A named cursor is executed on the server side and streams the rows in batches,
+        # so the whole season never has to fit into memory
+        with connection.cursor(name=f'export_{name_schema}_{name_table}') as cursor:
+            cursor.itersize = BATCH_SIZE
+            cursor.execute(f'{query} ORDER BY match_id;', (int(season),))
+
+            while True:
+                rows = cursor.fetchmany(BATCH_SIZE)
+                if not rows:
+                    break
+                file_path = self._write_file(name_table, rows, f'league={name_schema}', f'season={season}',
+                                             f'part-{rows[0][1]}-{rows[-1][1]}.parquet')
+                written_files.add(os.path.basename(file_path))
+                exported_rows += len(rows)
+
+        # The files of the previous export are only removed once the new ones are written
+        for file_name in previous_files - written_files:
+            os.remove(os.path.join(directory, file_name))
+        return exported_rows
+
+    def export_match_table(self, connection: extensions.connection, name_schema: str, name_table: str) -> int:
+        """
+        Exports the seasons of a match table whose rows changed since the last run,
+        if its watermark changed since then.
+
+        Args:
+            connection (extensions.connection): Database connection object.
+            name_schema (str): Schema name of the league.
+            name_table (str): One of MATCH_TABLES.
+
+        Returns:
+            Number of exported rows.
+        """
+        table_state = self.state.setdefault(name_schema, {}).get(name_table)
+        # The state of older runs held a 'match_id' high-water mark or the versions of the seasons only,
+        # every season is exported again once
+        if not isinstance(table_state, dict) or 'seasons' not in table_state:
+            table_state = {'watermark': None, 'seasons': {}}
+        self.state[name_schema][name_table] = table_state
+        exported = table_state['seasons']
+
+        # A table written before the watermarks were introduced has none, its seasons are compared every run
+        watermark = get_watermarks(connection, name_schema).get(name_table)
+        if watermark is not None and table_state['watermark'] == watermark:
+            return 0
+
+        # The watermark and the versions are read before the rows: a row written in between
+        # changes the watermark again and is exported next run
+        versions = self.season_versions(connection, name_schema, name_table)
+        exported_rows = 0
+        for season, version in sorted(versions.items()):
+            if exported.get(season) == version:
+                continue
+            exported_rows += self.export_season(connection, name_schema, name_table, season)
+            # A season is marked as exported once all its files are written, a failed run repeats it
+            exported[season] = version
+            self._write_state()
+
+        # A season without rows anymore (e.g. moved to another schema) is removed from the dataset
+        for season in set(exported) - set(versions):
+            shutil.rmtree(os.path.join(self.export_directory, name_table, f'league={name_schema}',
+                                       f'season={season}'), ignore_errors=True)
+            del exported[season]
+            self._write_state()
+
+        # The watermark is stored only once every changed season is exported, a failed run compares them again
+        table_state['watermark'] = watermark
+        self._write_state()
+        return exported_rows
+
+    def export_snapshot_table(self, connection: extensions.connection, name_schema: str, name_table: str) -> int:
+        """
+        Exports a full snapshot of a reference table, replacing the previous one.
+
+        Returns:
+            Number of exported rows.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT {SNAPSHOT_COLUMNS[name_table]} FROM {name_schema}.{name_table};')
+            rows = cursor.fetchall()
+
+        self._write_file(name_table, rows, f'league={name_schema}', 'snapshot.parquet')
+        return len(rows)
+
+    def export_league(self, connection: extensions.connection, name_schema: str) -> None:
+        """
+        Exports all tables of a league schema.
+        """
+        for name_table in SNAPSHOT_COLUMNS:
+            try:
+                rows = self.export_snapshot_table(connection, name_schema, name_table)
+                LOGGER.info(f'Exported a snapshot of {rows} rows of "{name_schema}.{name_table}".')
+            except Exception as e:
+                connection.rollback()
+                LOGGER.error(f'Error exporting "{name_schema}.{name_table}": {str(e).strip()}.')
+
+        for name_table in MATCH_TABLES:
+            try:
+                rows = self.export_match_table(connection, name_schema, name_table)
+                LOGGER.info(f'Exported {rows} new or changed rows of "{name_schema}.{name_table}".')
+            except Exception as e:
+                connection.rollback()
+                LOGGER.error(f'Error exporting "{name_schema}.{name_table}": {str(e).strip()}.')
+
+
+def main(leagues: Optional[List[str]] = None) -> None:
+    started = perf_counter()
+    exporter = ParquetExporter()
+
+    with connect_to_database() as connection:
+        # The export only reads, a read-only session guarantees it never writes to the database
+        connection.set_session(readonly=True)
+        for league, name_schema in league_manifest():
+            if leagues is None or league in leagues:
+                exporter.export_league(connection, name_schema)
+
+    export_run_metrics('export_parquet', 'all', exporter.exported_rows, perf_counter() - started)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,356 @@
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Tuple, Set, Any
+from psycopg2 import extensions
+from time import perf_counter, monotonic
+import threading
+import heapq
+import re
+
+from utils.database.connector import connect_to_database, insert_data, upsert_data
+from utils.database.summaries import refresh_summaries
+from utils.payloads import MatchDetails, Status
+from utils.constants import LIVE_MATCHES_FILE_LOG, LIVE_REQUESTS_PER_SECOND, LIVE_WORKERS
+from utils.fixture_calendar import fixtures_between, MATCH_DURATION
+from utils.metrics import METRICS, export_run_metrics
+from utils.link_mapper import league_manifest
+from utils.rate_limiter import RateLimiter
+from utils.profiler import profile_run
+from utils.logger import configure_logger
+from utils import reference_cache
+from scripts.match_details import FotmobDetails
+
+# Configure logger for the current module
+LOGGER = configure_logger(__name__, LIVE_MATCHES_FILE_LOG)
+
+# A match is tracked from shortly before its kickoff until it is finished,
+# but at most until this long after the expected end (delays, abandoned matches)
+TRACK_BEFORE_KICKOFF = timedelta(minutes=5)
+TRACK_AFTER_END = timedelta(hours=1)
+# How often the fixture calendars are re-read for matches entering the live window, in seconds
+FIXTURES_REFRESH_INTERVAL = 60.0
+
+# Poll intervals in seconds: fast around the kickoff and the full time, when the state changes most,
+# slow during the play and the half-time break. With 150 concurrent matches this averages to about
+# 4 requests per second, LIVE_REQUESTS_PER_SECOND caps the peaks
+INTERVAL_PRE_KICKOFF = 60.0
+INTERVAL_EDGE = 15.0
+INTERVAL_PLAY = 45.0
+INTERVAL_HALF_TIME = 180.0
+
+# The state of the matches in progress is provisional and kept apart from the league tables,
+# which only receive the final rows of a finished match (as the daily run writes them)
+LIVE_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS public.live_matches (
+        name_schema TEXT NOT NULL,
+        match_id INT NOT NULL,
+        home_id INT NOT NULL,
+        away_id INT NOT NULL,
+        score_home INT,
+        score_away INT,
+        status TEXT,
+        updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        PRIMARY KEY (name_schema, match_id)
+    );
+"""
+
+LIVE_UPSERT_QUERY = """
+    INSERT INTO public.live_matches (name_schema, match_id, home_id, away_id, score_home, score_away, status)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (name_schema, match_id) DO UPDATE
+    SET score_home = EXCLUDED.score_home, score_away = EXCLUDED.score_away, status = EXCLUDED.status,
+        updated_at = now();
+"""
+
+
+def _live_time(status: Status) -> Optional[str]:
+    return status.liveTime.short if status.liveTime else None
+
+
+def live_minute(status: Status) -> Optional[int]:
+    """
+    Returns the minute of a match in progress from its status, e.g. 67 for "67'" or 45 for "45+2'".
+    """
+    minute = re.match(r'\d+', _live_time(status) or '')
+    return int(minute.group()) if minute else None
+
+
+def live_status(status: Status) -> Optional[str]:
+    """
+    Returns the status of a match stored in 'match_details.reason': the final reason (e.g. 'Full-Time')
+    of a finished match, otherwise the live time (e.g. "67'" or 'HT').
+    """
+    return (status.reason.long if status.reason else None) or _live_time(status)
+
+
+def poll_interval(status: Status) -> float:
+    """
+    Returns the number of seconds until the next poll of a match with the given status.
+    """
+    if not status.started:
+        return INTERVAL_PRE_KICKOFF
+    if _live_time(status) == 'HT':
+        return INTERVAL_HALF_TIME
+
+    minute = live_minute(status)
+    if minute is None or minute <= 10 or minute >= 80:
+        return INTERVAL_EDGE
+    return INTERVAL_PLAY
+
+
+class LiveMatch:
+    """
+    A match tracked by the live mode.
+
+    Attributes:
+        state (Optional[Tuple]): Scores and status written last, a poll writes only when they change.
+    """
+    __slots__ = ('match_id', 'name_schema', 'season', 'kickoff', 'state')
+
+    def __init__(self, match_id: int, name_schema: str, season: int, kickoff: datetime):
+        self.match_id = match_id
+        self.name_schema = name_schema
+        self.season = season
+        self.kickoff = kickoff
+        self.state: Optional[Tuple[Any, ...]] = None
+
+
+class LiveMatches:
+    """
+    Polls the matches in progress of all leagues and writes their score and status as they change.
+
+    The matches enter from the fixture calendars (see 'utils.fixture_calendar') shortly before
+    their kickoff and are kept in a heap ordered by the time of their next poll. A pool of threads
+    polls the due matches through 'FotmobDetails', limited to LIVE_REQUESTS_PER_SECOND in total,
+    and every match is rescheduled at an interval depending on its state (see 'poll_interval').
+
+    The score and status of a match in progress are written to 'public.live_matches' only. Once the match
+    is finished, its final rows are written to the league tables, its summaries are refreshed and
+    its live row is removed. Every polling thread writes on a connection of its own.
+
+    Args:
+        connection (extensions.connection): Database connection object, used to read the fixtures.
+        leagues (Optional[List[str]]): Leagues to track, all leagues of the manifest by default.
+    """
+    def __init__(self, connection: extensions.connection, leagues: Optional[List[str]] = None):
+        self.connection = connection
+        self.schemas = [name_schema for league, name_schema in league_manifest()
+                        if leagues is None or league in leagues]
+
+        self.details: Dict[str, FotmobDetails] = {name_schema: FotmobDetails(name_schema)
+                                                  for name_schema in self.schemas}
+        self.stadiums: Dict[str, Set[str]] = {}
+        self.limiter = RateLimiter(LIVE_REQUESTS_PER_SECOND, burst=LIVE_WORKERS, name='fotmob_live')
+
+        self._heap: List[Tuple[float, int, LiveMatch]] = []
+        self._tracked: Dict[int, LiveMatch] = {}
+        self._retired: Set[int] = set()
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._connections: List[extensions.connection] = []
+        # Guards the counters and the stadiums, updated by all polling threads
+        self._lock = threading.Lock()
+
+        self.polls = 0
+        self.written_changes = 0
+        self.retired_matches = 0
+
+    def schedule(self, match: LiveMatch, delay: float) -> None:
+        with self._condition:
+            heapq.heappush(self._heap, (monotonic() + delay, match.match_id, match))
+            self._condition.notify()
+
+    def load_fixtures(self, now: datetime) -> None:
+        """
+        Starts tracking the fixtures that entered the live window since the previous call.
+        """
+        fixtures = fixtures_between(self.connection, self.schemas, now - MATCH_DURATION - TRACK_AFTER_END,
+                                    now + TRACK_BEFORE_KICKOFF)
+        for name_schema, match_id, season, kickoff in fixtures:
+            with self._condition:
+                if match_id in self._tracked or match_id in self._retired:
+                    continue
+                match = LiveMatch(match_id, name_schema, season, kickoff)
+                self._tracked[match_id] = match
+                self.schedule(match, max(0.0, (kickoff - now).total_seconds()))
+
+        METRICS.set('live_matches', len(self._tracked))
+
+    def _retire(self, match: LiveMatch) -> None:
+        with self._condition:
+            self._tracked.pop(match.match_id, None)
+            self._retired.add(match.match_id)
+        with self._lock:
+            self.retired_matches += 1
+        METRICS.set('live_matches', len(self._tracked))
+
+    def _connection(self) -> extensions.connection:
+        """
+        Returns the connection of the calling thread, opened on its first call.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = connect_to_database()
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+    def _stadiums(self, connection: extensions.connection, name_schema: str) -> Set[str]:
+        with self._lock:
+            if name_schema in self.stadiums:
+                return self.stadiums[name_schema]
+        with reference_cache.attach(connection, name_schema) as cache:
+            stadiums = set(cache.stadiums())
+        with self._lock:
+            return self.stadiums.setdefault(name_schema, stadiums)
+
+    def _write_live(self, connection: extensions.connection, match: LiveMatch, data: MatchDetails,
+                    status: Status) -> None:
+        home, away = data.header.teams
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(LIVE_UPSERT_QUERY, (match.name_schema, match.match_id, home.id, away.id,
+                                                   home.score, away.score, live_status(status)))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    def _remove_live(self, connection: extensions.connection, match: LiveMatch) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM public.live_matches WHERE name_schema = %s AND match_id = %s;',
+                           (match.name_schema, match.match_id))
+        connection.commit()
+
+    def _write_final(self, connection: extensions.connection, match: LiveMatch, data: MatchDetails) -> None:
+        details = self.details[match.name_schema]
+
+        # Only finished matches are inserted by the daily run, so the team and match rows may be missing
+        home, away = data.header.teams
+        insert_data(connection, match.name_schema, 'teams',
+                    [(home.id, home.name), (away.id, away.name)])
+        insert_data(connection, match.name_schema, 'matches',
+                    [(match.match_id, match.season, home.id, away.id)])
+
+        result, lineup, detail = details._get_rows(connection, match.match_id, data,
+                                                   self._stadiums(connection, match.name_schema))
+        for table, row in [('match_results', result), ('match_details', detail), ('match_lineups', lineup)]:
+            upsert_data(connection, match.name_schema, table, [row])
+        refresh_summaries(connection, match.name_schema, [match.match_id])
+
+    def poll(self, match: LiveMatch) -> None:
+        """
+        Fetches the match once, writes its changes and schedules the next poll or retires it.
+        """
+        connection = self._connection()
+        try:
+            self.limiter.acquire()
+            data = self.details[match.name_schema].fetch_data(
+                f'{self.details[match.name_schema].url}{match.match_id}', 'json', struct=MatchDetails
+            )
+            with self._lock:
+                self.polls += 1
+            METRICS.increment('live_polls_total')
+
+            status = data.header.status
+            finished = status.finished
+            if status.cancelled:
+                LOGGER.info(f'The match {match.match_id} of "{match.name_schema}" was cancelled.')
+                self._remove_live(connection, match)
+                self._retire(match)
+                return None
+
+            if finished:
+                self._write_final(connection, match, data)
+                self._remove_live(connection, match)
+                match.state = (data.header.teams[0].score, data.header.teams[1].score, live_status(status))
+                with self._lock:
+                    self.written_changes += 1
+                LOGGER.info(f'The match {match.match_id} of "{match.name_schema}" finished {match.state}.')
+                self._retire(match)
+                return None
+
+            if status.started:
+                # Most polls return the state of the previous one, it is only written when it changes
+                state = (data.header.teams[0].score, data.header.teams[1].score, live_status(status))
+                if state != match.state:
+                    self._write_live(connection, match, data, status)
+                    match.state = state
+                    with self._lock:
+                        self.written_changes += 1
+                    METRICS.increment('live_changes_total')
+
+        except Exception as e:
+            connection.rollback()
+            LOGGER.warning(f'Failed to poll the match {match.match_id} of "{match.name_schema}": {e}.')
+            status = None
+
+        if datetime.now(timezone.utc) > match.kickoff + MATCH_DURATION + TRACK_AFTER_END:
+            LOGGER.warning(f'The match {match.match_id} of "{match.name_schema}" is retired without a final status.')
+            # Its provisional state is dropped, the daily run writes the match once it is finished
+            try:
+                self._remove_live(connection, match)
+            except Exception:
+                connection.rollback()
+            self._retire(match)
+        else:
+            self.schedule(match, poll_interval(status) if status else INTERVAL_PLAY)
+
+    def run(self, until: Optional[datetime] = None) -> None:
+        """
+        Polls the live matches until 'until' (forever by default) or until interrupted.
+        """
+        next_refresh = 0.0
+        with ThreadPoolExecutor(max_workers=LIVE_WORKERS) as executor:
+            while until is None or datetime.now(timezone.utc) < until:
+                if monotonic() >= next_refresh:
+                    self.load_fixtures(datetime.now(timezone.utc))
+                    next_refresh = monotonic() + FIXTURES_REFRESH_INTERVAL
+
+                with self._condition:
+                    timeout = next_refresh - monotonic()
+                    if until is not None:
+                        timeout = min(timeout, (until - datetime.now(timezone.utc)).total_seconds())
+                    if self._heap:
+                        timeout = min(timeout, self._heap[0][0] - monotonic())
+                    if timeout > 0:
+                        self._condition.wait(timeout)
+                        continue
+
+                    due = []
+                    while self._heap and self._heap[0][0] <= monotonic():
+                        due.append(heapq.heappop(self._heap)[2])
+
+                for match in due:
+                    executor.submit(self.poll, match)
+
+
+def main(leagues: Optional[List[str]] = None, until: Optional[datetime] = None,
+         profile: Optional[bool] = None) -> None:
+    started = perf_counter()
+    with profile_run('live_matches', 'all', profile), connect_to_database() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(LIVE_TABLE_QUERY)
+        connection.commit()
+
+        live_matches = LiveMatches(connection, leagues)
+        try:
+            live_matches.run(until)
+        except KeyboardInterrupt:
+            LOGGER.info('The live mode was interrupted.')
+        finally:
+            live_matches.close()
+
+    LOGGER.info(f'The live mode made {live_matches.polls} polls, wrote {live_matches.written_changes} '
+                f'changes and retired {live_matches.retired_matches} finished matches.')
+    export_run_metrics('live_matches', 'all', live_matches.written_changes, perf_counter() - started)
+
+
+if __name__ == '__main__':
+    main()
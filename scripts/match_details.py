@@ -1,15 +1,36 @@
-from typing import Optional, Union, Tuple, Any, Set, List
-from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, Set, List, Dict
 from psycopg2 import extensions
+from datetime import datetime, timezone
+from time import perf_counter
+import threading
 
-from utils.database.connector import connect_to_database, insert_data
-from utils.constants import MATCH_DETAILS_FILE_LOG
+from utils.database.connector import connect_to_database, insert_data, upsert_data, copy_data, ThreadConnections
+from utils.database.summaries import refresh_summaries
+from utils.database.initializer import LATEST_SEASON_QUERY
+from utils.database import work_queue
+from utils.database.rows import MatchResultRow, MatchLineupRow, MatchDetailRow, MatchPlayerRow, stadium_row
+from utils.payloads import MatchDetails, LineupPlayer
+from utils.constants import MATCH_DETAILS_FILE_LOG, FOTMOB_API_URL, MAX_WORKERS
 from utils.link_mapper import format_string
+from utils.fixture_calendar import mark_success
+from utils import dead_letter
+from utils import reference_cache
+from utils.metrics import METRICS, export_run_metrics
+from utils.profiler import profile_run
 from utils.logger import configure_logger
 from utils.fetcher import Fetcher
 
 LOGGER = configure_logger(__name__, MATCH_DETAILS_FILE_LOG)
 
+# Minutes of a match without stoppage time, the end of the appearances of players not substituted out.
+# A match decided after extra time or on penalties ('reason.short' of the status) lasts EXTRA_TIME_MINUTE
+FULL_TIME_MINUTE = 90
+EXTRA_TIME_MINUTE = 120
+EXTRA_TIME_REASONS = ('AET', 'Pen')
+
+# Match ID and the rows of a parsed match: result, lineup, detail and appearances
+ParsedMatch = Tuple[int, MatchResultRow, MatchLineupRow, MatchDetailRow, List[MatchPlayerRow]]
+
 
 class FotmobDetails(Fetcher):
     """
@@ -23,167 +44,328 @@ class FotmobDetails(Fetcher):
         inserted_results (int): Number of rows successfully inserted into 'match_results' table.
         inserted_lineups (int): Number of rows successfully inserted into 'match_lineups' table.
         inserted_details (int): Number of rows successfully inserted into 'match_details' table.
+        inserted_players (int): Number of rows successfully copied into 'match_players' table.
+        inserted_match_ids (List[int]): IDs of the matches whose results or details were inserted or changed,
+            used to refresh only the affected groups of the summary tables.
+        updated_rows (int): Number of existing rows of the three tables whose values changed.
+        unchanged_rows (int): Number of existing rows of the three tables written again unchanged.
+        failed_match_ids (Set[int]): IDs of the matches whose last fetch, parse or write failed.
     """
     def __init__(self, name_schema: str):
         super().__init__()
         self.name_schema = name_schema
 
-        self.url = 'https://www.fotmob.com/api/matchDetails?matchId='
+        self.url = f'{FOTMOB_API_URL}matchDetails?matchId='
         self.inserted_results = 0
         self.inserted_lineups = 0
         self.inserted_details = 0
+        self.inserted_players = 0
+        self.inserted_match_ids: List[int] = []
+        self.updated_rows = 0
+        self.unchanged_rows = 0
+        self.failed_match_ids: Set[int] = set()
+        # The batches of a run are processed by several threads of the work queue
+        self._counters_lock = threading.Lock()
 
-    def _get_data(self, connection: extensions.connection,
-                  table_name: str, match_id: int,
-                  data: Any, stadiums: Set[str]) -> Optional[List[Optional[Union[int, str]]]]:
+    def _settle(self, written: List[int], failed: List[int]) -> None:
+        # A match released to the queue may succeed on a later attempt of the same run
+        with self._counters_lock:
+            self.failed_match_ids.difference_update(written)
+            self.failed_match_ids.update(failed)
+
+    def _get_rows(self, connection: extensions.connection, match_id: int,
+                  data: MatchDetails, stadiums: Set[str]) -> Tuple[MatchResultRow, MatchLineupRow, MatchDetailRow]:
         """
-        Process and extract specific data fields from a given match data dictionary.
+        Process and extract specific data fields from the decoded match data.
 
         Args:
             connection (extensions.connection): Database connection object for executing queries.
-            table_name (str): Name of the table where data will be inserted.
             match_id (int): ID of the match for which data is being processed.
-            data (Any): Dictionary containing match data fetched from the API.
+            data (MatchDetails): Match data fetched from the API.
             stadiums (Set[str]): Set containing names of stadiums already encountered.
 
         Returns:
-            Extracted data formatted as a list for insertion
-            into the specified table, or None if the table_name provided is invalid.
+            Rows for the 'match_results', 'match_lineups' and 'match_details' tables.
         """
-        content = data['content']
-        if content:
-            stadium = content['matchFacts']['infoBox']['Stadium']
-            attendance = content['matchFacts']['infoBox']['Attendance']
-            if stadium:
-                stadium = stadium.get('name', None)
+        content = data.content
+        match_facts = content.match_facts() if content else None
+        if match_facts and match_facts.infoBox:
+            info_box = match_facts.infoBox
+            stadium = info_box.stadium.name if info_box.stadium else None
+            attendance = info_box.attendance
         else:
             LOGGER.info(f'Stadium and attendance data are missing for match {match_id}.')
             stadium, attendance = None, None
         
         # If the stadium is absent in the 'stadiums' table, first add the new stadium name there
-        if stadium and stadium not in stadiums:
+        if stadium and stadium in stadiums:
+            METRICS.increment('cache_hits_total', cache='stadiums')
+        elif stadium:
+            METRICS.increment('cache_misses_total', cache='stadiums')
             stadiums.add(stadium)
-            new_stadium = [stadium, None, None, None, None, None, None]
-            insert_data(connection, self.name_schema, 'stadiums', [new_stadium])
+            insert_data(connection, self.name_schema, 'stadiums', [stadium_row(stadium)])
 
-        lineup = data['content']['lineup2']
+        lineup = content.lineup() if content else None
         if lineup:
-            lineup_ht = lineup['homeTeam'].get('formation', None)
-            lineup_at = lineup['awayTeam'].get('formation', None)
+            lineup_ht = lineup.homeTeam.formation
+            lineup_at = lineup.awayTeam.formation
         else:
             lineup_ht = None
             lineup_at = None
 
-        table = {
-            'match_results': [
+        return (
+            (
                 match_id,
-                data['header']['teams'][0]['score'],
-                data['header']['teams'][1]['score']
-            ],
-            'match_lineups': [
+                data.header.teams[0].score,
+                data.header.teams[1].score
+            ),
+            (
                 match_id,
                 lineup_ht,
                 lineup_at
-            ],
-            'match_details': [
+            ),
+            (
                 match_id,
-                data['general']['matchTimeUTCDate'].replace('T', ' ')[:-1],
+                data.general.matchTimeUTCDate.replace('T', ' ')[:-1],
                 stadium,
                 attendance,
-                data['header']['status']['reason']['long']
-            ]
-        }
+                data.header.status.reason.long
+            )
+        )
+
+    @staticmethod
+    def _get_player_rows(match_id: int, data: MatchDetails) -> List[MatchPlayerRow]:
+        """
+        Extracts the appearances of the players from the lineups of the match data.
+
+        A starter plays from the kickoff and a substitute from the 'subIn' event, both until their 'subOut'
+        event or the end of the match (after extra time if it was played). Substitutes who did not come on
+        and players without an ID have no appearance.
+
+        Args:
+            match_id (int): ID of the match for which data is being processed.
+            data (MatchDetails): Match data fetched from the API.
+
+        Returns:
+            Rows for the 'match_players' table.
+        """
+        lineup = data.content.lineup() if data.content else None
+        if not lineup:
+            return []
 
-        if table_name in table:
-            return table[table_name]
+        reason = data.header.status.reason
+        last_minute = EXTRA_TIME_MINUTE if reason and reason.short in EXTRA_TIME_REASONS else FULL_TIME_MINUTE
 
-        return None
+        def appearance(player: LineupPlayer, team_id: int, starter: bool) -> Optional[MatchPlayerRow]:
+            if player.id is None:
+                return None
+            performance = player.performance
+            events = {event.type: event.time for event in performance.substitutionEvents} if performance else {}
+            if not starter and events.get('subIn') is None:
+                return None
+
+            start = 0 if starter else events['subIn']
+            end = events.get('subOut') or max(last_minute, start)
+            return (match_id, player.id, team_id, player.name, player.usualPlayingPositionId,
+                    starter, performance.rating if performance else None, max(0, end - start))
+
+        rows = []
+        for team, header_team in zip((lineup.homeTeam, lineup.awayTeam), data.header.teams):
+            team_id = team.id if team.id is not None else header_team.id
+            for players, starter in ((team.starters, True), (team.subs, False)):
+                rows.extend(row for row in (appearance(player, team_id, starter) for player in players) if row)
+        return rows
+
+    def _write(self, connection: extensions.connection, parsed: List[ParsedMatch]) -> None:
+        """
+        Writes the rows of the parsed matches into the four tables and updates the counters.
+        """
+        results = [result for _, result, _, _, _ in parsed]
+        lineups = [lineup for _, _, lineup, _, _ in parsed]
+        details = [detail for _, _, _, detail, _ in parsed]
+        players = [player for *_, match_players in parsed for player in match_players]
+
+        # Corrected scores and late attendances replace the stored values, unchanged rows are left as they are
+        counts = [upsert_data(connection, self.name_schema, table, rows) for table, rows
+                  in [('match_results', results), ('match_lineups', lineups), ('match_details', details)]]
+        # About 30 rows per match, loaded with COPY instead of row by row
+        copied_players = copy_data(self.name_schema, 'match_players', players)
+
+        # Rows written again (unchanged or corrected) are counted as such, not as inserted
+        with self._counters_lock:
+            self.inserted_results += counts[0].inserted
+            self.inserted_lineups += counts[1].inserted
+            self.inserted_details += counts[2].inserted
+            self.inserted_players += copied_players
+            # Only the matches whose score or details changed touch the summaries, see 'refresh_summaries'
+            self.inserted_match_ids.extend({match_id for count in (counts[0], counts[2])
+                                            for match_id, in count.written_keys})
+            self.updated_rows += sum(count.updated for count in counts)
+            self.unchanged_rows += sum(count.unchanged for count in counts)
 
     def start_parse(self, connection: extensions.connection,
-                    matches: List[Tuple[int]], stadiums: Set[str]) -> None:
+                    matches: List[Tuple[int]], stadiums: Set[str]) -> List[int]:
         """
         Fetches match data from FOTMOB API, parses JSON content for
         'match_results', 'match_lineups', and 'match_details' tables,
         inserts data into the database, updates counters.
+
+        Every match is resolved in the dead-letter store or recorded there on its own: if the batch
+        cannot be written, its matches are written one by one, so one bad match does not fail the others.
+
+        Returns:
+            IDs of the matches whose fetch, parse or write failed.
         """
-        results, lineups, details = [], [], []
+        parsed: List[ParsedMatch] = []
+        failed = []
+        # Matches without data on FOTMOB are fetched successfully, but have no rows
+        written = []
 
         for match_id in matches:
             match_id = match_id[0]
 
+            # A failed match is recorded in the dead-letter store and retried by 'scripts.retry_failed',
+            # the rest of the batch is processed
             try:
                 fotmob_match_url = f'{self.url}{match_id}'
-                json_content = self.fetch_data(fotmob_match_url, 'json')
+                json_content = self.fetch_data(fotmob_match_url, 'json', struct=MatchDetails)
                 if not json_content:
                     LOGGER.warning(f'Failed to retrieve the element ' \
                                    f'code from the provided link "{fotmob_match_url}".')
-                    return None
+                    dead_letter.record_failure('match_details', self.name_schema, match_id, 'EmptyResponse')
+                    failed.append(match_id)
+                    continue
             except Exception as e:
                 LOGGER.warning(f'Failed to fetch data: {e}.')
-                return None
+                dead_letter.record_failure('match_details', self.name_schema, match_id, type(e).__name__, str(e))
+                failed.append(match_id)
+                continue
             
             # If there is no match data, the API will return a JSON of the form:
             # {"error": true, "message": "Data not found", "matchId": match_id}
             # If there is no error, parse the data.
-            if not json_content.get('error', False):
-                results.append(self._get_data(connection, 'match_results', match_id, json_content, stadiums))
-                lineups.append(self._get_data(connection, 'match_lineups', match_id, json_content, stadiums))
-                details.append(self._get_data(connection, 'match_details', match_id, json_content, stadiums))
+            if json_content.error:
+                written.append(match_id)
+                continue
 
-        try:
-            results = [match for match in results if match is not None]
-            lineups = [match for match in lineups if match is not None]
-            details = [match for match in details if match is not None]
-
-            insert_data(connection, self.name_schema, 'match_results', results)
-            insert_data(connection, self.name_schema, 'match_lineups', lineups)
-            insert_data(connection, self.name_schema, 'match_details', details)
+            parse_started = perf_counter()
+            try:
+                # The payload is processed once for all three tables
+                result, lineup, detail = self._get_rows(connection, match_id, json_content, stadiums)
+                # The appearances come from the same payload, at no extra request
+                parsed.append((match_id, result, lineup, detail, self._get_player_rows(match_id, json_content)))
+            except Exception as e:
+                LOGGER.warning(f'Failed to parse the match {match_id}: {e}.')
+                dead_letter.record_failure('match_details', self.name_schema, match_id, type(e).__name__, str(e))
+                failed.append(match_id)
+                continue
+            METRICS.observe('parse_seconds', perf_counter() - parse_started, script='match_details')
 
-            self.inserted_results += len(results)
-            self.inserted_lineups += len(lineups)
-            self.inserted_details += len(details)
+        try:
+            self._write(connection, parsed)
+            written.extend(match_id for match_id, *_ in parsed)
         except Exception as e:
-            LOGGER.error('The data was not successfully inserted.', e)
+            LOGGER.error(f'The data was not successfully inserted, the matches are written one by one: {str(e)}.')
+            for match in parsed:
+                try:
+                    self._write(connection, [match])
+                    written.append(match[0])
+                except Exception as match_error:
+                    LOGGER.error(f'The data of the match {match[0]} was not inserted: {str(match_error)}.')
+                    dead_letter.record_failure('match_details', self.name_schema, match[0],
+                                               type(match_error).__name__, str(match_error))
+                    failed.append(match[0])
+
+        dead_letter.resolve('match_details', self.name_schema, written)
+        self._settle(written, failed)
+        return failed
             
 
 def _batch(matches: List[Tuple[Optional[int]]], 
            batch_size: int = 50) -> List[List[Tuple[Optional[int]]]]:
     return [matches[i:i + batch_size] for i in range(0, len(matches), batch_size)]
 
-def main(league: str):
-    with connect_to_database() as connection, connection.cursor() as cursor:
-        name_schema = format_string(league)
-        fotmob_details = FotmobDetails(name_schema)
-
-        # If we want to get data for past game seasons, then 'season != MAX(season)'
-        query = f"""
-                SELECT match_id
-                FROM {name_schema}.matches
-                WHERE season = (SELECT MAX(season) FROM {name_schema}.matches);
-                """
-        cursor.execute(query)
-        match_ids = cursor.fetchall()
-        total_data = len(match_ids)
-
-        query = f'SELECT stadium FROM {name_schema}.stadiums;'
-        cursor.execute(query)
-        stadiums = cursor.fetchall()
-        cursor.close()
-
-        # In the Fotmob source, the data on stadiums is incomplete.
-        # They are not available on the team pages but can be found in the list matches.
-        # Therefore, we need to process them separately to avoid foreign key exceptions
-        stadiums = set(stadium[0] for stadium in stadiums)
-
-        # 'match_ids' data is batched into 50 packets to avoid overloading the database
-        with ThreadPoolExecutor() as executor:
-            executor.map(
-                lambda matches: fotmob_details.start_parse(connection, matches, stadiums), 
-                _batch(match_ids)
-            )
+
+def consume_queue(details: Dict[str, FotmobDetails], name_schema: Optional[str] = None) -> int:
+    """
+    Processes the 'match_details' items of the work queue (see 'utils.database.work_queue')
+    in batches of 50 matches, until the queue is drained by this and all other workers.
+    Every thread of the queue writes on a connection of its own.
+
+    Args:
+        details (Dict[str, FotmobDetails]): Parsers by schema name, created for the schemas met
+            in the queue, whose counters are filled by the processed matches.
+        name_schema (Optional[str]): Process only the matches of this schema, all schemas by default.
+
+    Returns:
+        The number of matches processed.
+    """
+    stadiums: Dict[str, Set[str]] = {}
+    lock = threading.Lock()
+    connections = ThreadConnections()
+
+    def process(schema: str, match_ids: List[str]) -> List[str]:
+        connection = connections.get()
+        with lock:
+            if schema not in stadiums:
+                details.setdefault(schema, FotmobDetails(schema))
+                # In the Fotmob source, the data on stadiums is incomplete.
+                # They are not available on the team pages but can be found in the list matches.
+                # Therefore, we need to process them separately to avoid foreign key exceptions
+                with reference_cache.attach(connection, schema) as cache:
+                    stadiums[schema] = set(cache.stadiums())
+
+        # The failed matches are released to the queue for another attempt, the others are completed
+        failed = details[schema].start_parse(connection, [(int(match_id),) for match_id in match_ids],
+                                             stadiums[schema])
+        return [str(match_id) for match_id in failed]
+
+    with connections:
+        return work_queue.drain('match_details', process, name_schema, batch_size=50, workers=MAX_WORKERS)
+
+
+def main(league: str, profile: Optional[bool] = None):
+    started = perf_counter()
+    started_at = datetime.now(timezone.utc)
+    with profile_run('match_details', format_string(league), profile):
+        with connect_to_database() as connection, connection.cursor() as cursor:
+            name_schema = format_string(league)
+            fotmob_details = FotmobDetails(name_schema)
+
+            # If we want to get data for past game seasons, then 'season != MAX(season)';
+            # the plan of this query is checked by 'initializer.check_query_plans'
+            cursor.execute(LATEST_SEASON_QUERY.format(name_schema=name_schema))
+            match_ids = cursor.fetchall()
+            total_data = len(match_ids)
+
+            cursor.close()
+
+            # The matches are queued, so that workers on other hosts ('scripts.queue_worker') can share them
+            work_queue.enqueue(connection, 'match_details', name_schema, [match_id for match_id, in match_ids])
+            consume_queue({name_schema: fotmob_details}, name_schema)
         
-        LOGGER.info(f'For the schema "{fotmob_details.name_schema}", ' \
-                    f'{fotmob_details.inserted_results}, {fotmob_details.inserted_lineups}, ' \
-                    f'and {fotmob_details.inserted_details} rows of data were successfully ' \
-                    f'inserted into the tables "match_results", "match_lineups", and "match_details" ' \
-                    f'respectively out of a total possible matches from {total_data}.')
+            LOGGER.info(f'For the schema "{fotmob_details.name_schema}", ' \
+                        f'{fotmob_details.inserted_results}, {fotmob_details.inserted_lineups}, ' \
+                        f'{fotmob_details.inserted_details} and {fotmob_details.inserted_players} rows of data ' \
+                        f'were successfully inserted into the tables "match_results", "match_lineups", ' \
+                        f'"match_details" and "match_players" ' \
+                        f'respectively out of a total possible matches from {total_data}; ' \
+                        f'{fotmob_details.updated_rows} existing rows were updated and ' \
+                        f'{fotmob_details.unchanged_rows} were unchanged.')
+
+            try:
+                refresh_summaries(connection, name_schema, fotmob_details.inserted_match_ids)
+            except Exception:
+                LOGGER.warning(f'The summary tables of the schema "{name_schema}" were not refreshed.')
+
+            # The next runs of the league are skipped until one of its matches finishes after 'started_at',
+            # so a run with failed matches is not marked and the next one processes the league again
+            if fotmob_details.failed_match_ids:
+                LOGGER.warning(f'{len(fotmob_details.failed_match_ids)} matches of "{name_schema}" failed, '
+                               f'the run is not marked as successful.')
+            else:
+                mark_success(connection, name_schema, started_at)
+
+    export_run_metrics('match_details', fotmob_details.name_schema,
+                       fotmob_details.inserted_results + fotmob_details.inserted_lineups +
+                       fotmob_details.inserted_details + fotmob_details.inserted_players, perf_counter() - started)
@@ -1,28 +1,85 @@
-from utils.db_connector import connect_to_database
-from concurrent.futures import ThreadPoolExecutor
+from utils.database.connector import connect_to_database, ThreadConnections
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from utils.constants import (MATCH_STATISTICS_FILE_LOG, TRANSFERMARKT_ATTENDANCE_CACHE,
+                             TRANSFERMARKT_REQUESTS_PER_SECOND, TRANSFERMARKT_WORKERS)
+from utils.metrics import METRICS, export_run_metrics
+from utils.profiler import profile_run
 from utils.logger import configure_logger
 from utils.json_helper import JsonHelper
-from bs4 import BeautifulSoup
-from typing import Optional
+from utils.html_parsers import parse_skysports_statistics, parse_transfermarkt_attendance
+from utils.parse_pool import ParsePool
+from utils.rate_limiter import RateLimiter
+from urllib.parse import urlparse
+from time import perf_counter
+from typing import Optional, Dict, List
+import threading
 import requests
+import json
 import re
 import os
 
-LOG_FILE_NAME = 'match_statistics.log'
-LOGGER = configure_logger(__name__, LOG_FILE_NAME)
+LOGGER = configure_logger(__name__, MATCH_STATISTICS_FILE_LOG)
 
 PROJECT_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
 RESOURCE_CATALOG = 'resources'
 
 
+class AttendanceCache:
+    """
+    A persistent cache of the attendances extracted from Transfermarkt, keyed by the page URL.
+
+    The attendance of a finished match does not change, so every page is downloaded once ever.
+    Only found attendances are cached: a page without one is requested again on the next run.
+
+    Args:
+        file_path (str): Path of the JSON file of the cache.
+    """
+    def __init__(self, file_path: str = os.path.join(PROJECT_DIRECTORY, RESOURCE_CATALOG,
+                                                     TRANSFERMARKT_ATTENDANCE_CACHE)):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._attendances: Dict[str, int] = {}
+
+        if os.path.exists(file_path):
+            with open(file_path, encoding='utf-8') as file:
+                self._attendances = json.load(file)
+
+    def get(self, url: str) -> Optional[int]:
+        return self._attendances.get(url)
+
+    def set(self, url: str, attendance: int) -> None:
+        with self._lock:
+            self._attendances[url] = attendance
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        temporary_path = f'{self.file_path}.tmp'
+        with self._lock, open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(self._attendances, file, indent=2, sort_keys=True)
+        os.replace(temporary_path, self.file_path)
+
+
 class SkySportsParser:
-    def __init__(self, connection, competition: str, transfermarkt_urls: dict):
+    def __init__(self, connection, competition: str, transfermarkt_urls: dict, parse_pool: ParsePool):
         self.connection = connection
         self.competition = competition
         self.transfermarkt_urls = transfermarkt_urls
+        # The pages are fetched in threads and parsed in the processes of the pool
+        self.parse_pool = parse_pool
+
+        # Attendances missing on SkySports are looked up on Transfermarkt in a separate stage:
+        # a few threads limited to TRANSFERMARKT_REQUESTS_PER_SECOND, so the SkySports pass never waits for them.
+        # They write on connections of their own: a commit or rollback on the connection of the SkySports
+        # threads would end their transactions halfway
+        self.attendance_cache = AttendanceCache()
+        self.transfermarkt_connections = ThreadConnections()
+        self.transfermarkt_limiter = RateLimiter(TRANSFERMARKT_REQUESTS_PER_SECOND, name='transfermarkt')
+        self.transfermarkt_executor = ThreadPoolExecutor(max_workers=TRANSFERMARKT_WORKERS)
+        self.transfermarkt_lookups: List[Future] = []
 
         self.updated_values = 0
         self.added_values = 0
+        self.transfermarkt_attendances = 0
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
                           'Chrome/91.0.4472.124 Safari/537.36'
@@ -38,32 +95,20 @@ class SkySportsParser:
         Returns:
             Optional[bytes]: The fetched HTML content as bytes or None if an error occurs.
         """
-        response = requests.get(url, headers=self.headers)
+        host = urlparse(url).netloc
+        with METRICS.timer('fetch_seconds', host=host):
+            response = requests.get(url, headers=self.headers)
+        METRICS.increment('fetch_requests_total', host=host, status=response.status_code)
 
         if response.status_code == 200:
             return response.content
         elif response.status_code == 404:
+            METRICS.increment('fetch_retries_total', host=host)
             self.get_html(url)
         else:
             LOGGER.error(f'Error {response.status_code} occurred while fetching {url}.')
             return None
 
-    @staticmethod
-    def extract_num(text: str) -> Optional[int]:
-        """
-        Helper method to extract a number from the text.
-
-        Args:
-            text (str): Text from which to extract the number.
-
-        Returns:
-            Optional[int]: Extracted number (if possible), otherwise None.
-        """
-        try:
-            return int(''.join(filter(lambda x: x.isdigit(), text)))
-        except ValueError:
-            return None
-
     def insert_data_in_database(self, cursor, table_name: str, values: list) -> bool:
         """
         Inserts values into the database.
@@ -147,87 +192,80 @@ class SkySportsParser:
             LOGGER.warning(f'Failed to retrieve "match_id" from the link "{url}".')
             return None
 
-    @staticmethod
-    def get_stadium(info_block) -> Optional[str]:
+    def get_transfermarkt_url(self, url: str) -> Optional[str]:
         """
-        Extracts the stadium information from the HTML block.
-
-        Args:
-            info_block: HTML block with match information.
-
-        Returns:
-            Optional[str]: Stadium name (if available), otherwise an empty string.
+        Returns the Transfermarkt page of a SkySports match page, None if it is unknown.
         """
-        # We check 'stadium' for the absence of a block in the HTML
-        tag_name, attribute_name = 'span', 'sdc-site-match-header__detail-venue--with-seperator'
-        stadium_element = info_block.find(tag_name, class_=attribute_name)
+        # Use a regular expression to extract the match key from the URL
+        # Example: 'https://www.skysports.com/football/lille-vs-metz/teams/487403' -> 'lille-vs-metz'
+        skysports_key = re.search(r'([^/]+)-vs-([^/]+)', url).group()
+        transfermarkt_url = self.transfermarkt_urls.get(skysports_key, '')
 
-        # The search is conducted using the SkySports as the source
-        if not stadium_element:
-            try:
-                LOGGER.warning(f'Stadium information not found in primary source (SkySports) with '
-                               f'tag "{tag_name}" and attribute "{attribute_name}".')
-
-                attribute_name = 'sdc-site-match-header__detail-venue'
-                LOGGER.info(f'Attempting to search with tag "{tag_name}" and attribute "{attribute_name}".')
-
-                # The last character is not considered because the page
-                # element's code for the stadium name includes a period (".") at the end
-                # Example 'Stade Bollaert-Delelis.'
-                return info_block.find(tag_name, class_=attribute_name).text.strip()[:-1]
-
-            except AttributeError:
-                LOGGER.warning('The stadium name is not present in the SkySports source. '
-                               'The search will proceed in the Transfermarkt source.')
-                # I will add the method as soon as
-                # I find a link with match statistics that is not available on SkySports
-                return None
+        if transfermarkt_url == '':
+            LOGGER.warning(f'Transfermarkt URL not found for key "{skysports_key}" in LinkMapper.')
+            return None
+        return transfermarkt_url
 
-        return stadium_element.text.strip()
+    def queue_attendance(self, match_id: int, transfermarkt_url: str) -> None:
+        """
+        Queues the lookup of an attendance on Transfermarkt.
+        """
+        self.transfermarkt_lookups.append(
+            self.transfermarkt_executor.submit(self.get_attendance, match_id, transfermarkt_url)
+        )
 
-    def get_attendance(self, info_block, url: str) -> Optional[int]:
+    def get_attendance(self, match_id: int, transfermarkt_url: str) -> Optional[int]:
         """
-        Method for extracting attendance information (if available) from an HTML block.
+        Retrieves the attendance of a match from Transfermarkt and stores it in the database and the cache.
 
         Args:
-            info_block: HTML block with match information.
-            url: URL of the match page.
+            match_id (int): Unique identifier for the match.
+            transfermarkt_url (str): URL of the Transfermarkt match page.
 
         Returns:
             int: Number of attendees (if available), otherwise None.
         """
-        # Check for the presence of the 'attendance' block in HTML
-        attendance_element = info_block.find('span', class_='sdc-site-match-header__detail-attendance')
-
-        # If the number of viewers on the SkySports page is not detected,
-        # we attempt to retrieve data from the Transfermarkt page
-        if attendance_element:
-            attendance_text = attendance_element.text.strip()
-
-            # Use a helper method to extract the number from the text
-            return self.extract_num(attendance_text)
-        else:
-            # Use a regular expression to extract the match key from the URL
-            # Example: 'https://www.skysports.com/football/lille-vs-metz/teams/487403' -> 'lille-vs-metz'
-            skysports_key = re.search(r'([^/]+)-vs-([^/]+)', url).group()
-            transfermarkt_url = self.transfermarkt_urls.get(skysports_key, '')
-
-            if transfermarkt_url == '':
-                LOGGER.warning(f'Transfermarkt URL not found for key "{skysports_key}" in LinkMapper.')
-                return None
-
+        try:
+            self.transfermarkt_limiter.acquire()
             # Get the HTML content from Transfermarkt
             html_content = self.get_html(transfermarkt_url)
-            soup_tm = BeautifulSoup(html_content, 'html.parser')
+            if not html_content:
+                return None
 
-            try:
-                # Extract the attendance text from the Transfermarkt page
-                attendance_text = soup_tm.find('p', class_='sb-zusatzinfos').find('strong').text.strip()
-            except Exception as e:
-                LOGGER.warning(f'Failed to extract attendance from Transfermarkt: {str(e).strip()}.')
+            attendance = self.parse_pool.parse(parse_transfermarkt_attendance, html_content,
+                                               script='match_statistics_transfermarkt')
+            if attendance is None:
+                LOGGER.warning(f'Failed to extract attendance from Transfermarkt "{transfermarkt_url}".')
                 return None
 
-            return self.extract_num(attendance_text)
+            self.attendance_cache.set(transfermarkt_url, attendance)
+            connection = self.transfermarkt_connections.get()
+            try:
+                with METRICS.timer('db_write_seconds', table='info_clashes'), connection.cursor() as cursor:
+                    cursor.execute(f'UPDATE {self.competition}.info_clashes SET attendance = %s WHERE match_id = %s',
+                                   (attendance, match_id))
+                    connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            self.transfermarkt_attendances += 1
+            return attendance
+
+        except Exception as e:
+            LOGGER.warning(f'Failed to get the attendance of the match {match_id} '
+                           f'from Transfermarkt: {str(e).strip()}.')
+            return None
+
+    def wait_attendances(self) -> None:
+        """
+        Waits for the queued Transfermarkt lookups, closes their connections and saves the cache.
+        """
+        try:
+            wait(self.transfermarkt_lookups)
+            self.transfermarkt_executor.shutdown()
+        finally:
+            self.transfermarkt_connections.close()
+            self.attendance_cache.save()
 
     @staticmethod
     def transform_list(team: list) -> list:
@@ -243,22 +281,6 @@ class SkySportsParser:
         """
         return [team[:2] + team[3:-2]]
 
-    @staticmethod
-    def append_statistics(block_events, team_statistics: list):
-        """
-        Appends statistics values from the provided block of events to the given team_statistics list.
-
-        Args:
-            block_events: Block of events containing statistics information.
-            team_statistics (list): List to which the statistics values will be appended.
-        """
-        for event in block_events:
-            value_event = event.find(class_='sdc-site-match-stats__val')
-            try:
-                team_statistics.append(int(value_event.text.strip()))
-            except ValueError:
-                team_statistics.append(float(value_event.text.strip()))
-
     def parse_statistics(self, url: str):
         """
         Parses match statistics from the provided URL and updates the database.
@@ -274,58 +296,69 @@ class SkySportsParser:
             # I will add the method as soon as I find a link with match statistics that is not available on SkySports
             return None
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        head_match_info = soup.find(class_='sdc-site-match-header__detail')
+        # Only the compact result of the parsing comes back from the worker process
+        stadium, attendance, home_statistics, away_statistics = self.parse_pool.parse(
+            parse_skysports_statistics, html_content, script='match_statistics'
+        )
 
         match_id = self.get_match_id(url)
-        stadium = self.get_stadium(head_match_info)
-        attendance = self.get_attendance(head_match_info, url)
+        if stadium is None:
+            LOGGER.warning(f'The stadium name of the match "{url}" is not present in the SkySports source.')
+        # If the number of viewers on the SkySports page is not detected,
+        # we take it from the Transfermarkt page: from the cache or, if it was never downloaded, by a lookup
+        transfermarkt_url = self.get_transfermarkt_url(url) if attendance is None else None
+        if transfermarkt_url:
+            attendance = self.attendance_cache.get(transfermarkt_url)
+            METRICS.increment('cache_hits_total' if attendance is not None else 'cache_misses_total',
+                              cache='transfermarkt_attendance')
 
         if match_id == 489311:
             print(match_id, stadium, attendance)
 
-        with self.connection.cursor() as cursor:
+        with METRICS.timer('db_write_seconds', table='info_clashes'), self.connection.cursor() as cursor:
             self.update_data_in_database(cursor, match_id, stadium, attendance)
 
-        # Initializing lists to store match statistics values for the away and home teams
-        home_team = [match_id]
-        away_team = [match_id]
+        # The lookup is queued only after the row is updated, so its attendance is never overwritten
+        if transfermarkt_url and attendance is None:
+            self.queue_attendance(match_id, transfermarkt_url)
 
-        # Finding the block in the HTML with the statistics and extracting it
-        table_statistics = soup.find(class_='sdc-site-match-stats__inner')
+        # Lists of match statistics values for the home and away teams
+        home_team = [match_id, *home_statistics]
+        away_team = [match_id, *away_statistics]
 
-        home_statistics = table_statistics.find_all(class_='sdc-site-match-stats__stats-home')
-        self.append_statistics(home_statistics, home_team)
-
-        away_statistics = table_statistics.find_all(class_='sdc-site-match-stats__stats-away')
-        self.append_statistics(away_statistics, away_team)
-
-        with self.connection.cursor() as cursor:
+        with METRICS.timer('db_write_seconds', table='match_statistics'), self.connection.cursor() as cursor:
             self.insert_data_in_database(cursor, 'home_match_statistics', self.transform_list(home_team))
             self.insert_data_in_database(cursor, 'away_match_statistics', self.transform_list(away_team))
+            self.connection.commit()
+
 
-        self.connection.commit()
+def main(competition: str, profile: Optional[bool] = None):
+    started = perf_counter()
+    with profile_run('match_statistics', competition, profile):
+        competition_urls = JsonHelper()
+        # Open the json file that contains URLs of all matches current competition
+        competition_urls.read(os.path.join(PROJECT_DIRECTORY, RESOURCE_CATALOG, f'{competition}_urls.json'))
 
+        # Obtain a list of links necessary for extracting data and adding it to the database
+        skysports_urls = competition_urls.get(competition, 'skysports_teams_urls')
+        # Obtain a hashmap of links in order to supplement missing data in the SkySports source
+        transfermarkt_hashmap = competition_urls.get(competition, 'transfermarkt_urls')
 
-def main(competition: str):
-    competition_urls = JsonHelper()
-    # Open the json file that contains URLs of all matches current competition
-    competition_urls.read(os.path.join(PROJECT_DIRECTORY, RESOURCE_CATALOG, f'{competition}_urls.json'))
+        with connect_to_database() as connection, ParsePool() as parse_pool:
+            sky_sports_parser = SkySportsParser(connection, competition, transfermarkt_hashmap, parse_pool)
 
-    # Obtain a list of links necessary for extracting data and adding it to the database
-    skysports_urls = competition_urls.get(competition, 'skysports_teams_urls')
-    # Obtain a hashmap of links in order to supplement missing data in the SkySports source
-    transfermarkt_hashmap = competition_urls.get(competition, 'transfermarkt_urls')
+            with ThreadPoolExecutor() as executor:
+                executor.map(sky_sports_parser.parse_statistics, skysports_urls)
+            sky_sports_parser.wait_attendances()
 
-    with connect_to_database() as connection:
-        sky_sports_parser = SkySportsParser(connection, competition, transfermarkt_hashmap)
+        LOGGER.info(f'In the schema "{competition}", '
+                    f'"{sky_sports_parser.updated_values}" rows of data have been updated for the table "info_clashes".')
 
-        with ThreadPoolExecutor() as executor:
-            executor.map(sky_sports_parser.parse_statistics, skysports_urls)
+        LOGGER.info(f'In the schema "{competition}", "{sky_sports_parser.added_values}" new rows '
+                    f'were added to the tables "home_match_statistics" with "away_match_statistics".')
 
-    LOGGER.info(f'In the schema "{competition}", '
-                f'"{sky_sports_parser.updated_values}" rows of data have been updated for the table "info_clashes".')
+        LOGGER.info(f'In the schema "{competition}", "{sky_sports_parser.transfermarkt_attendances}" '
+                    f'attendances were downloaded from Transfermarkt.')
 
-    LOGGER.info(f'In the schema "{competition}", "{sky_sports_parser.added_values}" new rows '
-                f'were added to the tables "home_match_statistics" with "away_match_statistics".')
+    export_run_metrics('match_statistics', competition,
+                       sky_sports_parser.updated_values + sky_sports_parser.added_values, perf_counter() - started)
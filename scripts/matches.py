@@ -1,10 +1,15 @@
-from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Union, List, Set, Tuple
+from typing import Optional, List, Set, Tuple
 from psycopg2 import extensions
+from time import perf_counter
 
-from utils.database.connector import connect_to_database, insert_data
-from utils.constants import MATCHES_FILE_LOG, HASHMAP_LEAGUE_IDS
+from utils.database.connector import connect_to_database, insert_data, upsert_data
+from utils.database.rows import TeamRow, MatchRow
+from utils.constants import MATCHES_FILE_LOG, HASHMAP_LEAGUE_IDS, FOTMOB_API_URL
 from utils.link_mapper import format_string
+from utils.fixture_calendar import update_calendar, is_stale, has_finished_matches
+from utils import dead_letter
+from utils.metrics import METRICS, ScopedExecutor, export_run_metrics
+from utils.profiler import profile_run
 from utils.logger import configure_logger
 from utils.fetcher import Fetcher
 
@@ -29,7 +34,7 @@ class FotmobMatches(Fetcher):
         super().__init__()
         self.league = league
 
-        self.url = 'https://www.fotmob.com/api/'
+        self.url = FOTMOB_API_URL
         self.schema_name = format_string(league)
         self.finished_matches = 0
         self.total_matches = 0
@@ -37,7 +42,7 @@ class FotmobMatches(Fetcher):
     @staticmethod
     def _process_match(
         match: dict, season: str,
-        teams: Set[Tuple[int, str]]) -> Optional[List[Union[int, str]]]:
+        teams: Set[TeamRow]) -> Optional[MatchRow]:
         """
         Process a single match to extract relevant data.
 
@@ -47,13 +52,13 @@ class FotmobMatches(Fetcher):
             teams (Set[Tuple[int, str]]): 
 
         Returns:
-            A list containing match ID, season, home team name,
-            and away team name, or None if the match is not finished.
+            A row containing match ID, season, home team ID,
+            and away team ID, or None if the match is not finished.
         """
         if match.get('status', {}).get('finished', False):
             teams.add((match['home']['id'], match['home']['name']))
             
-            return [match['id'], int(season[:4]), match['home']['id'], match['away']['id']]
+            return (match['id'], int(season[:4]), match['home']['id'], match['away']['id'])
         
         return None
     
@@ -73,26 +78,38 @@ class FotmobMatches(Fetcher):
 
             if not json_content:
                 LOGGER.warning(f'Failed to retrieve the json from the provided link "{matches_url}".')
+                dead_letter.record_failure('matches', self.schema_name, season, 'EmptyResponse')
                 return None
         except Exception as e:
             LOGGER.warning(f'Failed to fetch data: {e}.')
+            dead_letter.record_failure('matches', self.schema_name, season, type(e).__name__, str(e))
             return None
         
+        dead_letter.resolve('matches', self.schema_name, [season])
         matches = json_content.get('matches', {}).get('allMatches', [])
         # Counting the total amount of data across all seasons, including both finished and unfinished
         self.total_matches += len(matches)
 
+        # The kickoff times of all fixtures decide when the league has work again (see 'matches_parser_dag')
+        try:
+            update_calendar(connection, self.schema_name, matches, season)
+        except Exception as e:
+            LOGGER.warning(f'The fixture calendar of "{self.schema_name}" was not updated: {e}.')
+
         # Collecting all possible unique pairs (team id, team title) into a set
         teams = set()
 
-        with ThreadPoolExecutor() as executor:
-            season_matches = executor.map(lambda match: self._process_match(match, season, teams), matches)
+        with METRICS.timer('parse_seconds', script='matches'), ScopedExecutor() as executor:
+            season_matches = list(executor.map(lambda match: self._process_match(match, season, teams), matches))
         
         # Initially adding command keys to the database, ensuring no foreign key exceptions occur
-        season_teams = [[team[0], team[1]] for team in teams if team is not None]
+        season_teams = [team for team in teams if team is not None]
         if season_teams:
             try:
-                insert_data(connection, self.schema_name, 'teams', season_teams)
+                # Renamed teams replace their stored titles
+                counts = upsert_data(connection, self.schema_name, 'teams', season_teams)
+                if counts.updated:
+                    LOGGER.info(f'{counts.updated} teams of "{self.schema_name}" were renamed.')
             except Exception:
                 LOGGER.error(f'League data "{self.schema_name}" for the season {season_teams} was not inserted.')
                 return None
@@ -110,6 +127,24 @@ class FotmobMatches(Fetcher):
                 LOGGER.error(f'League data "{self.schema_name}" for the season {season_teams} was not inserted.')
                 return None
 
+    def refresh_calendar(self, connection: extensions.connection) -> None:
+        """
+        Updates the fixture calendar of the current season, without writing any match data.
+        """
+        id_league = HASHMAP_LEAGUE_IDS[self.league][0]
+        if id_league is None:
+            raise ValueError(f'The FOTMOB source does not have data for the league "{self.league}"')
+
+        league_content = self.fetch_data(self.url + f'leagues?id={id_league}', 'json')
+        available_seasons = (league_content or {}).get('allAvailableSeasons') or []
+        if not available_seasons:
+            raise ValueError(f'No seasons were returned for the league "{self.league}"')
+
+        season = available_seasons[0]
+        season_content = self.fetch_data(self.url + f'leagues?id={id_league}&season={season}', 'json')
+        matches = (season_content or {}).get('matches', {}).get('allMatches', [])
+        update_calendar(connection, self.schema_name, matches, season)
+
     def start_parse(self) -> None:
         """
         Parse and extract match data for the specified league and insert it into the database.
@@ -148,6 +183,28 @@ class FotmobMatches(Fetcher):
                     f'"{self.schema_name}.matches" table (finished matches).')
 
 
-def main(league: str) -> None:
+def league_has_work(league: str) -> bool:
+    """
+    Checks whether a match of the league has finished since its last successful run (see 'utils.fixture_calendar').
+
+    A calendar older than CALENDAR_REFRESH_AGE is refreshed first with two requests, so rescheduled
+    fixtures are picked up while the runs of the league are skipped. If the refresh fails,
+    the league is decided on the calendar it has.
+    """
+    fotmob_matches = FotmobMatches(league)
+    with connect_to_database() as connection:
+        if is_stale(connection, fotmob_matches.schema_name):
+            try:
+                fotmob_matches.refresh_calendar(connection)
+            except Exception as e:
+                LOGGER.warning(f'The fixture calendar of "{fotmob_matches.schema_name}" was not refreshed: {e}.')
+        return has_finished_matches(connection, fotmob_matches.schema_name)
+
+
+def main(league: str, profile: Optional[bool] = None) -> None:
+    started = perf_counter()
     fotmob_matches = FotmobMatches(league)
-    fotmob_matches.start_parse()
+    with profile_run('matches', fotmob_matches.schema_name, profile):
+        fotmob_matches.start_parse()
+    export_run_metrics('matches', fotmob_matches.schema_name,
+                       fotmob_matches.finished_matches, perf_counter() - started)
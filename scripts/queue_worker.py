@@ -0,0 +1,77 @@
+from typing import Optional, Dict
+from time import perf_counter
+import argparse
+
+from utils.database.connector import connect_to_database
+from utils.database.summaries import refresh_summaries
+from utils.constants import QUEUE_WORKER_FILE_LOG, EAFC_SCHEMA
+from utils.link_mapper import format_string
+from utils.metrics import export_run_metrics
+from utils.profiler import profile_run
+from utils.logger import configure_logger
+
+# Configure logger for the current module
+LOGGER = configure_logger(__name__, QUEUE_WORKER_FILE_LOG)
+
+SOURCES = ['match_details', 'stadiums', 'players']
+
+
+def run_worker(source: str, league: Optional[str] = None) -> int:
+    """
+    Drains the items of a source from the work queue (see 'utils.database.work_queue').
+
+    The DAG tasks queue the work of a league and process it themselves, any number of these
+    workers started on other hosts share it with them. A worker exits once the queue is drained.
+
+    Args:
+        source (str): 'match_details', 'stadiums' or 'players'.
+        league (Optional[str]): Process only the items of this league, all leagues by default.
+
+    Returns:
+        The number of items processed.
+    """
+    name_schema = format_string(league) if league else None
+
+    with connect_to_database() as connection:
+        if source == 'match_details':
+            from scripts.match_details import consume_queue, FotmobDetails
+
+            details: Dict[str, FotmobDetails] = {}
+            processed = consume_queue(details, name_schema)
+            # The summary groups of the matches inserted by this worker are refreshed by it
+            for schema, fotmob_details in details.items():
+                try:
+                    refresh_summaries(connection, schema, fotmob_details.inserted_match_ids)
+                except Exception:
+                    LOGGER.warning(f'The summary tables of the schema "{schema}" were not refreshed.')
+
+        elif source == 'stadiums':
+            from scripts.stadiums import consume_queue
+            processed = consume_queue({}, name_schema)
+
+        elif source == 'players':
+            from scripts.eafc.futgg import PlayersParser
+            processed = PlayersParser(EAFC_SCHEMA).consume_queue()
+
+        else:
+            raise ValueError(f'Unknown queue source "{source}", expected one of {SOURCES}.')
+
+    LOGGER.info(f'The worker processed {processed} "{source}" items.')
+    return processed
+
+
+def main(source: str, league: Optional[str] = None, profile: Optional[bool] = None) -> None:
+    started = perf_counter()
+    name_schema = format_string(league) if league else 'all'
+    with profile_run(f'queue_worker_{source}', name_schema, profile):
+        processed = run_worker(source, league)
+    export_run_metrics(f'queue_worker_{source}', name_schema, processed, perf_counter() - started)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Drain the work queue of a script.')
+    parser.add_argument('source', choices=SOURCES)
+    parser.add_argument('--league', default=None)
+    arguments = parser.parse_args()
+
+    main(arguments.source, arguments.league)
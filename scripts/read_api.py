@@ -0,0 +1,376 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, List, Tuple, NamedTuple, Iterator, Any
+from urllib.parse import urlparse, parse_qs
+from datetime import date, datetime
+from contextlib import contextmanager
+from collections import OrderedDict
+from psycopg2 import extensions, errors
+from decimal import Decimal
+from time import monotonic
+import threading
+import argparse
+import hashlib
+import queue
+import json
+
+from utils.database.connector import connect_to_database
+from utils.constants import READ_API_FILE_LOG, READ_API_PORT, READ_API_CACHE_SIZE, READ_API_CONNECTIONS
+from utils.link_mapper import league_manifest, schema_to_league
+from utils.metrics import METRICS
+from utils.logger import configure_logger
+
+# Configure logger for the current module
+LOGGER = configure_logger(__name__, READ_API_FILE_LOG)
+
+# The watermarks of a schema are read from the database at most this often, in seconds: within this
+# interval cached responses are served without any query, so a write shows up in the responses
+# at most this long after its commit
+WATERMARK_INTERVAL = 1.0
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Ingestion watermarks written by the scrapers with their rows (see 'utils.database.connector'): any write
+# that changes rows of a table changes its watermark, rows written again unchanged ('upsert_data') do not
+WATERMARK_QUERY = """
+    SELECT name_table, version
+    FROM public.ingestion_watermarks
+    WHERE name_schema = %s;
+"""
+
+
+class Resource(NamedTuple):
+    """
+    A collection of a league served by the API.
+
+    Attributes:
+        query (str): Query of a page, formatted with the schema name; rows are ordered by 'key'.
+        key (str): Column of the keyset pagination, the 'after' parameter is compared with it.
+        key_type (type): Type of the 'after' parameter.
+        tables (Tuple[str, ...]): Tables read by the query, whose watermarks invalidate the cached pages.
+        filters (Tuple[str, ...]): Accepted query parameters besides 'after' and 'limit'.
+    """
+    query: str
+    key: str
+    key_type: type
+    tables: Tuple[str, ...]
+    filters: Tuple[str, ...] = ()
+
+
+RESOURCES: Dict[str, Resource] = {
+    'teams': Resource("""
+        SELECT team_id, title
+        FROM {name_schema}.teams
+        WHERE %(after)s::INT IS NULL OR team_id > %(after)s
+        ORDER BY team_id
+        LIMIT %(limit)s;
+    """, 'team_id', int, ('teams',)),
+    'matches': Resource("""
+        SELECT match_id, season, home_id, away_id
+        FROM {name_schema}.matches
+        WHERE (%(after)s::INT IS NULL OR match_id > %(after)s)
+          AND (%(season)s::INT IS NULL OR season = %(season)s)
+        ORDER BY match_id
+        LIMIT %(limit)s;
+    """, 'match_id', int, ('matches',), ('season',)),
+    # 'date' selects the results of one day by kickoff, e.g. today's results
+    'results': Resource("""
+        SELECT r.match_id, m.season, d.utc_time, m.home_id, m.away_id, r.score_ht, r.score_at
+        FROM {name_schema}.match_results AS r
+        JOIN {name_schema}.matches AS m USING (match_id)
+        LEFT JOIN {name_schema}.match_details AS d USING (match_id)
+        WHERE (%(after)s::INT IS NULL OR r.match_id > %(after)s)
+          AND (%(season)s::INT IS NULL OR m.season = %(season)s)
+          AND (%(date)s::DATE IS NULL OR (d.utc_time >= %(date)s AND d.utc_time < %(date)s::DATE + 1))
+        ORDER BY r.match_id
+        LIMIT %(limit)s;
+    """, 'match_id', int, ('match_results', 'matches', 'match_details'), ('season', 'date')),
+    'details': Resource("""
+        SELECT d.match_id, m.season, d.utc_time, d.stadium, d.attendance, d.reason, l.lineup_ht, l.lineup_at
+        FROM {name_schema}.match_details AS d
+        JOIN {name_schema}.matches AS m USING (match_id)
+        LEFT JOIN {name_schema}.match_lineups AS l USING (match_id)
+        WHERE (%(after)s::INT IS NULL OR d.match_id > %(after)s)
+          AND (%(season)s::INT IS NULL OR m.season = %(season)s)
+          AND (%(date)s::DATE IS NULL OR (d.utc_time >= %(date)s AND d.utc_time < %(date)s::DATE + 1))
+        ORDER BY d.match_id
+        LIMIT %(limit)s;
+    """, 'match_id', int, ('match_details', 'matches', 'match_lineups'), ('season', 'date')),
+    'stadiums': Resource("""
+        SELECT stadium, city, capacity, opened, surface, latitude, longitude
+        FROM {name_schema}.stadiums
+        WHERE %(after)s::TEXT IS NULL OR stadium > %(after)s
+        ORDER BY stadium
+        LIMIT %(limit)s;
+    """, 'stadium', str, ('stadiums',))
+}
+
+FILTER_TYPES = {'season': int, 'date': date.fromisoformat}
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable.')
+
+
+class ResponseCache:
+    """
+    A thread-safe LRU cache of encoded responses.
+
+    Every entry holds the watermarks of the tables its response was read from; an entry whose
+    watermarks differ from the current ones is stale and is dropped on the next lookup.
+
+    Args:
+        max_size (int): Number of responses kept, the least recently used one is evicted first.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[tuple, Tuple[tuple, str, bytes]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, watermark: tuple) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != watermark:
+                del self._entries[key]
+                METRICS.increment('cache_invalidations_total', cache='read_api')
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def put(self, key: tuple, watermark: tuple, etag: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[key] = (watermark, etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            METRICS.set('read_api_cached_responses', len(self._entries))
+
+
+class ConnectionPool:
+    """
+    A bounded pool of read-only autocommit connections, opened on first use.
+
+    Args:
+        size (int): Maximum number of connections, requests beyond it wait for a free one.
+    """
+    def __init__(self, size: int):
+        self._idle: 'queue.LifoQueue[extensions.connection]' = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self) -> Iterator[extensions.connection]:
+        with self._slots:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = connect_to_database()
+                connection.set_session(readonly=True, autocommit=True)
+
+            try:
+                yield connection
+            except Exception:
+                # The state of the connection is unknown after an error, a new one is opened instead
+                connection.close()
+                raise
+            self._idle.put(connection)
+
+    def close(self) -> None:
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+class ReadServer(ThreadingHTTPServer):
+    """
+    A read-only HTTP/JSON API over the tables of the leagues, answering from an in-memory cache.
+
+    Pages are cached per schema, resource and parameters, and stay valid until one of the tables
+    they were read from is written to, as seen in the ingestion watermarks of the scrapers. Hot reads
+    (the current season, today's results) are therefore served from memory, and a response
+    carries an ETag, so a client revalidating an unchanged page gets an empty 304.
+
+    Used as a context manager, the server runs in a background thread:
+
+        with ReadServer(port=0) as server:
+            requests.get(f'{server.url}/premier_league/results?season=2024')
+    """
+    daemon_threads = True
+
+    def __init__(self, port: int = READ_API_PORT, cache_size: int = READ_API_CACHE_SIZE,
+                 connections: int = READ_API_CONNECTIONS):
+        super().__init__(('127.0.0.1', port), ReadHandler)
+        self.cache = ResponseCache(cache_size)
+        self.pool = ConnectionPool(connections)
+        self._watermarks: Dict[str, Tuple[float, Dict[str, int]]] = {}
+        self._watermarks_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def watermarks(self, name_schema: str) -> Dict[str, int]:
+        """
+        Returns the ingestion watermarks of the tables of a schema, read at most every WATERMARK_INTERVAL seconds.
+        """
+        with self._watermarks_lock:
+            checked_at, watermarks = self._watermarks.get(name_schema, (None, {}))
+        if checked_at is not None and monotonic() - checked_at < WATERMARK_INTERVAL:
+            return watermarks
+
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(WATERMARK_QUERY, (name_schema,))
+            watermarks = dict(cursor.fetchall())
+        with self._watermarks_lock:
+            self._watermarks[name_schema] = (monotonic(), watermarks)
+        return watermarks
+
+    def read(self, name_schema: str, name_resource: str, params: Dict[str, str]) -> Tuple[str, bytes]:
+        """
+        Returns the ETag and the body of a page of a resource, from the cache if it is still valid.
+
+        Raises:
+            RequestError: The league, resource or parameters are unknown or invalid.
+        """
+        league = schema_to_league(name_schema)
+        resource = RESOURCES.get(name_resource)
+        if league is None or resource is None:
+            raise RequestError(404, f'Unknown path "/{name_schema}/{name_resource}".')
+
+        unknown = set(params) - {'after', 'limit', *resource.filters}
+        if unknown:
+            raise RequestError(400, f'Unknown parameters {sorted(unknown)} for "{name_resource}".')
+        try:
+            arguments = {name: FILTER_TYPES[name](params[name]) if name in params else None
+                         for name in resource.filters}
+            arguments['after'] = resource.key_type(params['after']) if 'after' in params else None
+            arguments['limit'] = min(int(params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        except ValueError as e:
+            raise RequestError(400, f'Invalid parameter: {e}.')
+        if arguments['limit'] < 1:
+            raise RequestError(400, 'The limit must be positive.')
+
+        # A table without a watermark was not written since the watermarks were introduced
+        watermarks = self.watermarks(name_schema)
+        watermark = tuple(watermarks.get(table, 0) for table in resource.tables)
+        key = (name_schema, name_resource, tuple(sorted(arguments.items())))
+
+        cached = self.cache.get(key, watermark)
+        if cached is not None:
+            METRICS.increment('cache_hits_total', cache='read_api')
+            return cached
+        METRICS.increment('cache_misses_total', cache='read_api')
+
+        try:
+            with METRICS.timer('read_api_query_seconds', resource=name_resource), \
+                    self.pool.connection() as connection, connection.cursor() as cursor:
+                cursor.execute(resource.query.format(name_schema=name_schema), arguments)
+                columns = [column.name for column in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except errors.UndefinedTable:
+            raise RequestError(404, f'The league "{league}" has no "{name_resource}" data.')
+
+        # A full page may be followed by another one, which starts after its last key
+        next_key = rows[-1][resource.key] if len(rows) == arguments['limit'] else None
+        body = json.dumps({'league': league, 'schema': name_schema, 'resource': name_resource,
+                           'data': rows, 'next': next_key}, default=_json_default).encode()
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+
+        self.cache.put(key, watermark, etag, body)
+        return etag, body
+
+    def __enter__(self) -> 'ReadServer':
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+        self.server_close()
+        self.pool.close()
+
+
+class ReadHandler(BaseHTTPRequestHandler):
+    """
+    Answers '/leagues', '/<schema>/<resource>' (see RESOURCES) and '/metrics'.
+
+    Pages of a resource are read with '?limit=' and continued with '?after=<next>' of the previous page.
+    """
+    server: ReadServer
+
+    def log_message(self, format: str, *args) -> None:
+        # Every request would be logged otherwise, only the errors are
+        pass
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        segments = [segment for segment in url.path.split('/') if segment]
+
+        try:
+            with METRICS.timer('read_api_seconds'):
+                if segments == ['leagues']:
+                    body = json.dumps([{'league': league, 'schema': name_schema}
+                                       for league, name_schema in league_manifest()]).encode()
+                    self._send(200, body)
+                elif segments == ['metrics']:
+                    self._send(200, METRICS.to_prometheus().encode(), 'text/plain; version=0.0.4')
+                elif len(segments) == 2:
+                    etag, body = self.server.read(segments[0], segments[1], params)
+                    if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+                        METRICS.increment('read_api_not_modified_total')
+                        self._send(304, b'', etag=etag)
+                    else:
+                        self._send(200, body, etag=etag)
+                else:
+                    raise RequestError(404, f'Unknown path "{url.path}".')
+
+        except RequestError as e:
+            self._send(e.status, json.dumps({'error': str(e)}).encode())
+        except Exception as e:
+            LOGGER.error(f'Failed to answer "{self.path}": {type(e).__name__}: {e}.')
+            self._send(500, json.dumps({'error': 'Internal error.'}).encode())
+
+    def _send(self, status: int, body: bytes, content_type: str = 'application/json',
+              etag: Optional[str] = None) -> None:
+        METRICS.increment('read_api_responses_total', status=status)
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+            # Clients may keep a page, but revalidate it on every use
+            self.send_header('Cache-Control', 'no-cache')
+        if status != 304:
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main(port: int = READ_API_PORT) -> None:
+    server = ReadServer(port)
+    LOGGER.info(f'The read API is serving on {server.url}.')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve the league tables over a cached HTTP/JSON API.')
+    parser.add_argument('--port', type=int, default=READ_API_PORT)
+    arguments = parser.parse_args()
+
+    main(arguments.port)
@@ -0,0 +1,117 @@
+from typing import Optional, List, Set, Tuple
+from time import perf_counter
+
+from utils.database.connector import connect_to_database, upsert_data, ThreadConnections
+from utils.database.summaries import refresh_summaries
+from utils.constants import RETRY_FAILED_FILE_LOG, HASHMAP_LEAGUE_IDS, MAX_WORKERS
+from utils.link_mapper import format_string
+from utils.metrics import ScopedExecutor, export_run_metrics
+from utils.profiler import profile_run
+from utils.logger import configure_logger
+from utils import dead_letter, reference_cache
+from scripts.matches import FotmobMatches
+from scripts.stadiums import FotmobStadiums
+from scripts.match_details import FotmobDetails, _batch
+
+# Configure logger for the current module
+LOGGER = configure_logger(__name__, RETRY_FAILED_FILE_LOG)
+
+
+class FailedItemsRetry:
+    """
+    Re-drives the failed fetches of a league recorded in the dead-letter store (see 'utils.dead_letter').
+
+    Only the items whose retry is due are fetched again, through the same methods as the regular run,
+    so an item failing again is rescheduled with a longer delay and a recovered one leaves the store.
+
+    Args:
+        league (str): The name of the league.
+
+    Attributes:
+        retried (int): The number of items fetched again.
+        recovered (int): The number of items that left the store.
+    """
+    def __init__(self, league: str):
+        self.league = league
+        self.name_schema = format_string(league)
+        self.retried = 0
+        self.recovered = 0
+        self._retried_items: Set[Tuple[str, str]] = set()
+
+    def _due(self, source: str) -> List[str]:
+        item_ids = dead_letter.due_items(source, self.name_schema)
+        self._retried_items.update((source, item_id) for item_id in item_ids)
+        self.retried += len(item_ids)
+        return item_ids
+
+    def retry_matches(self, connection) -> None:
+        seasons = self._due('matches')
+        if not seasons:
+            return None
+
+        fotmob_matches = FotmobMatches(self.league)
+        id_league = HASHMAP_LEAGUE_IDS[self.league][0]
+        for season in seasons:
+            fotmob_matches.get_matches(connection, id_league, season)
+
+    def retry_stadiums(self, connection) -> None:
+        team_ids = [int(team_id) for team_id in self._due('stadiums')]
+        if not team_ids:
+            return None
+
+        fotmob_stadiums = FotmobStadiums(self.league)
+        with ScopedExecutor(max_workers=MAX_WORKERS) as executor:
+            stadiums = [stadium for stadium in executor.map(fotmob_stadiums.get_stadiums, team_ids)
+                        if stadium is not None]
+        if stadiums:
+            try:
+                upsert_data(connection, self.name_schema, 'stadiums', stadiums)
+            except Exception:
+                LOGGER.error(f'Retried stadiums data for league "{self.name_schema}" was not inserted.')
+
+    def retry_match_details(self, connection) -> None:
+        match_ids = self._due('match_details')
+        if not match_ids:
+            return None
+
+        fotmob_details = FotmobDetails(self.name_schema)
+        with reference_cache.attach(connection, self.name_schema) as cache:
+            stadiums = set(cache.stadiums())
+
+        # The batches are written at once, each thread on a connection of its own
+        with ThreadConnections() as connections, ScopedExecutor(max_workers=MAX_WORKERS) as executor:
+            executor.map(
+                lambda matches: fotmob_details.start_parse(connections.get(), matches, stadiums),
+                _batch([(int(match_id),) for match_id in match_ids])
+            )
+
+        try:
+            refresh_summaries(connection, self.name_schema, fotmob_details.inserted_match_ids)
+        except Exception:
+            LOGGER.error(f'The summary tables of "{self.name_schema}" were not refreshed.')
+
+    def start_retry(self) -> None:
+        """
+        Retries the due items of the league in the order of the DAG: seasons, stadiums, match details.
+        """
+        # Most runs have nothing due (abandoned items stay in the store) and do not connect to the database at all
+        if not dead_letter.has_due_items(self.name_schema):
+            return None
+
+        with connect_to_database() as connection:
+            self.retry_matches(connection)
+            self.retry_stadiums(connection)
+            self.retry_match_details(connection)
+
+        remaining = {(item['source'], item['item_id']) for item in dead_letter.pending(self.name_schema)}
+        self.recovered = len(self._retried_items - remaining)
+        LOGGER.info(f'Retried {self.retried} failed items of "{self.name_schema}", {self.recovered} recovered, '
+                    f'{len(remaining)} remaining in the dead-letter store.')
+
+
+def main(league: str, profile: Optional[bool] = None) -> None:
+    started = perf_counter()
+    failed_items = FailedItemsRetry(league)
+    with profile_run('retry_failed', failed_items.name_schema, profile):
+        failed_items.start_retry()
+    export_run_metrics('retry_failed', failed_items.name_schema, failed_items.recovered, perf_counter() - started)
@@ -0,0 +1,91 @@
+from typing import Optional, List, Callable, Any
+from time import perf_counter
+import argparse
+
+from utils.constants import (RUN_LEAGUES_FILE_LOG, SCHEDULER_HOST_SLOTS, SCHEDULER_DEADLINE_SECONDS,
+                             PLAYERS_WEIGHT, EAFC_SCHEMA)
+from utils.link_mapper import league_manifest, league_weight
+from utils.scheduler import FairShareScheduler
+from utils.metrics import metrics_scope, export_run_metrics
+from utils.logger import configure_logger
+
+# Configure logger for the current module
+LOGGER = configure_logger(__name__, RUN_LEAGUES_FILE_LOG)
+
+
+def run_league(league: str) -> bool:
+    """
+    Runs the chain of the DAG for one league: the retries of failed fetches and, if a match
+    has finished since the last successful run, 'matches', 'stadiums' and 'match_details'.
+
+    Returns:
+        Whether the league had new matches.
+    """
+    from scripts import retry_failed, matches, stadiums, match_details
+
+    retry_failed.main(league)
+    if not matches.league_has_work(league):
+        return False
+
+    matches.main(league)
+    stadiums.main(league)
+    match_details.main(league)
+    return True
+
+
+def run_players() -> None:
+    from scripts.eafc.futgg import PlayersParser
+    PlayersParser(EAFC_SCHEMA).get_basic_info()
+
+
+def scoped(function: Callable[[], Any]) -> Callable[[], Any]:
+    """
+    Runs the job with a metrics registry of its own, so every script exports only the metrics of its league.
+    """
+    def run() -> Any:
+        with metrics_scope():
+            return function()
+    return run
+
+
+def main(leagues: Optional[List[str]] = None, players: bool = False) -> None:
+    """
+    Runs many leagues (and optionally the fut.gg crawl) in one process, scheduled by their weights
+    (see 'utils.link_mapper.league_weight' and 'utils.scheduler'): the top leagues are started
+    first and are due within minutes, the long tail fills the remaining FOTMOB slots.
+
+    Args:
+        leagues (Optional[List[str]]): Leagues to run, all leagues of the manifest by default.
+        players (bool): Whether to crawl the fut.gg cards as well.
+    """
+    started = perf_counter()
+    scheduler = FairShareScheduler(SCHEDULER_HOST_SLOTS, SCHEDULER_DEADLINE_SECONDS)
+    for league, _ in league_manifest():
+        if leagues is None or league in leagues:
+            scheduler.submit(league, 'fotmob', league_weight(league),
+                             scoped(lambda league=league: run_league(league)))
+    if players:
+        scheduler.submit('players', 'futgg', PLAYERS_WEIGHT, scoped(run_players))
+
+    # The scheduler records its metrics outside of the jobs, they are exported with the summary of the run
+    jobs = scheduler.run()
+    for job in sorted(jobs, key=lambda job: job.finished):
+        if job.error is not None:
+            LOGGER.error(f'The run of "{job.name}" failed after {job.finished - job.started:.1f} sec: {job.error}.')
+        else:
+            LOGGER.info(f'"{job.name}" (weight {job.weight:g}) started at {job.started:.1f} sec and finished '
+                        f'at {job.finished:.1f} sec, {job.lateness:.1f} sec after its deadline.')
+
+    late_jobs = [job.name for job in jobs if job.lateness > 0]
+    if late_jobs:
+        LOGGER.warning(f'{len(late_jobs)} of {len(jobs)} jobs finished after their deadline: {late_jobs}.')
+    export_run_metrics('run_leagues', 'all', len(jobs), perf_counter() - started)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run many leagues in one process, heaviest first.')
+    parser.add_argument('--leagues', nargs='*', default=None)
+    parser.add_argument('--players', action='store_true')
+    arguments = parser.parse_args()
+
+    main(arguments.leagues, arguments.players)
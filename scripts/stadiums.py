@@ -1,17 +1,26 @@
-from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Union, Tuple, List
+from typing import Optional, Tuple, List, Dict
 from psycopg2 import extensions
+from time import perf_counter
 from datetime import datetime
-
-from utils.database.connector import connect_to_database, insert_data
-from utils.constants import STADIUMS_FILE_LOG
-from utils.link_mapper import format_string
+import threading
+
+from utils.database.connector import connect_to_database, insert_data, upsert_data, ThreadConnections
+from utils.database.rows import StadiumRow, stadium_row
+from utils.database import work_queue
+from utils import reference_cache, dead_letter
+from utils.constants import STADIUMS_FILE_LOG, FOTMOB_API_URL, MAX_WORKERS
+from utils.link_mapper import format_string, schema_to_league
+from utils.metrics import METRICS, export_run_metrics
+from utils.profiler import profile_run
 from utils.logger import configure_logger
 from utils.fetcher import Fetcher
 
 # Configure logger for the current module
 LOGGER = configure_logger(__name__, STADIUMS_FILE_LOG)
 
+# Number of teams claimed from the work queue and written at once
+STADIUMS_BATCH_SIZE = 5
+
 
 class FotmobStadiums(Fetcher):
     """
@@ -30,13 +39,13 @@ class FotmobStadiums(Fetcher):
         super().__init__()
         self.schema_name = format_string(league)
 
-        self.url = 'https://www.fotmob.com/api/teams?id='
+        self.url = f'{FOTMOB_API_URL}teams?id='
         self.inserted_stadiums = 0
         self.total_teams = 0
 
     def extract_teams(self, connection: extensions.connection) -> List[Tuple[Optional[int]]]:
         """
-        Extracts team IDs from the database.
+        Extracts team IDs from the reference cache of the league (see 'utils.reference_cache').
 
         Args:
             connection (extensions.connection): Database connection object.
@@ -46,10 +55,8 @@ class FotmobStadiums(Fetcher):
             Returns an empty list if no teams are found.
         """
         try:
-            with connection.cursor() as cursor:
-                cursor.execute(f'SELECT team_id FROM {self.schema_name}.teams;')
-                teams_id = cursor.fetchall()
-                return teams_id
+            with reference_cache.attach(connection, self.schema_name) as cache:
+                return [(team_id,) for team_id in cache.team_ids()]
         except Exception as e:
             LOGGER.error(f'Error extracting teams: {str(e)}.')
             return []
@@ -70,34 +77,61 @@ class FotmobStadiums(Fetcher):
                 return None
         return date
 
-    def get_stadiums(self, id: int) -> Optional[List[Optional[Union[str, int, float]]]]:
+    def fetch_stadium(self, id: int) -> Optional[StadiumRow]:
         """
         Retrieves stadium information from an external API based on the provided ID.
+        A failed fetch is recorded in the dead-letter store and raised.
 
         Args:
-            id (int): The ID of the stadium to retrieve information for.
+            id (int): The ID of the team whose stadium is retrieved.
         
         Returns:
-            A list containing stadium information.
+            A row containing stadium information, or None if the team has no stadium data.
         """
+        stadium_url = f'{self.url}{id}'
         try:
-            stadium_url = f'{self.url}{id}'
             json_content = self.fetch_data(stadium_url, 'json')
-            if not json_content:
-                LOGGER.warning(f'Failed to retrieve the json from '
-                               f'the provided link "{stadium_url}" for schema "{self.schema_name}".')
-                return None
         except Exception as e:
             LOGGER.warning(f'Failed to fetch data: {e}.')
-            return None
+            dead_letter.record_failure('stadiums', self.schema_name, id, type(e).__name__, str(e))
+            raise
+
+        if not json_content:
+            LOGGER.warning(f'Failed to retrieve the json from '
+                           f'the provided link "{stadium_url}" for schema "{self.schema_name}".')
+            dead_letter.record_failure('stadiums', self.schema_name, id, 'EmptyResponse')
+            raise ValueError(f'Empty response for the team {id}')
         
+        dead_letter.resolve('stadiums', self.schema_name, [id])
+        with METRICS.timer('parse_seconds', script='stadiums'):
+            return self._parse_stadium(json_content)
+
+    def get_stadiums(self, id: int) -> Optional[StadiumRow]:
+        """
+        Retrieves stadium information like 'fetch_stadium', None if the fetch failed.
+        """
+        try:
+            return self.fetch_stadium(id)
+        except Exception:
+            return None
+
+    def _parse_stadium(self, json_content: dict) -> Optional[StadiumRow]:
+        """
+        Extracts the stadium information from the team JSON content.
+
+        Args:
+            json_content (dict): The team data fetched from the API.
+
+        Returns:
+            A row containing stadium information, or None if the team has no stadium data.
+        """
         stadium = json_content.get('overview', {}).get('venue')
 
         if stadium:
             first_block = stadium.get('widget', {})
             second_block = stadium.get('statPairs', [])
             
-            return [
+            return (
                 first_block.get('name'),
                 first_block.get('city'),
                 second_block[1][1] if len(second_block) > 1 else None,
@@ -105,7 +139,7 @@ class FotmobStadiums(Fetcher):
                 second_block[0][1] if len(second_block) > 0 else None,
                 float(first_block.get('location', [None, None])[0]),
                 float(first_block.get('location', [None, None])[1])
-            ]
+            )
         
         return None
 
@@ -121,24 +155,74 @@ class FotmobStadiums(Fetcher):
                 # a row indicating the absence of information about the stadium
                 self.total_teams = len(teams_id) + 1
 
-                with ThreadPoolExecutor() as executor:
-                    stadiums = executor.map(lambda id: self.get_stadiums(id[0]), teams_id)
-                    stadiums_league = [stadium for stadium in list(stadiums) if stadium is not None]
-
-                    # Insert the row ['Undefined', None, None, None, None, None, None] into the database
-                    # because some matches lack stadium information to avoid exceptions
-                    stadiums_league.append(['Undefined', None, None, None, None, None, None])
-                    
-                    try:
-                        insert_data(connection, self.schema_name, 'stadiums', stadiums_league)
-                        self.inserted_stadiums = len(stadiums_league)
-                    except Exception:
-                        LOGGER.error(f'Stadiums data for league "{self.schema_name}" was not inserted.')
+                # Insert the row ('Undefined', None, None, None, None, None, None) into the database
+                # because some matches lack stadium information to avoid exceptions
+                try:
+                    insert_data(connection, self.schema_name, 'stadiums', [stadium_row('Undefined')])
+                    self.inserted_stadiums += 1
+                except Exception:
+                    LOGGER.error(f'Stadiums data for league "{self.schema_name}" was not inserted.')
+
+                # The teams are queued, so that workers on other hosts ('scripts.queue_worker') can share them
+                work_queue.enqueue(connection, 'stadiums', self.schema_name, [team_id for team_id, in teams_id])
+                consume_queue({self.schema_name: self}, self.schema_name)
         
         LOGGER.info(f'Successfully inserted {self.inserted_stadiums} stadiums out of {self.total_teams} ' \
                     f'into the table "{self.schema_name}.stadiums" (Some teams lack stadium data).')
+
+
+def consume_queue(stadiums: Dict[str, FotmobStadiums], name_schema: Optional[str] = None) -> int:
+    """
+    Processes the 'stadiums' items of the work queue (see 'utils.database.work_queue'),
+    until the queue is drained by this and all other workers.
+    Every thread of the queue writes on a connection of its own.
+
+    Args:
+        stadiums (Dict[str, FotmobStadiums]): Parsers by schema name, created for the schemas met
+            in the queue, whose counters are filled by the processed teams.
+        name_schema (Optional[str]): Process only the teams of this schema, all schemas by default.
+
+    Returns:
+        The number of teams processed.
+    """
+    lock = threading.Lock()
+    connections = ThreadConnections()
+
+    def process(schema: str, team_ids: List[str]) -> List[str]:
+        with lock:
+            if schema not in stadiums:
+                stadiums[schema] = FotmobStadiums(schema_to_league(schema))
+        fotmob_stadiums = stadiums[schema]
+
+        rows, failed = [], []
+        for team_id in team_ids:
+            try:
+                stadium = fotmob_stadiums.fetch_stadium(int(team_id))
+            except Exception:
+                # Released to the queue for another attempt, the other teams of the batch are completed
+                failed.append(team_id)
+                continue
+            if stadium is not None:
+                rows.append(stadium)
+
+        # Full rows of the team pages, so changed capacities or surfaces replace the stored values.
+        # A failed write raises and releases the whole batch
+        upsert_data(connections.get(), schema, 'stadiums', rows)
+        with lock:
+            fotmob_stadiums.inserted_stadiums += len(rows)
+        return failed
+
+    # A batch is written with one upsert; a league has about 20 teams, so small batches
+    # still spread them over several threads
+    with connections:
+        return work_queue.drain('stadiums', process, name_schema, batch_size=STADIUMS_BATCH_SIZE,
+                                workers=MAX_WORKERS)
                     
 
-def main(league: str) -> None:
+def main(league: str, profile: Optional[bool] = None) -> None:
+    started = perf_counter()
     fotmob_stadiums = FotmobStadiums(league)
-    fotmob_stadiums.start_parse()
+    with profile_run('stadiums', fotmob_stadiums.schema_name, profile):
+        fotmob_stadiums.start_parse()
+    export_run_metrics('stadiums', fotmob_stadiums.schema_name,
+                       fotmob_stadiums.inserted_stadiums, perf_counter() - started)
@@ -0,0 +1,284 @@
+from concurrent.futures import Future
+from typing import Optional, Dict, List, Tuple, Any
+from datetime import date, datetime
+from psycopg2 import extensions
+from time import perf_counter
+import argparse
+import threading
+import re
+
+from utils.database.connector import connect_to_database, upsert_data
+from utils.database.rows import PlayerRow, TransferRow
+from utils.constants import (HASHMAP_LEAGUE_IDS, TRANSFERMARKT_URL, TRANSFERMARKT_REQUESTS_PER_SECOND,
+                             TRANSFERMARKT_WORKERS, TRANSFERMARKT_PLAYERS_FILE_LOG)
+from utils.html_parsers import parse_transfermarkt_clubs, parse_transfermarkt_squad
+from utils.link_mapper import format_string
+from utils.metrics import METRICS, ScopedExecutor, export_run_metrics
+from utils.parse_pool import ParsePool
+from utils.rate_limiter import RateLimiter
+from utils.profiler import profile_run
+from utils.logger import configure_logger
+from utils.fetcher import Fetcher
+
+# Configure logger for the current module
+LOGGER = configure_logger(__name__, TRANSFERMARKT_PLAYERS_FILE_LOG)
+
+# Global index of the players whose transfer history was fetched, shared by all leagues and hosts.
+# 'schemas' lists the league schemas holding the current history of the player
+SEEN_INDEX_QUERY = """
+    CREATE TABLE IF NOT EXISTS public.transfermarkt_players (
+        player_id INT PRIMARY KEY,
+        last_transfer DATE,
+        fetched_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        schemas TEXT[] NOT NULL DEFAULT '{}'
+    );
+"""
+
+# Transfermarkt is slow and strict about its rate limits: all leagues crawled by a process
+# share one limiter, and a history requested by several leagues at once is fetched once
+LIMITER = RateLimiter(TRANSFERMARKT_REQUESTS_PER_SECOND, name='transfermarkt_players')
+_HISTORIES: Dict[int, Future] = {}
+_HISTORIES_LOCK = threading.Lock()
+
+SquadPlayer = Tuple[int, str, Optional[date], Optional[str], Optional[float], Optional[str], Optional[date]]
+
+
+def current_season(today: Optional[date] = None) -> int:
+    """
+    Returns the Transfermarkt season ID (the year the season starts) of the current season.
+    """
+    today = today or date.today()
+    return today.year if today.month >= 7 else today.year - 1
+
+
+def parse_market_value(text: Optional[str]) -> Optional[int]:
+    """
+    Converts a market value such as '€25.00m' or '€800k' into euros, None if it is unknown ('-').
+    """
+    match = re.match(r'€(\d+(?:\.\d+)?)(bn|m|k)?', (text or '').strip())
+    if not match:
+        return None
+    multiplier = {'bn': 10 ** 9, 'm': 10 ** 6, 'k': 10 ** 3, None: 1}[match.group(2)]
+    return int(float(match.group(1)) * multiplier)
+
+
+def parse_transfers(player_id: int, json_content: Dict[str, Any]) -> List[TransferRow]:
+    """
+    Extracts the rows of the 'transfers' table from the transfer history JSON of a player.
+    """
+    rows = []
+    for transfer in json_content.get('transfers', []):
+        if transfer.get('upcoming') or not transfer.get('dateUnformatted'):
+            continue
+        rows.append((
+            player_id,
+            parse_market_value(transfer.get('marketValue')),
+            datetime.strptime(transfer['dateUnformatted'], '%Y-%m-%d').date(),
+            (transfer.get('to') or {}).get('clubName')
+        ))
+    return rows
+
+
+class TransfermarktPlayers(Fetcher):
+    """
+    Crawls the squads of a league on Transfermarkt into the 'players' and 'transfers' tables.
+
+    The squads are read every run (one page per club), the transfer history of a player only when
+    needed, according to the global seen-index 'public.transfermarkt_players':
+        - a player missing from the index, or who joined the club after the last known transfer,
+          has the history fetched (once per run, even if several leagues need it at the same time);
+        - a player whose history is current but held by other leagues only has it copied
+          from one of them in the database, without any request;
+        - any other player is skipped.
+
+    Args:
+        league (str): The name of the league.
+        parse_pool (ParsePool): Pool of processes parsing the HTML pages.
+
+    Attributes:
+        inserted_players (int): Number of player rows written.
+        inserted_transfers (int): Number of transfer rows written, fetched or copied.
+        fetched_histories (int): Number of transfer histories requested by this league.
+        copied_histories (int): Number of transfer histories copied from other leagues.
+    """
+    def __init__(self, league: str, parse_pool: ParsePool):
+        super().__init__()
+        self.league = league
+        self.name_schema = format_string(league)
+        self.slug, self.code = HASHMAP_LEAGUE_IDS[league][2:4]
+        self.parse_pool = parse_pool
+
+        self.inserted_players = 0
+        self.inserted_transfers = 0
+        self.fetched_histories = 0
+        self.copied_histories = 0
+
+    def _fetch(self, url: str, content_type: str = 'html') -> Any:
+        LIMITER.acquire()
+        return self.fetch_data(url, content_type)
+
+    def get_clubs(self, season: int) -> List[Tuple[str, int]]:
+        html_content = self._fetch(f'{TRANSFERMARKT_URL}{self.slug}/startseite/wettbewerb/{self.code}'
+                                   f'/saison_id/{season}')
+        return self.parse_pool.parse(parse_transfermarkt_clubs, html_content, script='transfermarkt_players')
+
+    def get_squad(self, club: Tuple[str, int], season: int) -> List[SquadPlayer]:
+        club_slug, club_id = club
+        try:
+            html_content = self._fetch(f'{TRANSFERMARKT_URL}{club_slug}/kader/verein/{club_id}'
+                                       f'/saison_id/{season}/plus/1')
+            return self.parse_pool.parse(parse_transfermarkt_squad, html_content, script='transfermarkt_players')
+        except Exception as e:
+            LOGGER.warning(f'Failed to fetch the squad of "{club_slug}" ({season}): {e}.')
+            return []
+
+    def _history(self, player_id: int) -> List[TransferRow]:
+        """
+        Fetches the transfer history of a player. A failed fetch raises, so the player is not indexed,
+        and is forgotten by _HISTORIES, so the next league (or run) needing the history fetches it again.
+        """
+        try:
+            json_content = self._fetch(f'{TRANSFERMARKT_URL}ceapi/transferHistory/list/{player_id}', 'json')
+            if not json_content:
+                raise ValueError('the response is empty')
+            return parse_transfers(player_id, json_content)
+        except Exception:
+            with _HISTORIES_LOCK:
+                _HISTORIES.pop(player_id, None)
+            raise
+
+    def get_history(self, player_id: int) -> Future:
+        """
+        Returns the pending or finished fetch of the transfer history of a player, started if there is none.
+        """
+        with _HISTORIES_LOCK:
+            future = _HISTORIES.get(player_id)
+            if future is None:
+                future = EXECUTOR.submit(self._history, player_id)
+                _HISTORIES[player_id] = future
+                self.fetched_histories += 1
+            else:
+                METRICS.increment('cache_hits_total', cache='transfermarkt_history')
+        return future
+
+    def read_index(self, connection: extensions.connection,
+                   player_ids: List[int]) -> Dict[int, Tuple[Optional[date], List[str]]]:
+        """
+        Returns the date up to which the history of each indexed player is known (the last transfer,
+        or the day of the fetch for a player without transfers) and the schemas holding it.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT player_id, COALESCE(last_transfer, fetched_at::DATE), schemas '
+                           'FROM public.transfermarkt_players WHERE player_id = ANY(%s);', (player_ids,))
+            return {player_id: (known_until, schemas) for player_id, known_until, schemas in cursor.fetchall()}
+
+    def copy_history(self, connection: extensions.connection, player_id: int, source_schema: str) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {self.name_schema}.transfers
+                SELECT * FROM {source_schema}.transfers WHERE player_id = %s
+                ON CONFLICT DO NOTHING;
+                """, (player_id,))
+            self.inserted_transfers += cursor.rowcount
+            cursor.execute('UPDATE public.transfermarkt_players SET schemas = array_append(schemas, %s) '
+                           'WHERE player_id = %s AND NOT %s = ANY(schemas);',
+                           (self.name_schema, player_id, self.name_schema))
+        connection.commit()
+        self.copied_histories += 1
+
+    def store_history(self, connection: extensions.connection, player_id: int, transfers: List[TransferRow]) -> None:
+        counts = upsert_data(connection, self.name_schema, 'transfers', transfers)
+        self.inserted_transfers += counts.inserted + counts.updated
+
+        # The other leagues hold an older history now, they copy the new one on their next run
+        last_transfer = max((transfer[2] for transfer in transfers), default=None)
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO public.transfermarkt_players (player_id, last_transfer, fetched_at, schemas)
+                VALUES (%s, %s, now(), ARRAY[%s])
+                ON CONFLICT (player_id) DO UPDATE
+                SET last_transfer = EXCLUDED.last_transfer, fetched_at = now(),
+                    schemas = CASE WHEN transfermarkt_players.last_transfer IS NOT DISTINCT FROM EXCLUDED.last_transfer
+                                   THEN array_append(array_remove(transfermarkt_players.schemas, %s), %s)
+                                   ELSE EXCLUDED.schemas END;
+                """, (player_id, last_transfer, self.name_schema, self.name_schema, self.name_schema))
+        connection.commit()
+
+    def crawl_season(self, connection: extensions.connection, season: int) -> None:
+        try:
+            clubs = self.get_clubs(season)
+        except Exception as e:
+            LOGGER.warning(f'Failed to fetch the clubs of "{self.name_schema}" ({season}): {e}.')
+            return None
+
+        with ScopedExecutor(max_workers=TRANSFERMARKT_WORKERS) as executor:
+            squads = list(executor.map(lambda club: self.get_squad(club, season), clubs))
+        # A player listed twice (e.g. a loan within the league) is processed once
+        squad = list({player[0]: player for players in squads for player in players}.values())
+        if not squad:
+            return None
+
+        players: List[PlayerRow] = [player[:6] for player in squad]
+        # The squads are read every run, so only new players and changed values are written
+        counts = upsert_data(connection, self.name_schema, 'players', players)
+        self.inserted_players += counts.inserted + counts.updated
+
+        index = self.read_index(connection, [player[0] for player in squad])
+        fetches: Dict[int, Future] = {}
+        for player_id, *_, joined in squad:
+            known_until, schemas = index.get(player_id, (None, []))
+            if player_id not in index or (joined is not None and joined > known_until):
+                fetches[player_id] = self.get_history(player_id)
+            elif self.name_schema not in schemas and schemas:
+                self.copy_history(connection, player_id, schemas[0])
+            else:
+                METRICS.increment('cache_hits_total', cache='transfermarkt_seen_index')
+
+        for player_id, future in fetches.items():
+            try:
+                self.store_history(connection, player_id, future.result())
+            except Exception as e:
+                connection.rollback()
+                LOGGER.warning(f'Failed to fetch the transfer history of the player {player_id}: {e}.')
+
+    def start_parse(self, seasons: Optional[List[int]] = None) -> None:
+        """
+        Crawls the given seasons of the league, the current season by default.
+        """
+        if self.code is None:
+            LOGGER.warning(f'The Transfermarkt source does not have data for the specified league "{self.league}".')
+            return None
+
+        with connect_to_database() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(SEEN_INDEX_QUERY)
+            connection.commit()
+
+            for season in seasons or [current_season()]:
+                self.crawl_season(connection, season)
+
+        LOGGER.info(f'For the schema "{self.name_schema}", {self.inserted_players} players and '
+                    f'{self.inserted_transfers} transfers were written; {self.fetched_histories} transfer histories '
+                    f'were fetched and {self.copied_histories} copied from other leagues.')
+
+
+# Transfer histories are fetched by a bounded pool shared by all leagues of the process
+EXECUTOR = ScopedExecutor(max_workers=TRANSFERMARKT_WORKERS, thread_name_prefix='transfermarkt')
+
+
+def main(league: str, seasons: Optional[List[int]] = None, profile: Optional[bool] = None) -> None:
+    started = perf_counter()
+    with profile_run('transfermarkt_players', format_string(league), profile), ParsePool() as parse_pool:
+        crawler = TransfermarktPlayers(league, parse_pool)
+        crawler.start_parse(seasons)
+    export_run_metrics('transfermarkt_players', crawler.name_schema,
+                       crawler.inserted_players + crawler.inserted_transfers, perf_counter() - started)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Crawl the Transfermarkt squads and transfer histories of a league.')
+    parser.add_argument('league')
+    parser.add_argument('--seasons', nargs='*', type=int, default=None)
+    arguments = parser.parse_args()
+
+    main(arguments.league, arguments.seasons)
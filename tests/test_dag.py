@@ -0,0 +1,35 @@
+import importlib.util
+import subprocess
+import sys
+import os
+
+import pytest
+
+PROJECT_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+DAG_FILE = os.path.join(PROJECT_DIRECTORY, 'dags', 'matches_parser_dag.py')
+# Modules the scheduler must not import when it parses the DAG file
+HEAVY_MODULES = ['requests', 'psycopg2', 'decouple', 'bs4', 'numpy', 'msgspec']
+
+
+def test_dag_is_built_within_parse_budget():
+    pytest.importorskip('airflow')
+    spec = importlib.util.spec_from_file_location('matches_parser_dag', DAG_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    assert module.dag.task_ids
+    assert module.DAG_PARSE_TIME <= module.DAG_PARSE_TIME_BUDGET, \
+        f'Building the DAG took {module.DAG_PARSE_TIME:.3f} sec, over {module.DAG_PARSE_TIME_BUDGET} sec.'
+
+
+def test_manifest_is_light():
+    # A fresh interpreter, so that the modules imported by other tests do not count
+    code = (
+        'import sys\n'
+        'from utils.link_mapper import league_manifest, league_weight\n'
+        '[league_weight(league) for league, _ in league_manifest()]\n'
+        f'print(",".join(name for name in {HEAVY_MODULES!r} if name in sys.modules))\n'
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_DIRECTORY,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ''
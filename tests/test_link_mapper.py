@@ -0,0 +1,60 @@
+import random
+
+from utils.constants import HASHMAP_LEAGUE_IDS
+from utils.link_mapper import format_string, SPECIAL_REPLACEMENTS, FIRST_LETTER
+
+# Characters with a special meaning for 'format_string' are drawn more often than the others
+SPECIAL_CHARACTERS = [chr(code) for code in SPECIAL_REPLACEMENTS] + list(FIRST_LETTER) + ['Ú', 'İ', 'ẞ', '2']
+OTHER_CHARACTERS = 'abcXYZ09 _äÉñ'
+
+
+def reference_format_string(team_name: str) -> str:
+    """
+    The implementation of 'format_string' before it was memoized and moved to a translation table.
+    """
+    special_replacements = {'ú': 'u', '-': '_', "'": '', '’': '', 'Ö': 'o', 'ß': 'ss', 'ü': 'u', 'Č': 'c',
+                            'á': 'a', 'Ž': 'z', '.': ''}
+    first_letter = {'1': 'first_', '3': 'third_'}
+
+    formatted_string = ''
+    for letter in team_name:
+        if formatted_string == '' and letter in first_letter:
+            formatted_string += first_letter[letter]
+        elif letter in special_replacements:
+            formatted_string += special_replacements[letter]
+        else:
+            formatted_string += letter
+
+    return formatted_string.lower().replace(' ', '_')
+
+
+def random_names(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ''.join(rng.choice(SPECIAL_CHARACTERS) if rng.random() < 0.6 else rng.choice(OTHER_CHARACTERS)
+                      for _ in range(rng.randint(0, 12)))
+
+
+def test_format_string_matches_reference_on_random_names():
+    for name in random_names(20000):
+        assert format_string(name) == reference_format_string(name), repr(name)
+
+
+def test_format_string_matches_reference_on_leagues():
+    for league in HASHMAP_LEAGUE_IDS:
+        assert format_string(league) == reference_format_string(league)
+
+
+def test_format_string_is_memoized():
+    format_string.cache_clear()
+    format_string('1. FC Köln')
+    format_string('1. FC Köln')
+    assert format_string.cache_info().hits == 1
+
+
+def test_league_priorities_name_known_leagues():
+    from utils.constants import LEAGUE_PRIORITIES
+    from utils.link_mapper import league_weight
+
+    assert set(LEAGUE_PRIORITIES) <= set(HASHMAP_LEAGUE_IDS)
+    assert league_weight('Premier League') > league_weight('EFL Championship') > league_weight('EFL League One')
@@ -0,0 +1,39 @@
+import logging
+import os
+
+import pytest
+
+from utils import logger
+
+
+@pytest.fixture
+def logs_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(logger, 'PROJECT_DIRECTORY', str(tmp_path))
+    yield tmp_path / logger.LOG_CATALOG
+    logger.stop_listeners()
+
+
+def test_handler_is_registered_once(logs_directory):
+    first = logger.configure_logger('tests.once', 'once.log')
+    second = logger.configure_logger('tests.once', 'once.log')
+    assert first is second
+    assert len(first.handlers) == 1
+
+
+def test_shared_file_is_appended_without_rotation(logs_directory):
+    logger.configure_logger('tests.shared', 'shared.log').info('message')
+    logger.stop_listeners()
+    assert os.listdir(logs_directory) == ['shared.log']
+    assert 'message' in (logs_directory / 'shared.log').read_text()
+
+
+def test_timed_rotation_uses_a_file_per_process(logs_directory):
+    logger.configure_logger('tests.timed', 'timed.log', when='midnight').info('message')
+    logger.stop_listeners()
+    assert os.listdir(logs_directory) == [f'timed.{os.getpid()}.log']
+
+
+def test_conflicting_rotation_raises(logs_directory):
+    logger.configure_logger('tests.conflict', 'conflict.log')
+    with pytest.raises(ValueError):
+        logger.configure_logger('tests.conflict_timed', 'conflict.log', when='midnight')
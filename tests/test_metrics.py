@@ -0,0 +1,18 @@
+from utils.metrics import METRICS, ScopedExecutor, metrics_scope
+
+
+def test_scopes_keep_the_metrics_of_their_jobs():
+    METRICS.increment('test_process_total')
+    with metrics_scope() as first:
+        METRICS.increment('test_job_total', league='first')
+        # Tasks of a scoped executor record in the scope of the submitting thread
+        with ScopedExecutor(max_workers=2) as executor:
+            list(executor.map(lambda _: METRICS.increment('test_task_total'), range(4)))
+        with metrics_scope() as second:
+            METRICS.increment('test_job_total', league='second')
+
+    assert first.counters == {('test_job_total', (('league', 'first'),)): 1, ('test_task_total', ()): 4}
+    assert second.counters == {('test_job_total', (('league', 'second'),)): 1}
+    assert METRICS.process.counters[('test_process_total', ())] == 1
+    assert ('test_job_total', (('league', 'first'),)) not in METRICS.process.counters
+    METRICS.reset()
@@ -0,0 +1,41 @@
+import msgspec
+
+from utils.payloads import MatchDetails
+
+
+def decode(payload: bytes) -> MatchDetails:
+    return msgspec.json.decode(payload, type=MatchDetails, strict=False)
+
+
+def test_numbers_sent_as_strings_are_read():
+    details = decode(b'{"header": {"teams": [{"id": "1", "score": "2"}, {"id": 2, "score": 0}], "status": {}},'
+                     b' "content": {"matchFacts": {"infoBox": {"Attendance": "41000"}}}}')
+    assert details.header.teams[0].score == 2
+    assert details.content.match_facts().infoBox.attendance == 41000
+
+
+def test_drift_in_a_block_costs_only_that_block():
+    details = decode(b'{"header": {"teams": [{"id": 1}, {"id": 2}], "status": {}},'
+                     b' "content": {"matchFacts": {"infoBox": {"Stadium": {"name": "Anfield"}}},'
+                     b' "lineup2": {"homeTeam": {"formation": ["4-3-3"]}}}}')
+    assert details.content.lineup() is None
+    assert details.content.match_facts().infoBox.stadium.name == 'Anfield'
+
+
+def test_missing_blocks_are_none():
+    details = decode(b'{"error": true, "content": {"lineup2": null}}')
+    assert details.error
+    assert details.content.match_facts() is None
+    assert details.content.lineup() is None
+
+
+def test_appearances_last_until_the_end_of_extra_time():
+    from scripts.match_details import FotmobDetails
+
+    details = decode(b'{"header": {"teams": [{"id": 1}, {"id": 2}], "status": {"reason": {"short": "AET"}}},'
+                     b' "content": {"lineup2": {"homeTeam": {"starters": [{"id": 10, "performance":'
+                     b' {"substitutionEvents": [{"time": 100, "type": "subOut"}]}}, {"name": "No ID"}],'
+                     b' "subs": [{"id": 11, "performance": {"substitutionEvents": [{"time": 100, "type": "subIn"}]}},'
+                     b' {"id": 12}]}}}}')
+    rows = FotmobDetails._get_player_rows(7, details)
+    assert [(row[1], row[2], row[7]) for row in rows] == [(10, 1, 100), (11, 1, 20)]
@@ -0,0 +1,18 @@
+import os
+
+from utils import profiler
+
+
+def test_a_nested_run_is_not_profiled(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, 'PROJECT_DIRECTORY', str(tmp_path))
+    profiles_directory = os.path.join(str(tmp_path), profiler.LOG_CATALOG, profiler.PROFILES_CATALOG)
+
+    with profiler.profile_run('outer', 'test', enabled=True, run_id='1'):
+        with profiler.profile_run('inner', 'test', enabled=True, run_id='1'):
+            pass
+
+    assert sorted(os.listdir(profiles_directory)) == ['outer_test_1.folded', 'outer_test_1.pstats']
+    # The lock is released, so the next run is profiled again
+    with profiler.profile_run('next', 'test', enabled=True, run_id='1'):
+        pass
+    assert 'next_test_1.pstats' in os.listdir(profiles_directory)
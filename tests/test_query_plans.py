@@ -0,0 +1,46 @@
+import pytest
+
+from utils.database.initializer import _find_index_columns, check_query_plans
+
+NAME_SCHEMA = 'premier_league'
+# The indexes of 'index_queries' serving the hot queries
+HOT_INDEXES = ['matches_season_match_id_idx', 'matches_home_id_idx', 'matches_away_id_idx',
+               'match_details_utc_time_idx', 'match_details_stadium_idx']
+
+
+def test_a_full_scan_of_the_primary_key_is_not_an_index_lookup():
+    columns = {('matches', 'season')}
+    full_scan = {'Node Type': 'Index Scan', 'Relation Name': 'matches', 'Index Name': 'matches_pkey',
+                 'Filter': '(season = $0)'}
+    lookup = {'Node Type': 'Bitmap Heap Scan', 'Relation Name': 'matches', 'Recheck Cond': '(season = $0)',
+              'Plans': [{'Node Type': 'Bitmap Index Scan', 'Index Name': 'matches_season_match_id_idx',
+                         'Index Cond': '(season = $0)'}]}
+
+    assert _find_index_columns({'Node Type': 'Result', 'Plans': [full_scan]}, columns) == set()
+    assert _find_index_columns({'Node Type': 'Result', 'Plans': [lookup]}, columns) == columns
+
+
+@pytest.fixture(scope='module')
+def postgres():
+    from benchmarks.postgres import DisposablePostgres
+    try:
+        with DisposablePostgres() as server:
+            server.reset_league(NAME_SCHEMA)
+            yield server
+    except (RuntimeError, OSError) as e:
+        pytest.skip(f'A local PostgreSQL server is required: {e}')
+
+
+def test_hot_queries_use_their_indexes(postgres):
+    with postgres.connect() as connection, connection.cursor() as cursor:
+        assert check_query_plans(cursor, NAME_SCHEMA)
+
+
+@pytest.mark.parametrize('name_index', HOT_INDEXES)
+def test_a_dropped_index_is_reported(postgres, name_index):
+    with postgres.connect() as connection, connection.cursor() as cursor:
+        cursor.execute(f'DROP INDEX {NAME_SCHEMA}.{name_index};')
+        try:
+            assert not check_query_plans(cursor, NAME_SCHEMA)
+        finally:
+            connection.rollback()
@@ -0,0 +1,42 @@
+import pytest
+
+from utils import reference_cache
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    file_path = str(tmp_path / 'league.bin')
+    reference_cache.build(file_path, b'0' * 32, [(2, 'Chelsea'), (1, 'Arsenal')], ['Anfield'],
+                          [('Premier League', 'premier_league')])
+    return file_path
+
+
+def test_lookups(cache_file):
+    with reference_cache.ReferenceCache(cache_file) as cache:
+        assert cache.team_ids() == [1, 2]
+        assert cache.team_title(2) == 'Chelsea'
+        assert cache.team_title(3) is None
+        assert cache.has_stadium('Anfield')
+        assert cache.schema('Premier League') == 'premier_league'
+
+
+@pytest.mark.parametrize('size', [0, 5, reference_cache.HEADER.size + 4, -1])
+def test_truncated_file_is_rejected(cache_file, size):
+    with open(cache_file, 'rb') as file:
+        content = file.read()
+    with open(cache_file, 'wb') as file:
+        file.write(content[:size])
+    with pytest.raises(ValueError):
+        reference_cache.ReferenceCache(cache_file)
+
+
+def test_fingerprint_follows_the_watermarks(monkeypatch):
+    watermarks = {'teams': 750, 'matches': 900}
+    monkeypatch.setattr(reference_cache, 'get_watermarks', lambda connection, name_schema: dict(watermarks))
+    digest = reference_cache.fingerprint(None, 'premier_league')
+
+    # Tables the cache is not built from do not invalidate it
+    watermarks['matches'] = 901
+    assert reference_cache.fingerprint(None, 'premier_league') == digest
+    watermarks['stadiums'] = 902
+    assert reference_cache.fingerprint(None, 'premier_league') != digest
@@ -0,0 +1,294 @@
+from typing import Dict, List, Tuple, Any, Optional, Sequence
+from psycopg2 import extensions
+import numpy as np
+
+from utils.database.connector import connect_to_database
+from utils.link_mapper import league_schemas
+from utils.constants import ANALYTICS_FILE_LOG
+from utils.logger import configure_logger
+
+# Configure logger for the current module
+LOGGER = configure_logger(__name__, ANALYTICS_FILE_LOG)
+
+# Columns of the accumulated statistics of a team, per season and venue
+STATISTICS: List[str] = ['played', 'won', 'drawn', 'lost', 'goals_for', 'goals_against']
+VENUES: Dict[str, int] = {'home': 0, 'away': 1}
+POINTS_WIN, POINTS_DRAW = 3, 1
+# Matches without a kickoff time in 'match_details' are ordered after all the others (by 'match_id')
+UNKNOWN_KICKOFF = np.iinfo(np.int64).max
+
+# Version of the rows of a match: the transactions that last wrote its 'matches', 'match_results' and
+# 'match_details' rows. A corrected score or kickoff writes a new row version, so the version changes
+VERSION_COLUMN = "m.xmin::TEXT || ':' || r.xmin::TEXT || ':' || COALESCE(d.xmin::TEXT, '')"
+
+TABLE_DTYPE = np.dtype([('team_id', np.int32)] + [(name, np.int32) for name in STATISTICS] +
+                       [('goal_difference', np.int32), ('points', np.int32)])
+
+
+class LeagueAnalytics:
+    """
+    Columnar, in-memory analytics of one league: league tables, home/away splits,
+    rolling form and head-to-head, computed with vectorized NumPy operations.
+
+    The results of the league are loaded once into arrays (one per column). The per season,
+    team and venue statistics are accumulated when results are added, so a refresh only reads
+    and aggregates the results that arrived or changed since the previous one.
+
+    Args:
+        name_schema (str): Schema name of the league.
+
+    Attributes:
+        columns (Dict[str, np.ndarray]): The loaded results, one array per column.
+        keys (np.ndarray): Sorted (season << 32 | team_id) keys of the accumulated statistics.
+        totals (np.ndarray): Statistics of shape (len(keys), len(VENUES), len(STATISTICS)).
+    """
+    COLUMNS: List[Tuple[str, Any]] = [('match_id', np.int32), ('season', np.int32), ('home_id', np.int32),
+                                      ('away_id', np.int32), ('home_goals', np.int32),
+                                      ('away_goals', np.int32), ('kickoff', np.int64), ('version', np.str_)]
+
+    def __init__(self, name_schema: str):
+        self.name_schema = name_schema
+        self.columns: Dict[str, np.ndarray] = {name: np.empty(0, dtype=dtype) for name, dtype in self.COLUMNS}
+        self.keys = np.empty(0, dtype=np.int64)
+        self.totals = np.zeros((0, len(VENUES), len(STATISTICS)), dtype=np.int32)
+
+    def _query(self, connection: extensions.connection, match_ids: Optional[Sequence[int]] = None) -> List[tuple]:
+        query = f"""
+            SELECT m.match_id, m.season, m.home_id, m.away_id, r.score_ht, r.score_at,
+                   EXTRACT(EPOCH FROM d.utc_time)::BIGINT, {VERSION_COLUMN}
+            FROM {self.name_schema}.matches AS m
+            JOIN {self.name_schema}.match_results AS r USING (match_id)
+            LEFT JOIN {self.name_schema}.match_details AS d USING (match_id)
+        """
+        with connection.cursor() as cursor:
+            if match_ids is None:
+                cursor.execute(query)
+            else:
+                cursor.execute(f'{query} WHERE m.match_id = ANY(%s)', (list(match_ids),))
+            return cursor.fetchall()
+
+    def load(self, connection: extensions.connection) -> int:
+        """
+        Loads all results of the league, replacing the loaded ones.
+
+        Returns:
+            Number of loaded results.
+        """
+        self.__init__(self.name_schema)
+        return self.add_results(self._query(connection))
+
+    def refresh(self, connection: extensions.connection) -> int:
+        """
+        Loads the results that are not loaded yet and reloads the changed ones.
+
+        Only the IDs and versions of the results are compared, the rows are read for the new and
+        changed ones. The statistics of a changed (e.g. a corrected score) or deleted result
+        are subtracted before the new ones are added.
+
+        Returns:
+            Number of new and changed results.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT m.match_id, {VERSION_COLUMN}
+                FROM {self.name_schema}.matches AS m
+                JOIN {self.name_schema}.match_results AS r USING (match_id)
+                LEFT JOIN {self.name_schema}.match_details AS d USING (match_id);
+                """)
+            rows = cursor.fetchall()
+        stored_ids = np.fromiter((row[0] for row in rows), dtype=np.int32, count=len(rows))
+        stored_versions = np.array([row[1] for row in rows], dtype=np.str_)
+
+        loaded_ids = self.columns['match_id']
+        is_loaded = np.isin(stored_ids, loaded_ids)
+        order = np.argsort(loaded_ids)
+        positions = order[np.searchsorted(loaded_ids, stored_ids[is_loaded], sorter=order)]
+        changed = stored_ids[is_loaded][self.columns['version'][positions] != stored_versions[is_loaded]]
+        removed = np.setdiff1d(loaded_ids, stored_ids, assume_unique=True)
+
+        self._remove(np.concatenate((changed, removed)))
+        reloaded = np.concatenate((stored_ids[~is_loaded], changed))
+        if reloaded.size == 0:
+            return 0
+        return self.add_results(self._query(connection, reloaded.tolist()))
+
+    def _remove(self, match_ids: np.ndarray) -> None:
+        """
+        Removes loaded results and subtracts their statistics.
+        """
+        if match_ids.size == 0:
+            return None
+        mask = np.isin(self.columns['match_id'], match_ids)
+        self._accumulate({name: values[mask] for name, values in self.columns.items()}, sign=-1)
+        self.columns = {name: values[~mask] for name, values in self.columns.items()}
+        LOGGER.info(f'Removed {int(mask.sum())} changed or deleted results of "{self.name_schema}".')
+
+    def add_results(self, rows: Sequence[Sequence[Any]]) -> int:
+        """
+        Appends results and accumulates their statistics.
+
+        Args:
+            rows (Sequence[Sequence[Any]]): Rows of (match_id, season, home_id, away_id,
+                home_goals, away_goals, kickoff as a Unix timestamp or None, version).
+
+        Returns:
+            Number of added results.
+        """
+        if not rows:
+            return 0
+
+        new_columns = {}
+        for (name, dtype), values in zip(self.COLUMNS, zip(*rows)):
+            if name == 'kickoff':
+                values = [UNKNOWN_KICKOFF if value is None else value for value in values]
+            new_columns[name] = np.asarray(values, dtype=dtype)
+
+        for name, values in new_columns.items():
+            self.columns[name] = np.concatenate((self.columns[name], values))
+        self._accumulate(new_columns)
+
+        LOGGER.info(f'Added {len(rows)} results of "{self.name_schema}".')
+        return len(rows)
+
+    def _accumulate(self, new_columns: Dict[str, np.ndarray], sign: int = 1) -> None:
+        home_goals, away_goals = new_columns['home_goals'], new_columns['away_goals']
+        season = new_columns['season'].astype(np.int64) << 32
+        home_keys = season | new_columns['home_id'].astype(np.int64)
+        away_keys = season | new_columns['away_id'].astype(np.int64)
+
+        # New keys are merged into the sorted keys and the existing totals are moved to their new rows
+        keys = np.union1d(self.keys, np.concatenate((home_keys, away_keys)))
+        if keys.size != self.keys.size:
+            totals = np.zeros((keys.size, len(VENUES), len(STATISTICS)), dtype=np.int32)
+            totals[np.searchsorted(keys, self.keys)] = self.totals
+            self.keys, self.totals = keys, totals
+
+        played = np.ones_like(home_goals)
+        home_statistics = np.stack((played, home_goals > away_goals, home_goals == away_goals,
+                                    home_goals < away_goals, home_goals, away_goals), axis=1)
+        away_statistics = np.stack((played, away_goals > home_goals, away_goals == home_goals,
+                                    away_goals < home_goals, away_goals, home_goals), axis=1)
+
+        # 'np.add.at' is unbuffered, so a team playing several new matches is counted for each of them
+        np.add.at(self.totals, (np.searchsorted(self.keys, home_keys), VENUES['home']), sign * home_statistics)
+        np.add.at(self.totals, (np.searchsorted(self.keys, away_keys), VENUES['away']), sign * away_statistics)
+
+    def seasons(self) -> np.ndarray:
+        return np.unique(self.keys >> 32).astype(np.int32)
+
+    def league_table(self, season: int, venue: Optional[str] = None) -> np.ndarray:
+        """
+        Returns the league table of a season, ordered by points, goal difference and goals scored.
+
+        Args:
+            season (int): Season, as stored in 'matches'.
+            venue (Optional[str]): 'home' or 'away' to count only the matches at that venue.
+
+        Returns:
+            A structured array of TABLE_DTYPE, one row per team.
+        """
+        start, end = np.searchsorted(self.keys, [season << 32, (season + 1) << 32])
+        totals = self.totals[start:end]
+        totals = totals.sum(axis=1) if venue is None else totals[:, VENUES[venue]]
+
+        table = np.zeros(end - start, dtype=TABLE_DTYPE)
+        table['team_id'] = self.keys[start:end] & 0xFFFFFFFF
+        for position, name in enumerate(STATISTICS):
+            table[name] = totals[:, position]
+        table['goal_difference'] = table['goals_for'] - table['goals_against']
+        table['points'] = table['won'] * POINTS_WIN + table['drawn'] * POINTS_DRAW
+
+        return table[np.lexsort((-table['goals_for'], -table['goal_difference'], -table['points']))]
+
+    def home_away_splits(self, season: int) -> Dict[str, np.ndarray]:
+        return {venue: self.league_table(season, venue) for venue in VENUES}
+
+    def rolling_form(self, season: Optional[int] = None, window: int = 5) -> Dict[int, np.ndarray]:
+        """
+        Returns the points of every team over its last 'window' matches, after each of its matches.
+
+        Args:
+            season (Optional[int]): Season to compute the form in, all seasons if None.
+            window (int): Number of matches the form is computed over.
+
+        Returns:
+            Team ID -> array of the rolling points, in the chronological order of its matches.
+        """
+        columns = self.columns
+        mask = slice(None) if season is None else columns['season'] == season
+        home_goals, away_goals = columns['home_goals'][mask], columns['away_goals'][mask]
+        order = np.lexsort((columns['match_id'][mask], columns['kickoff'][mask]))
+        # Chronological position of every match
+        position = np.empty_like(order)
+        position[order] = np.arange(order.size)
+
+        home_points = np.where(home_goals > away_goals, POINTS_WIN, np.where(home_goals == away_goals, POINTS_DRAW, 0))
+        away_points = np.where(away_goals > home_goals, POINTS_WIN, np.where(away_goals == home_goals, POINTS_DRAW, 0))
+
+        # One row per team and match, sorted by team and then chronologically
+        teams = np.concatenate((columns['home_id'][mask], columns['away_id'][mask]))
+        points = np.concatenate((home_points, away_points))
+        positions = np.concatenate((position, position))
+        sort = np.lexsort((positions, teams))
+        teams, points = teams[sort], points[sort]
+
+        # The rolling sum is a difference of cumulative sums, bounded by the first match of each team
+        team_ids, group_starts = np.unique(teams, return_index=True)
+        cumulative = np.concatenate(([0], np.cumsum(points)))
+        indices = np.arange(1, points.size + 1)
+        group_start = np.repeat(group_starts, np.diff(np.append(group_starts, points.size)))
+        rolling = cumulative[indices] - cumulative[np.maximum(indices - window, group_start)]
+
+        return dict(zip(team_ids.tolist(), np.split(rolling, group_starts[1:])))
+
+    def head_to_head(self, team_id: int, opponent_id: int) -> Dict[str, int]:
+        """
+        Returns the record of a team against an opponent over all loaded matches.
+        """
+        columns = self.columns
+        at_home = (columns['home_id'] == team_id) & (columns['away_id'] == opponent_id)
+        away = (columns['home_id'] == opponent_id) & (columns['away_id'] == team_id)
+
+        goals_for = np.where(at_home, columns['home_goals'], columns['away_goals'])[at_home | away]
+        goals_against = np.where(at_home, columns['away_goals'], columns['home_goals'])[at_home | away]
+
+        return {
+            'played': int(goals_for.size),
+            'won': int(np.count_nonzero(goals_for > goals_against)),
+            'drawn': int(np.count_nonzero(goals_for == goals_against)),
+            'lost': int(np.count_nonzero(goals_for < goals_against)),
+            'goals_for': int(goals_for.sum()),
+            'goals_against': int(goals_against.sum())
+        }
+
+
+def load_leagues(connection: extensions.connection,
+                 analytics: Optional[Dict[str, LeagueAnalytics]] = None) -> Dict[str, LeagueAnalytics]:
+    """
+    Loads the analytics of all leagues, or refreshes already loaded ones with the new results.
+    """
+    analytics = analytics if analytics is not None else {}
+    for name_schema in league_schemas().values():
+        try:
+            if name_schema in analytics:
+                analytics[name_schema].refresh(connection)
+            else:
+                league = LeagueAnalytics(name_schema)
+                league.load(connection)
+                analytics[name_schema] = league
+        except Exception as e:
+            connection.rollback()
+            LOGGER.error(f'Error loading the results of "{name_schema}": {str(e).strip()}.')
+    return analytics
+
+
+if __name__ == '__main__':
+    with connect_to_database() as connection:
+        epl = LeagueAnalytics(league_schemas()['Premier League'])
+        epl.load(connection)
+
+    if epl.keys.size:
+        last_season = int(epl.seasons()[-1])
+        print(f'Premier League, season {last_season}')
+        for place, row in enumerate(epl.league_table(last_season), start=1):
+            print(f'{place:>2}. {row["team_id"]:>7}  {row["played"]:>2}  {row["goal_difference"]:>+4}  {row["points"]:>3}')
@@ -1,15 +1,25 @@
 from typing import List, Dict, Optional
+import json
 import os
 
 # The order of elements is important in the DATABASE_TABLE_NAME list
 DATABASE_FIRST_TABLES: List[str] = [
     'teams', 'matches', 'match_lineups',
     'match_results', 'stadiums', 'match_details',
-    'players', 'transfers'
+    'match_players', 'players', 'transfers'
+]
+# Aggregates of DATABASE_FIRST_TABLES per league and season, kept up to date by 'utils.database.summaries'
+DATABASE_SUMMARY_TABLES: List[str] = [
+    'standings', 'stadium_attendance', 'matchday_goals'
 ]
 DATABASE_SECOND_TABLES: List[str] = [
     'cards', 'outfield_players', 'goalkeepers', 'prices'
 ]
+# Schema of the EA FC season crawled from fut.gg by 'scripts.eafc.players'
+EAFC_SCHEMA: str = os.environ.get('EAFC_SCHEMA', 'eafc24')
+# Schema of the optional layout in which DATABASE_FIRST_TABLES of all leagues
+# are stored in one set of tables, partitioned by league
+CONSOLIDATED_SCHEMA: str = 'leagues'
 HASHMAP_LEAGUE_IDS: Dict[str, List[Optional[str]]] = {
     'Liga Profesional de Fútbol': ['112', 'liga-profesional',
                                    'copa-de-la-liga-profesional-de-futbol', 'CDLP'],
@@ -123,19 +133,92 @@ HASHMAP_LEAGUE_IDS: Dict[str, List[Optional[str]]] = {
                None, None]
 }
 
+# Base URLs of the sources, overridden to point the scripts at a local stand-in server (see 'benchmarks')
+FOTMOB_API_URL: str = os.environ.get('FOTMOB_API_URL', 'https://www.fotmob.com/api/')
+FUTGG_URL: str = os.environ.get('FUTGG_URL', 'https://www.fut.gg/')
+TRANSFERMARKT_URL: str = os.environ.get('TRANSFERMARKT_URL', 'https://www.transfermarkt.com/')
+# Number of threads fetching data concurrently, by default chosen by ThreadPoolExecutor
+MAX_WORKERS: Optional[int] = int(os.environ['MAX_WORKERS']) if os.environ.get('MAX_WORKERS') else None
+# Transfermarkt attendance lookups of 'match_statistics': rate, number of threads and persistent cache
+TRANSFERMARKT_REQUESTS_PER_SECOND: float = float(os.environ.get('TRANSFERMARKT_REQUESTS_PER_SECOND', '1'))
+TRANSFERMARKT_WORKERS: int = int(os.environ.get('TRANSFERMARKT_WORKERS', '4'))
+TRANSFERMARKT_ATTENDANCE_CACHE: str = 'transfermarkt_attendance.json'
+# Live mode ('scripts.live_matches'): total FOTMOB requests per second and number of polling threads
+LIVE_REQUESTS_PER_SECOND: float = float(os.environ.get('LIVE_REQUESTS_PER_SECOND', '8'))
+LIVE_WORKERS: int = int(os.environ.get('LIVE_WORKERS', '16'))
+# Read API ('scripts.read_api'): port, number of cached responses and of database connections
+READ_API_PORT: int = int(os.environ.get('READ_API_PORT', '8080'))
+READ_API_CACHE_SIZE: int = int(os.environ.get('READ_API_CACHE_SIZE', '2048'))
+READ_API_CONNECTIONS: int = int(os.environ.get('READ_API_CONNECTIONS', '4'))
+# Scheduling weights of the leagues in 'scripts.run_leagues' and the DAG (see 'utils.link_mapper.league_weight').
+# Every league is listed by its priority: the five top leagues, the other strong first tiers and the
+# continental cups, the remaining first tiers, the second tiers. Third tiers, women's leagues and
+# any league missing here get DEFAULT_LEAGUE_WEIGHT.
+# Single leagues are overridden with e.g. LEAGUE_WEIGHTS='{"Premier League": 12}'
+LEAGUE_PRIORITIES: Dict[str, float] = {
+    'Premier League': 10, 'LALIGA EA SPORTS': 10, 'Bundesliga': 10, 'Serie A TIM': 10, 'Ligue 1 Uber Eats': 10,
+
+    'Eredivisie': 6, 'Liga Portugal': 6, '1A Pro League': 6, 'Trendyol Süper Lig': 6, 'Major League Soccer': 6,
+    'ROSHN Saudi League': 6, 'Liga Profesional de Fútbol': 6, 'CONMEBOL Libertadores': 6,
+    'CONMEBOL Sudamericana': 4,
+
+    'cinch Premiership': 3, 'Österreichische Fußball-Bundesliga': 3, 'Credit Suisse Super League': 3,
+    '3F Superliga': 3, 'Hellas Liga': 3, 'Česká Liga': 3, 'PKO Bank Polski Ekstraklasa': 3, 'Ukrayina Liha': 3,
+    'Liga Hrvatska': 3, 'SUPERLIGA': 3, 'Magyar Liga': 3, 'Liga Cyprus': 3, 'Eliteserien': 3, 'Allsvenskan': 3,
+    'Finnliiga': 3, "SSE Airtricity Men's Premier Division": 3, 'Chinese Football Association Super League': 3,
+    'K League 1': 3, 'Isuzu UTE A League': 3, 'United Emirates League': 3, 'Hero Indian Super League': 3,
+
+    'EFL Championship': 2, 'LALIGA HYPERMOTION': 2, 'Bundesliga 2': 2, 'Serie BKT': 2, 'Ligue 2 BKT': 2
+}
+DEFAULT_LEAGUE_WEIGHT: float = 1
+LEAGUE_WEIGHTS: Dict[str, float] = json.loads(os.environ.get('LEAGUE_WEIGHTS', '{}'))
+# Weight of the fut.gg crawl, which only fills the capacity left by the leagues
+PLAYERS_WEIGHT: float = float(os.environ.get('PLAYERS_WEIGHT', '0.5'))
+# Jobs running at once per source host in 'scripts.run_leagues', and the deadline of a job
+# of weight 1 in seconds after the start of the run (a job of weight w is due after 1 / w of it)
+SCHEDULER_HOST_SLOTS: Dict[str, int] = json.loads(os.environ.get('SCHEDULER_HOST_SLOTS',
+                                                                 '{"fotmob": 4, "futgg": 1}'))
+SCHEDULER_DEADLINE_SECONDS: float = float(os.environ.get('SCHEDULER_DEADLINE_SECONDS', '3600'))
+# Number of processes parsing HTML (see 'utils.parse_pool'), by default one per CPU
+PARSE_WORKERS: Optional[int] = int(os.environ['PARSE_WORKERS']) if os.environ.get('PARSE_WORKERS') else None
+
 # We obtain the current directory and its parent directory.
 # An absolute path is constructed based on the parent path
 PROJECT_DIRECTORY: str = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
 RESOURCE_CATALOG: str = 'resources'
+# Memory-mapped reference data (teams, stadiums, leagues) shared by the processes of a run
+REFERENCE_CACHE_CATALOG: str = 'cache'
 LOG_CATALOG: str = 'logs'
+# The shared log files are appended to by many processes and rotated externally (e.g. by logrotate);
+# files rotated by time in the process ('configure_logger(..., when=...)') keep LOG_BACKUP_COUNT previous files
+LOG_BACKUP_COUNT: int = 5
+# Per-run metrics are exported to 'logs/metrics' as Prometheus text ('prom') or JSON ('json')
+METRICS_CATALOG: str = 'metrics'
+METRICS_FORMAT: str = os.environ.get('METRICS_FORMAT', 'prom')
+# Runs are profiled into 'logs/profiles' when PROFILE=1 (or when the DAG is triggered with {"profile": true}),
+# one run of a process at a time (see 'utils.profiler.profile_run')
+PROFILES_CATALOG: str = 'profiles'
+PROFILE_RUNS: bool = os.environ.get('PROFILE', '').lower() in ('1', 'true', 'yes')
+# Parquet dataset of all leagues for analytics, partitioned by league and season
+EXPORT_CATALOG: str = 'exports'
 
 DATABASE_INFO_FILE_LOG: str = 'database_info.log'
 
 MATCHES_FILE_LOG: str = 'matches.log'
 STADIUMS_FILE_LOG: str = 'stadiums.log'
 MATCH_DETAILS_FILE_LOG: str = 'match_details.log'
-LINK_MAPPER_FILE_LOG: str = 'link_mapper.log'
+MATCH_STATISTICS_FILE_LOG: str = 'match_statistics.log'
+LIVE_MATCHES_FILE_LOG: str = 'live_matches.log'
+RETRY_FAILED_FILE_LOG: str = 'retry_failed.log'
+QUEUE_WORKER_FILE_LOG: str = 'queue_worker.log'
+RUN_LEAGUES_FILE_LOG: str = 'run_leagues.log'
+READ_API_FILE_LOG: str = 'read_api.log'
+EXPORT_FILE_LOG: str = 'export_parquet.log'
+ANALYTICS_FILE_LOG: str = 'analytics.log'
+PROFILER_FILE_LOG: str = 'profiler.log'
 
 EAFC_CARDS_FILE_LOG: str = 'eafc_cards.log'
 EAFC_PARAMETERS_FILE_LOG: str = 'eafc_parameters.log'
 EAFC_PRICES_FILE_LOG: str = 'eafc_prices.log'
+
+TRANSFERMARKT_PLAYERS_FILE_LOG: str = 'transfermarkt_players.log'
@@ -1,13 +1,93 @@
 from psycopg2 import connect, extensions, OperationalError
-from typing import List, Any
+from typing import Sequence, Optional, NamedTuple, Dict, Tuple, List, Any
+from psycopg2.extras import execute_values
 from decouple import config
+from uuid import uuid4
+import threading
+import io
 
 from utils.constants import DATABASE_INFO_FILE_LOG
+from utils.database.rows import TABLE_COLUMNS
 from utils.logger import configure_logger
+from utils.metrics import METRICS
 
 # Configure logger for the current module
 LOGGER = configure_logger(__name__, DATABASE_INFO_FILE_LOG)
 
+# Escapes of the text format of COPY
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+class Upsert(NamedTuple):
+    """
+    The conflict key of a table and the columns updated when a row of that key already exists.
+    """
+    key: Tuple[str, ...]
+    columns: Tuple[str, ...]
+
+
+class WriteCounts(NamedTuple):
+    inserted: int
+    updated: int
+    unchanged: int
+    # Keys (in the order of the key columns) of the rows inserted or updated, not of the unchanged ones
+    written_keys: Tuple[Tuple[Any, ...], ...] = ()
+
+
+# Tables whose rows are corrected after they were first written (scores, attendances, renamed teams,
+# stadium capacities, market values); 'upsert_data' uses these unless a key and columns are given
+UPSERT_TABLES: Dict[str, Upsert] = {
+    'teams': Upsert(('team_id',), ('title',)),
+    'match_results': Upsert(('match_id',), ('score_ht', 'score_at')),
+    'match_lineups': Upsert(('match_id',), ('lineup_ht', 'lineup_at')),
+    'match_details': Upsert(('match_id',), ('utc_time', 'stadium', 'attendance', 'reason')),
+    'stadiums': Upsert(('stadium',), ('city', 'capacity', 'opened', 'surface', 'latitude', 'longitude')),
+    'players': Upsert(('player_id',), ('name_player', 'date_of_birth', 'nationality', 'height', 'foot')),
+    'transfers': Upsert(('player_id', 'transfer_date'), ('market_value', 'club'))
+}
+
+
+# Ingestion watermarks of the tables, read by 'scripts.read_api' to invalidate its cache. Every write of
+# 'insert_data', 'copy_data' and 'upsert_data' that changes rows sets the version of its table to the ID
+# of its transaction, before the commit: the version changes exactly when the rows are visible,
+# and a rolled back write leaves it as it was
+WATERMARKS_QUERY = """
+    CREATE TABLE IF NOT EXISTS public.ingestion_watermarks (
+        name_schema TEXT NOT NULL,
+        name_table TEXT NOT NULL,
+        version BIGINT NOT NULL,
+        updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        PRIMARY KEY (name_schema, name_table)
+    );
+"""
+
+BUMP_WATERMARK_QUERY = """
+    INSERT INTO public.ingestion_watermarks (name_schema, name_table, version)
+    VALUES (%s, %s, txid_current())
+    ON CONFLICT (name_schema, name_table) DO UPDATE
+    SET version = EXCLUDED.version, updated_at = now();
+"""
+
+
+def create_watermarks(cursor) -> None:
+    """
+    Creates the table of the ingestion watermarks shared by all schemas if it does not exist.
+    """
+    cursor.execute(WATERMARKS_QUERY)
+    cursor.connection.commit()
+
+
+def get_watermarks(connection: extensions.connection, name_schema: str) -> Dict[str, int]:
+    """
+    Returns the ingestion watermarks of the tables of a schema. The versions only grow, so unlike
+    the 'xmin' of the rows (which wraps around and is rewritten by freezing) a changed table never
+    gets back an older version. A table not written since the watermarks were introduced has none.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT name_table, version FROM public.ingestion_watermarks WHERE name_schema = %s;',
+                       (name_schema,))
+        return dict(cursor.fetchall())
+
 
 def connect_to_database() -> extensions.connection:
     """
@@ -19,11 +99,11 @@ def connect_to_database() -> extensions.connection:
     try:
         # Attempt to establish a database connection
         with connect(
-            database='football_competitions',
+            database=config('PG_DATABASE', default='football_competitions'),
             user=config('PG_USER'),
             password=config('PG_PASSWORD'),
             host=config('PG_HOST'),
-            port='5432'
+            port=config('PG_PORT', default='5432')
         ) as current_connection:
             return current_connection
 
@@ -32,16 +112,20 @@ def connect_to_database() -> extensions.connection:
         raise
 
 def insert_data(connection: extensions.connection, 
-                schema_name: str, table_name: str, data: List[List[Any]]) -> None:
+                schema_name: str, table_name: str, data: Sequence[Sequence[Any]]) -> None:
     """
-    Inserts data into a specified table.
+    Inserts data into a specified table. Existing rows are kept as they are, see 'upsert_data' to update them.
 
     Args:
         connection (psycopg2.extensions.connection): Database connection object.
         schema_name (str): Name of the schema where the table is located.
         table_name (str): Name of the table where data should be inserted.
-        data (List[List[Any]]): List of rows, where each row is a list of values to be inserted.
+        data (Sequence[Sequence[Any]]): List of rows, where each row is a sequence of values to be inserted
+            (e.g. a row type from 'utils.database.rows').
     """
+    if not data:
+        return None
+
     try:
         with connection.cursor() as cursor:
             placeholders = ', '.join(['%s'] * len(data[0]))
@@ -50,10 +134,183 @@ def insert_data(connection: extensions.connection,
                     {placeholders}
                 ) ON CONFLICT DO NOTHING;
                 """
-            cursor.executemany(query, data)
-            connection.commit()
+            with METRICS.timer('db_write_seconds', table=table_name):
+                cursor.executemany(query, data)
+                # The row count of 'executemany' is the sum over the rows, 0 if all of them existed
+                if cursor.rowcount != 0:
+                    cursor.execute(BUMP_WATERMARK_QUERY, (schema_name, table_name))
+                connection.commit()
+            METRICS.increment('db_rows_written_total', len(data), table=table_name)
 
     except Exception as e:
         connection.rollback()
+        METRICS.increment('db_write_errors_total', table=table_name)
         LOGGER.error(f'Error inserting data into "{schema_name}.{table_name}": {str(e)}.')
         raise
+
+
+def _copy_value(value: Any) -> str:
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).translate(COPY_ESCAPES)
+
+
+class ThreadConnections:
+    """
+    One connection per thread, opened on its first use.
+
+    The helpers of this module commit or roll back after every write, which would end the transactions
+    of other threads sharing the connection halfway (a rollback silently drops their statements),
+    so the threads of a pool writing at once (e.g. the consumers of 'work_queue.drain') get
+    a connection each. Used as a context manager, the connections are closed at the exit.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._opened: List[extensions.connection] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> extensions.connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or connection.closed:
+            connection = self._local.connection = connect_to_database()
+            with self._lock:
+                self._opened.append(connection)
+        return connection
+
+    def close(self) -> None:
+        with self._lock:
+            opened, self._opened = self._opened, []
+        for connection in opened:
+            connection.close()
+
+    def __enter__(self) -> 'ThreadConnections':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+# 'copy_data' runs several statements in one transaction, so every thread copies on a connection
+# used only by 'copy_data', whatever the connections the caller shares
+_COPY_CONNECTIONS = ThreadConnections()
+
+
+def copy_data(schema_name: str, table_name: str, data: Sequence[Sequence[Any]]) -> int:
+    """
+    Bulk-loads data into a specified table with COPY.
+
+    The rows are copied into a temporary table and moved into the target table with a single
+    'INSERT ... SELECT ... ON CONFLICT DO NOTHING', so existing rows are skipped like in 'insert_data',
+    at a fraction of its cost per row. Meant for large tables with many rows per batch.
+
+    The copy runs on a connection of the calling thread used only by 'copy_data', so rows it references
+    must be committed first, as 'insert_data' and 'upsert_data' do.
+
+    Args:
+        schema_name (str): Name of the schema where the table is located.
+        table_name (str): Name of the table where data should be copied.
+        data (Sequence[Sequence[Any]]): List of rows, where each row is a sequence of values in the order
+            of the columns of the table (e.g. a row type from 'utils.database.rows').
+
+    Returns:
+        int: The number of rows inserted, rows already stored are not counted.
+    """
+    if not data:
+        return 0
+
+    buffer = io.StringIO()
+    for row in data:
+        buffer.write('\t'.join(map(_copy_value, row)))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    connection = _COPY_CONNECTIONS.get()
+    temporary_table = f'{table_name}_copy_{uuid4().hex[:8]}'
+    try:
+        with connection.cursor() as cursor:
+            with METRICS.timer('db_write_seconds', table=table_name):
+                cursor.execute(f"""
+                    CREATE TEMPORARY TABLE {temporary_table}
+                    (LIKE {schema_name}.{table_name} INCLUDING DEFAULTS) ON COMMIT DROP;
+                    """)
+                cursor.copy_expert(f'COPY {temporary_table} FROM STDIN;', buffer)
+                cursor.execute(f"""
+                    INSERT INTO {schema_name}.{table_name}
+                    SELECT * FROM {temporary_table}
+                    ON CONFLICT DO NOTHING;
+                    """)
+                inserted = cursor.rowcount
+                if inserted != 0:
+                    cursor.execute(BUMP_WATERMARK_QUERY, (schema_name, table_name))
+                connection.commit()
+            METRICS.increment('db_rows_written_total', inserted, table=table_name)
+            return inserted
+
+    except Exception as e:
+        connection.rollback()
+        METRICS.increment('db_write_errors_total', table=table_name)
+        LOGGER.error(f'Error copying data into "{schema_name}.{table_name}": {str(e)}.')
+        raise
+
+
+def upsert_data(connection: extensions.connection, schema_name: str, table_name: str,
+                data: Sequence[Sequence[Any]], upsert: Optional[Upsert] = None) -> WriteCounts:
+    """
+    Inserts data into a specified table and updates the existing rows whose values changed.
+
+    A row is only updated if one of the mutable columns is distinct from the stored value
+    ('DO UPDATE ... WHERE ... IS DISTINCT FROM'), so rows written again unchanged leave no dead tuples
+    behind, unlike a plain 'DO UPDATE'. Rows of the same key within 'data' are written once (the last wins).
+
+    Args:
+        connection (psycopg2.extensions.connection): Database connection object.
+        schema_name (str): Name of the schema where the table is located.
+        table_name (str): Name of the table where data should be written.
+        data (Sequence[Sequence[Any]]): List of rows in the order of the columns of the table,
+            whose names are taken from TABLE_COLUMNS (see 'utils.database.rows').
+        upsert (Optional[Upsert]): Key and mutable columns, UPSERT_TABLES[table_name] by default.
+
+    Returns:
+        WriteCounts: The number of rows inserted, updated and left unchanged, and the keys of the written rows.
+    """
+    if not data:
+        return WriteCounts(0, 0, 0)
+
+    upsert = upsert or UPSERT_TABLES[table_name]
+    key_positions = [TABLE_COLUMNS[table_name].index(column) for column in upsert.key]
+    rows = list({tuple(row[position] for position in key_positions): row for row in data}.values())
+
+    stored = ', '.join(f'target.{column}' for column in upsert.columns)
+    excluded = ', '.join(f'EXCLUDED.{column}' for column in upsert.columns)
+    # A row is returned with its key only if it was inserted (xmax = 0) or updated, an unchanged row is not returned
+    query = f"""
+        INSERT INTO {schema_name}.{table_name} AS target VALUES %s
+        ON CONFLICT ({', '.join(upsert.key)}) DO UPDATE
+        SET {', '.join(f'{column} = EXCLUDED.{column}' for column in upsert.columns)}
+        WHERE ({stored}) IS DISTINCT FROM ({excluded})
+        RETURNING (xmax = 0), {', '.join(upsert.key)};
+        """
+
+    try:
+        with connection.cursor() as cursor:
+            with METRICS.timer('db_write_seconds', table=table_name):
+                written = execute_values(cursor, query, rows, fetch=True)
+                if written:
+                    cursor.execute(BUMP_WATERMARK_QUERY, (schema_name, table_name))
+                connection.commit()
+
+    except Exception as e:
+        connection.rollback()
+        METRICS.increment('db_write_errors_total', table=table_name)
+        LOGGER.error(f'Error upserting data into "{schema_name}.{table_name}": {str(e)}.')
+        raise
+
+    inserted = sum(1 for is_inserted, *_ in written if is_inserted)
+    counts = WriteCounts(inserted, len(written) - inserted, len(rows) - len(written),
+                         tuple(tuple(key) for _, *key in written))
+    METRICS.increment('db_rows_written_total', inserted + counts.updated, table=table_name)
+    METRICS.increment('db_rows_updated_total', counts.updated, table=table_name)
+    METRICS.increment('db_rows_unchanged_total', counts.unchanged, table=table_name)
+    return counts
@@ -0,0 +1,280 @@
+from typing import Optional, Sequence, List, Dict, Any
+from psycopg2 import extensions
+import os
+
+from utils.constants import (DATABASE_INFO_FILE_LOG, HASHMAP_LEAGUE_IDS,
+                             DATABASE_FIRST_TABLES, CONSOLIDATED_SCHEMA)
+from utils.database.connector import connect_to_database, insert_data
+from utils.link_mapper import league_schemas
+from utils.logger import configure_logger
+
+# Configure logger for the current module
+LOGGER = configure_logger(os.path.basename(__file__), DATABASE_INFO_FILE_LOG)
+
+
+def partitioned_queries(name_table: str) -> str:
+    """
+    Returns the definition of a table of the consolidated layout.
+
+    The tables repeat the per-league tables from 'initializer.queries', but every key is
+    prefixed with 'league_id', by which the table is partitioned (one LIST partition per league).
+    """
+    query = {
+        # FOTMOB DATA
+        'teams': f"""
+            CREATE TABLE {CONSOLIDATED_SCHEMA}.teams (
+                league_id INT NOT NULL,
+                team_id INT NOT NULL,
+                title VARCHAR(35) NOT NULL,
+                PRIMARY KEY (league_id, team_id)
+            ) PARTITION BY LIST (league_id);
+        """,
+        'matches': f"""
+            CREATE TABLE {CONSOLIDATED_SCHEMA}.matches (
+                league_id INT NOT NULL,
+                match_id INT NOT NULL,
+                season SMALLINT,
+                home_id INT NOT NULL,
+                away_id INT NOT NULL,
+                PRIMARY KEY (league_id, match_id),
+                FOREIGN KEY (league_id, home_id) REFERENCES {CONSOLIDATED_SCHEMA}.teams (league_id, team_id),
+                FOREIGN KEY (league_id, away_id) REFERENCES {CONSOLIDATED_SCHEMA}.teams (league_id, team_id)
+            ) PARTITION BY LIST (league_id);
+        """,
+        'match_lineups': f"""
+            CREATE TABLE {CONSOLIDATED_SCHEMA}.match_lineups (
+                league_id INT NOT NULL,
+                match_id INT NOT NULL,
+                lineup_ht VARCHAR(10),
+                lineup_at VARCHAR(10),
+                PRIMARY KEY (league_id, match_id),
+                FOREIGN KEY (league_id, match_id) REFERENCES {CONSOLIDATED_SCHEMA}.matches (league_id, match_id)
+            ) PARTITION BY LIST (league_id);
+        """,
+        'match_results': f"""
+            CREATE TABLE {CONSOLIDATED_SCHEMA}.match_results (
+                league_id INT NOT NULL,
+                match_id INT NOT NULL,
+                score_ht INT NOT NULL,
+                score_at INT NOT NULL,
+                PRIMARY KEY (league_id, match_id),
+                FOREIGN KEY (league_id, match_id) REFERENCES {CONSOLIDATED_SCHEMA}.matches (league_id, match_id)
+            ) PARTITION BY LIST (league_id);
+        """,
+        'stadiums': f"""
+            CREATE TABLE {CONSOLIDATED_SCHEMA}.stadiums (
+                league_id INT NOT NULL,
+                stadium TEXT NOT NULL,
+                city TEXT,
+                capacity INT,
+                opened SMALLINT,
+                surface VARCHAR(20),
+                latitude NUMERIC,
+                longitude NUMERIC,
+                PRIMARY KEY (league_id, stadium)
+            ) PARTITION BY LIST (league_id);
+        """,
+        'match_details': f"""
+            CREATE TABLE {CONSOLIDATED_SCHEMA}.match_details (
+                league_id INT NOT NULL,
+                match_id INT NOT NULL,
+                utc_time TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+                stadium TEXT DEFAULT 'Undefined',
+                attendance INT,
+                reason VARCHAR(25),
+                PRIMARY KEY (league_id, match_id),
+                FOREIGN KEY (league_id, match_id) REFERENCES {CONSOLIDATED_SCHEMA}.matches (league_id, match_id),
+                FOREIGN KEY (league_id, stadium) REFERENCES {CONSOLIDATED_SCHEMA}.stadiums (league_id, stadium)
+            ) PARTITION BY LIST (league_id);
+        """,
+        'match_players': f"""
+            CREATE TABLE {CONSOLIDATED_SCHEMA}.match_players (
+                league_id INT NOT NULL,
+                match_id INT NOT NULL,
+                player_id INT NOT NULL,
+                team_id INT NOT NULL,
+                name_player TEXT,
+                position_id SMALLINT,
+                starter BOOLEAN NOT NULL,
+                rating NUMERIC(3, 1),
+                minutes SMALLINT,
+                PRIMARY KEY (league_id, match_id, player_id),
+                FOREIGN KEY (league_id, match_id) REFERENCES {CONSOLIDATED_SCHEMA}.matches (league_id, match_id)
+            ) PARTITION BY LIST (league_id);
+        """,
+        # TRANSFERMARKT DATA
+        'players': f"""
+            CREATE TABLE {CONSOLIDATED_SCHEMA}.players (
+                league_id INT NOT NULL,
+                player_id INT NOT NULL,
+                name_player TEXT NOT NULL,
+                date_of_birth DATE,
+                nationality TEXT,
+                height NUMERIC,
+                foot TEXT,
+                PRIMARY KEY (league_id, player_id)
+            ) PARTITION BY LIST (league_id);
+        """,
+        'transfers': f"""
+            CREATE TABLE {CONSOLIDATED_SCHEMA}.transfers (
+                league_id INT NOT NULL,
+                player_id INT NOT NULL,
+                market_value INT,
+                transfer_date DATE NOT NULL,
+                club TEXT,
+                PRIMARY KEY (league_id, player_id, transfer_date),
+                FOREIGN KEY (league_id, player_id) REFERENCES {CONSOLIDATED_SCHEMA}.players (league_id, player_id)
+            ) PARTITION BY LIST (league_id);
+        """
+    }
+
+    return query[name_table]
+
+
+def league_ids() -> Dict[str, int]:
+    """
+    Returns the partition key of every league that has a FOTMOB ID, keyed by its schema name.
+
+    Leagues without a FOTMOB ID have no data and therefore no partition.
+    """
+    return {
+        league_schemas()[league]: int(ids[0])
+        for league, ids in HASHMAP_LEAGUE_IDS.items() if ids[0] is not None
+    }
+
+
+def partition_name(name_table: str, name_schema: str) -> str:
+    """
+    Returns the name of the partition of 'name_table' that holds the rows of the league 'name_schema'.
+    """
+    return f'{name_table}_{name_schema}'
+
+
+def create_partitioned_tables(connection: extensions.connection) -> None:
+    """
+    Create the consolidated schema, its partitioned tables and one partition per league.
+
+    Args:
+        connection (psycopg2.extensions.connection): Database connection object.
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {CONSOLIDATED_SCHEMA};')
+
+            # The order of DATABASE_FIRST_TABLES satisfies the foreign keys
+            for name_table in DATABASE_FIRST_TABLES:
+                cursor.execute('SELECT to_regclass(%s);', (f'{CONSOLIDATED_SCHEMA}.{name_table}',))
+                if cursor.fetchone()[0] is None:
+                    cursor.execute(partitioned_queries(name_table))
+
+                for name_schema, league_id in league_ids().items():
+                    cursor.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {CONSOLIDATED_SCHEMA}.{partition_name(name_table, name_schema)}
+                        PARTITION OF {CONSOLIDATED_SCHEMA}.{name_table} FOR VALUES IN ({league_id});
+                        """)
+            connection.commit()
+
+        LOGGER.info(f'Successfully created {len(DATABASE_FIRST_TABLES)} partitioned tables '
+                    f'with {len(league_ids())} partitions each in the schema "{CONSOLIDATED_SCHEMA}".')
+
+    except Exception as e:
+        connection.rollback()
+        LOGGER.error(f'Error creating partitioned tables: {str(e).strip()}.')
+        raise
+
+
+def insert_league_data(connection: extensions.connection, name_schema: str,
+                       table_name: str, data: Sequence[Sequence[Any]]) -> None:
+    """
+    Inserts rows of a league into the consolidated layout.
+
+    The rows have the same shape as for the per-league schema; the partition key is
+    prepended to each of them and the insert goes through 'insert_data'.
+
+    Args:
+        connection (psycopg2.extensions.connection): Database connection object.
+        name_schema (str): Schema name of the league the rows belong to.
+        table_name (str): Name of the table where data should be inserted.
+        data (Sequence[Sequence[Any]]): List of rows, as they would be inserted into the per-league schema.
+    """
+    league_id = league_ids()[name_schema]
+    insert_data(connection, CONSOLIDATED_SCHEMA, table_name, [(league_id, *row) for row in data])
+
+
+def load_league(connection: extensions.connection, name_schema: str, batch_size: int = 10000) -> None:
+    """
+    Copies all rows of a per-league schema into the consolidated layout.
+
+    Args:
+        connection (psycopg2.extensions.connection): Database connection object.
+        name_schema (str): Schema name of the league to load.
+        batch_size (int): Number of rows read and inserted at once.
+    """
+    if name_schema not in league_ids():
+        LOGGER.warning(f'The league "{name_schema}" has no partition in the consolidated layout.')
+        return None
+
+    # The batches are read on a connection of their own: every batch is committed by 'insert_data',
+    # and a commit closes the named cursors of its connection, so reading on 'connection' would fail
+    # at the second batch
+    reader = connect_to_database()
+    try:
+        for name_table in DATABASE_FIRST_TABLES:
+            loaded_rows = 0
+            # A named (server-side) cursor keeps only one batch of the table in memory
+            with reader.cursor(name=f'load_{name_schema}_{name_table}') as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(f'SELECT * FROM {name_schema}.{name_table};')
+
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    insert_league_data(connection, name_schema, name_table, rows)
+                    loaded_rows += len(rows)
+            reader.commit()
+
+            LOGGER.info(f'Loaded {loaded_rows} rows from "{name_schema}.{name_table}" '
+                        f'into "{CONSOLIDATED_SCHEMA}.{name_table}".')
+    finally:
+        reader.close()
+
+
+def maintain_league(connection: extensions.connection, name_schema: str,
+                    command: str = 'ANALYZE', tables: Optional[List[str]] = None) -> None:
+    """
+    Runs VACUUM/ANALYZE on the partitions of one league only.
+
+    Args:
+        connection (psycopg2.extensions.connection): Database connection object.
+        name_schema (str): Schema name of the league.
+        command (str): Maintenance command, e.g. 'ANALYZE', 'VACUUM' or 'VACUUM ANALYZE'.
+        tables (Optional[List[str]]): Tables to maintain, all of them by default.
+    """
+    if command not in ('ANALYZE', 'VACUUM', 'VACUUM ANALYZE'):
+        raise ValueError(f'Unsupported maintenance command: {command}.')
+
+    partitions = ', '.join(f'{CONSOLIDATED_SCHEMA}.{partition_name(name_table, name_schema)}'
+                           for name_table in tables or DATABASE_FIRST_TABLES)
+
+    # VACUUM cannot run inside a transaction block
+    autocommit = connection.autocommit
+    try:
+        connection.commit()
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f'{command} {partitions};')
+    except Exception as e:
+        LOGGER.error(f'Error running {command} for the league "{name_schema}": {str(e).strip()}.')
+        raise
+    finally:
+        connection.autocommit = autocommit
+
+
+if __name__ == '__main__':
+    with connect_to_database() as connection:
+        create_partitioned_tables(connection)
+
+        for league in league_ids():
+            load_league(connection, league)
+            maintain_league(connection, league)
@@ -1,17 +1,28 @@
-from typing import Optional, Tuple
+from typing import Optional, Tuple, List, Dict, Any
 import os
+import re
 
-from utils.constants import (DATABASE_INFO_FILE_LOG, HASHMAP_LEAGUE_IDS,
-                             DATABASE_FIRST_TABLES, DATABASE_SECOND_TABLES)
-from utils.database.connector import connect_to_database
-from scripts.eafc.season import define_season
-from utils.link_mapper import format_string
+from utils.constants import (DATABASE_INFO_FILE_LOG, DATABASE_FIRST_TABLES,
+                             DATABASE_SUMMARY_TABLES, DATABASE_SECOND_TABLES)
+from utils.database.connector import connect_to_database, create_watermarks
+from utils.database.summaries import summary_queries
+from utils.database.work_queue import create_queue
+from utils.fixture_calendar import create_calendars
+from utils.link_mapper import league_schemas
 from utils.logger import configure_logger
 
 # Configure logger for the current module
 LOGGER = configure_logger(os.path.basename(__file__), DATABASE_INFO_FILE_LOG)
 
 
+# Matches of the latest season, read by every run of 'match_details'
+LATEST_SEASON_QUERY = """
+    SELECT match_id
+    FROM {name_schema}.matches
+    WHERE season = (SELECT MAX(season) FROM {name_schema}.matches);
+"""
+
+
 def queries(name_schema: str, name_table: str) -> str:
     query = {
         # FOTMOB DATA
@@ -63,6 +74,55 @@ def queries(name_schema: str, name_table: str) -> str:
                 reason VARCHAR(25)
             );
         """,
+        # Appearances from 'content.lineup2' of the match details, 'position_id' is the usual
+        # position of the player {0: Goalkeeper, 1: Defender, 2: Midfielder, 3: Forward}
+        'match_players': f"""
+            CREATE TABLE {name_schema}.match_players (
+                match_id INT NOT NULL REFERENCES {name_schema}.matches (match_id),
+                player_id INT NOT NULL,
+                team_id INT NOT NULL,
+                name_player TEXT,
+                position_id SMALLINT,
+                starter BOOLEAN NOT NULL,
+                rating NUMERIC(3, 1),
+                minutes SMALLINT,
+                PRIMARY KEY (match_id, player_id)
+            );
+        """,
+        # SUMMARIES (see 'utils.database.summaries')
+        'standings': f"""
+            CREATE TABLE {name_schema}.standings (
+                season SMALLINT NOT NULL,
+                team_id INT NOT NULL REFERENCES {name_schema}.teams (team_id),
+                played INT NOT NULL,
+                won INT NOT NULL,
+                drawn INT NOT NULL,
+                lost INT NOT NULL,
+                goals_for INT NOT NULL,
+                goals_against INT NOT NULL,
+                points INT NOT NULL,
+                PRIMARY KEY (season, team_id)
+            );
+        """,
+        'stadium_attendance': f"""
+            CREATE TABLE {name_schema}.stadium_attendance (
+                season SMALLINT NOT NULL,
+                stadium TEXT NOT NULL REFERENCES {name_schema}.stadiums (stadium),
+                matches INT NOT NULL,
+                total_attendance BIGINT NOT NULL,
+                average_attendance INT,
+                PRIMARY KEY (season, stadium)
+            );
+        """,
+        'matchday_goals': f"""
+            CREATE TABLE {name_schema}.matchday_goals (
+                season SMALLINT NOT NULL,
+                matchday DATE NOT NULL,
+                matches INT NOT NULL,
+                goals INT NOT NULL,
+                PRIMARY KEY (season, matchday)
+            );
+        """,
         # TRANSFERMARKT DATA
         'players': f"""
             CREATE TABLE {name_schema}.players (
@@ -158,6 +218,151 @@ def queries(name_schema: str, name_table: str) -> str:
     return query[name_table]
 
 
+def index_queries(name_schema: str, name_table: str) -> List[str]:
+    """
+    Returns the secondary indexes for a table, fitted to the access paths of the scripts.
+
+    Args:
+        name_schema (str): Schema name in which the table is located.
+        name_table (str): Name of the table to index.
+
+    Returns:
+        List of 'CREATE INDEX' statements (empty if the primary key is enough).
+    """
+    indexes = {
+        'matches': [
+            # Covers 'WHERE season = (SELECT MAX(season) ...)' in match_details:
+            # MAX(season) is read from the end of the index and match_id is returned
+            # by an index-only scan without visiting the heap
+            f'CREATE INDEX IF NOT EXISTS matches_season_match_id_idx '
+            f'ON {name_schema}.matches (season, match_id);',
+            # PostgreSQL does not index the referencing side of a foreign key
+            f'CREATE INDEX IF NOT EXISTS matches_home_id_idx ON {name_schema}.matches (home_id);',
+            f'CREATE INDEX IF NOT EXISTS matches_away_id_idx ON {name_schema}.matches (away_id);'
+        ],
+        'match_players': [
+            # Appearances of a player across matches
+            f'CREATE INDEX IF NOT EXISTS match_players_player_id_idx '
+            f'ON {name_schema}.match_players (player_id) INCLUDE (rating, minutes);'
+        ],
+        'match_details': [
+            f'CREATE INDEX IF NOT EXISTS match_details_utc_time_idx '
+            f'ON {name_schema}.match_details (utc_time) INCLUDE (match_id);',
+            f'CREATE INDEX IF NOT EXISTS match_details_stadium_idx '
+            f'ON {name_schema}.match_details (stadium) INCLUDE (match_id, attendance);'
+        ]
+    }
+
+    return indexes.get(name_table, [])
+
+
+# The columns each hot query must look up through an index of 'index_queries', as (table, column)
+HOT_QUERY_INDEX_COLUMNS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    'match_details': (('matches', 'season'),),
+    'summary_standings': (('matches', 'home_id'), ('matches', 'away_id')),
+    'summary_stadium_attendance': (('match_details', 'stadium'),),
+    'summary_matchday_goals': (('match_details', 'utc_time'),)
+}
+
+
+def hot_queries(name_schema: str) -> Dict[str, Tuple[str, Dict[str, Any], Tuple[str, ...]]]:
+    """
+    Returns the queries executed on every run of the scripts: the selection of the matches
+    of 'match_details' and the refresh of every summary table for a batch of inserted matches.
+
+    Args:
+        name_schema (str): Schema name of the league.
+
+    Returns:
+        The query, its parameters and the tables it must not scan sequentially, keyed by a name.
+    """
+    queries = {'match_details': (LATEST_SEASON_QUERY.format(name_schema=name_schema), {}, ('matches',))}
+    # The refresh runs after every batch of 'match_details', for the inserted match IDs only
+    for name_table, query in summary_queries(name_schema, 'm.match_id = ANY(%(match_ids)s)').items():
+        queries[f'summary_{name_table}'] = (query, {'match_ids': [0]},
+                                            ('matches', 'match_results', 'match_details'))
+    return queries
+
+
+def _find_seq_scans(plan: Dict[str, Any], relations: set) -> List[str]:
+    """
+    Recursively collects relations from 'relations' that are read with a sequential scan in the plan tree.
+    """
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in relations:
+        found.append(plan['Relation Name'])
+
+    for subplan in plan.get('Plans', []):
+        found.extend(_find_seq_scans(subplan, relations))
+
+    return found
+
+
+def _find_index_columns(plan: Dict[str, Any], columns: set) -> set:
+    """
+    Recursively collects the (table, column) pairs of 'columns' looked up through an index in the plan tree:
+    the column appears in the 'Index Cond' of an index scan or the 'Recheck Cond' of a bitmap heap scan
+    of the table. A full scan of another index (e.g. the primary key) has no such condition.
+    """
+    found = set()
+    conditions = ' '.join(plan.get(key, '') for key in ('Index Cond', 'Recheck Cond'))
+    for name_table, column in columns:
+        if plan.get('Relation Name') == name_table and re.search(rf'\b{column}\b', conditions):
+            found.add((name_table, column))
+
+    for subplan in plan.get('Plans', []):
+        found |= _find_index_columns(subplan, columns)
+
+    return found
+
+
+def check_query_plans(cursor, name_schema: str) -> bool:
+    """
+    Check with EXPLAIN that the hot queries of the scripts are served by their indexes.
+
+    Sequential scans are disabled for the duration of the check, so the planner
+    falls back to a 'Seq Scan' only when no usable index exists (on small tables it
+    would otherwise prefer a sequential scan regardless of the indexes). Since it may as well
+    fall back to a full scan of the primary key, every query must also look up the columns
+    of HOT_QUERY_INDEX_COLUMNS through an index condition.
+
+    Args:
+        cursor: Database cursor.
+        name_schema (str): Schema name of the league.
+
+    Returns:
+        True if every hot query uses its indexes and scans none of its tables sequentially, False otherwise.
+    """
+    is_indexed = True
+    try:
+        cursor.execute('SET enable_seqscan = off;')
+        for name_query, (query, params, tables) in hot_queries(name_schema).items():
+            # EXPLAIN only plans the statement, the refreshes of the summaries are not executed
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {query}', params or None)
+            plan = cursor.fetchone()[0][0]['Plan']
+
+            seq_scans = _find_seq_scans(plan, set(tables))
+            if seq_scans:
+                is_indexed = False
+                LOGGER.warning(f'The hot query "{name_query}" of "{name_schema}" scans '
+                               f'{sorted(set(seq_scans))} sequentially.')
+
+            expected = set(HOT_QUERY_INDEX_COLUMNS.get(name_query, ()))
+            missing = expected - _find_index_columns(plan, expected)
+            if missing:
+                is_indexed = False
+                LOGGER.warning(f'The hot query "{name_query}" of "{name_schema}" does not look up '
+                               f'{sorted(missing)} through an index.')
+    except Exception as e:
+        cursor.connection.rollback()
+        LOGGER.error(f'Error checking query plans: {str(e).strip()}.')
+        return False
+    finally:
+        cursor.execute('RESET enable_seqscan;')
+
+    return is_indexed
+
+
 def check_schema(cursor, name_schema: str) -> Optional[Tuple[str]]:
     """
     Check if the schema already exists in the database.
@@ -194,6 +399,24 @@ def create_schema(cursor, name_schema: str) -> Optional[bool]:
         return None
 
 
+def create_indexes(cursor, name_schema: str, name_table: str) -> None:
+    """
+    Create the secondary indexes of a table if they do not exist.
+
+    Args:
+        cursor: Database cursor.
+        name_schema (str): Schema name in which the table is located.
+        name_table (str): Name of the table to index.
+    """
+    try:
+        for query in index_queries(name_schema, name_table):
+            cursor.execute(query)
+        connection.commit()
+
+    except Exception as e:
+        LOGGER.error(f'Error creating indexes: {str(e).strip()}.')
+
+
 def create_table(cursor, name_schema: str, name_table: str) -> None:
     """
     Create a standings table in the specified schema.
@@ -220,23 +443,40 @@ def create_table(cursor, name_schema: str, name_table: str) -> None:
 
     except Exception as e:
         LOGGER.error(f'Error creating table: {str(e).strip()}.')
+        return None
+
+    # Indexes are created for existing tables as well, so that old schemas receive them
+    create_indexes(cursor, name_schema, name_table)
 
 
 if __name__ == '__main__':
+    # Imported here, so that the DDL helpers above can be used without the EA FC scripts
+    from scripts.eafc.season import define_season
+
     with connect_to_database() as connection:
         with connection.cursor() as current_cursor:
-            leagues = [format_string(league) for league in HASHMAP_LEAGUE_IDS.keys()]
+            # The work queue shared by the workers of all hosts (see 'utils.database.work_queue')
+            create_queue(current_cursor)
+            # The fixture calendars and the successful runs of the leagues (see 'utils.fixture_calendar')
+            create_calendars(current_cursor)
+            # The ingestion watermarks of the tables, read by the read API (see 'scripts.read_api')
+            create_watermarks(current_cursor)
+
+            leagues = list(league_schemas().values())
             
             for league in leagues:
                 created_tables = 0
                 is_exist_schema = create_schema(current_cursor, league)
-                for table_name in DATABASE_FIRST_TABLES:
+                for table_name in DATABASE_FIRST_TABLES + DATABASE_SUMMARY_TABLES:
                     if is_exist_schema:
                         create_table(current_cursor, league, table_name)
                         created_tables += 1
                 
-                LOGGER.info(f'Successfully created {created_tables} tables ' \
-                            f'out of {len(DATABASE_FIRST_TABLES)} for schema "{league}".')
+                LOGGER.info(f'Successfully created {created_tables} tables out of ' \
+                            f'{len(DATABASE_FIRST_TABLES) + len(DATABASE_SUMMARY_TABLES)} for schema "{league}".')
+
+                if is_exist_schema and check_query_plans(current_cursor, league):
+                    LOGGER.info(f'The hot queries of the schema "{league}" are served by indexes.')
 
             season = define_season(LOGGER)
             created_tables = 0
@@ -0,0 +1,145 @@
+from typing import Optional, Sequence, Dict, Any
+from psycopg2 import extensions
+import os
+
+from utils.constants import DATABASE_INFO_FILE_LOG, DATABASE_SUMMARY_TABLES
+from utils.database.connector import connect_to_database
+from utils.link_mapper import league_schemas
+from utils.logger import configure_logger
+from utils.metrics import METRICS
+
+# Configure logger for the current module
+LOGGER = configure_logger(os.path.basename(__file__), DATABASE_INFO_FILE_LOG)
+
+
+def summary_queries(name_schema: str, match_filter: str) -> Dict[str, str]:
+    """
+    Returns the queries recomputing the groups of the summary tables touched by the filtered matches.
+
+    Every query first collects the affected groups (a team, a stadium or a matchday of a season)
+    of the matches passing 'match_filter', and then aggregates the raw tables for these groups only,
+    through the indexes of 'initializer.index_queries'. A group is always recomputed as a whole,
+    so refreshing the same matches twice gives the same result.
+
+    Args:
+        name_schema (str): Schema name of the league.
+        match_filter (str): Condition on 'matches AS m' selecting the inserted matches.
+    """
+    return {
+        'standings': f"""
+            WITH affected AS (
+                SELECT DISTINCT m.season, side.team_id
+                FROM {name_schema}.matches AS m
+                CROSS JOIN LATERAL (VALUES (m.home_id), (m.away_id)) AS side (team_id)
+                WHERE {match_filter} AND m.season IS NOT NULL
+            ), sides AS (
+                SELECT m.season, m.home_id AS team_id, r.score_ht AS goals_for, r.score_at AS goals_against
+                FROM {name_schema}.matches AS m
+                JOIN {name_schema}.match_results AS r USING (match_id)
+                WHERE (m.season, m.home_id) IN (SELECT season, team_id FROM affected)
+                UNION ALL
+                SELECT m.season, m.away_id, r.score_at, r.score_ht
+                FROM {name_schema}.matches AS m
+                JOIN {name_schema}.match_results AS r USING (match_id)
+                WHERE (m.season, m.away_id) IN (SELECT season, team_id FROM affected)
+            )
+            INSERT INTO {name_schema}.standings
+            SELECT season, team_id, COUNT(*),
+                   COUNT(*) FILTER (WHERE goals_for > goals_against),
+                   COUNT(*) FILTER (WHERE goals_for = goals_against),
+                   COUNT(*) FILTER (WHERE goals_for < goals_against),
+                   SUM(goals_for), SUM(goals_against),
+                   3 * COUNT(*) FILTER (WHERE goals_for > goals_against)
+                   + COUNT(*) FILTER (WHERE goals_for = goals_against)
+            FROM sides
+            GROUP BY season, team_id
+            ON CONFLICT (season, team_id) DO UPDATE SET
+                played = EXCLUDED.played, won = EXCLUDED.won, drawn = EXCLUDED.drawn,
+                lost = EXCLUDED.lost, goals_for = EXCLUDED.goals_for,
+                goals_against = EXCLUDED.goals_against, points = EXCLUDED.points;
+        """,
+        # 'matches' counts only the matches with a known attendance
+        'stadium_attendance': f"""
+            WITH affected AS (
+                SELECT DISTINCT m.season, d.stadium
+                FROM {name_schema}.match_details AS d
+                JOIN {name_schema}.matches AS m USING (match_id)
+                WHERE {match_filter} AND m.season IS NOT NULL AND d.stadium IS NOT NULL
+            )
+            INSERT INTO {name_schema}.stadium_attendance
+            SELECT m.season, d.stadium, COUNT(d.attendance),
+                   COALESCE(SUM(d.attendance), 0), ROUND(AVG(d.attendance))
+            FROM {name_schema}.match_details AS d
+            JOIN {name_schema}.matches AS m USING (match_id)
+            WHERE (m.season, d.stadium) IN (SELECT season, stadium FROM affected)
+            GROUP BY m.season, d.stadium
+            ON CONFLICT (season, stadium) DO UPDATE SET
+                matches = EXCLUDED.matches, total_attendance = EXCLUDED.total_attendance,
+                average_attendance = EXCLUDED.average_attendance;
+        """,
+        # A matchday is the (UTC) date of the kickoff
+        'matchday_goals': f"""
+            WITH affected AS (
+                SELECT DISTINCT m.season, d.utc_time::DATE AS matchday
+                FROM {name_schema}.match_details AS d
+                JOIN {name_schema}.matches AS m USING (match_id)
+                WHERE {match_filter} AND m.season IS NOT NULL
+            )
+            INSERT INTO {name_schema}.matchday_goals
+            SELECT a.season, a.matchday, COUNT(*), SUM(r.score_ht + r.score_at)
+            FROM affected AS a
+            JOIN {name_schema}.match_details AS d
+                ON d.utc_time >= a.matchday AND d.utc_time < a.matchday + 1
+            JOIN {name_schema}.matches AS m ON m.match_id = d.match_id AND m.season = a.season
+            JOIN {name_schema}.match_results AS r ON r.match_id = d.match_id
+            GROUP BY a.season, a.matchday
+            ON CONFLICT (season, matchday) DO UPDATE SET
+                matches = EXCLUDED.matches, goals = EXCLUDED.goals;
+        """
+    }
+
+
+def refresh_summaries(connection: extensions.connection, name_schema: str,
+                      match_ids: Optional[Sequence[int]] = None) -> None:
+    """
+    Brings the summary tables of a league up to date with the given matches.
+
+    All tables are refreshed in one short transaction after the ingestion, so a dashboard
+    reading the summaries sees either the previous or the new state and is never blocked.
+
+    Args:
+        connection (extensions.connection): Database connection object.
+        name_schema (str): Schema name of the league.
+        match_ids (Optional[Sequence[int]]): IDs of the inserted matches; all matches if None,
+            which rebuilds the summaries from scratch.
+    """
+    if match_ids is not None and not match_ids:
+        return None
+
+    match_filter = 'TRUE' if match_ids is None else 'm.match_id = ANY(%(match_ids)s)'
+    params: Dict[str, Any] = {'match_ids': list(match_ids or [])}
+
+    try:
+        with connection.cursor() as cursor:
+            for name_table, query in summary_queries(name_schema, match_filter).items():
+                with METRICS.timer('summary_refresh_seconds', table=name_table):
+                    cursor.execute(query, params)
+                METRICS.increment('summary_rows_refreshed_total', cursor.rowcount, table=name_table)
+        connection.commit()
+
+    except Exception as e:
+        connection.rollback()
+        LOGGER.error(f'Error refreshing the summaries of "{name_schema}": {str(e).strip()}.')
+        raise
+
+
+if __name__ == '__main__':
+    # Rebuilds the summaries of every league, e.g. after they are created for existing data
+    with connect_to_database() as connection:
+        for league in league_schemas().values():
+            try:
+                refresh_summaries(connection, league)
+                LOGGER.info(f'The tables {", ".join(DATABASE_SUMMARY_TABLES)} '
+                            f'of the schema "{league}" have been rebuilt.')
+            except Exception:
+                continue
@@ -0,0 +1,304 @@
+from typing import Callable, Iterable, List, Optional, Tuple, Dict
+from psycopg2 import extensions
+from datetime import timedelta
+from itertools import groupby
+from time import sleep
+from uuid import uuid4
+import threading
+import socket
+import os
+
+from utils.database.connector import connect_to_database
+from utils.constants import DATABASE_INFO_FILE_LOG
+from utils.logger import configure_logger
+from utils.metrics import METRICS, ScopedExecutor
+
+# Configure logger for the current module
+LOGGER = configure_logger(__name__, DATABASE_INFO_FILE_LOG)
+
+# A claimed item is leased for LEASE_DURATION and the lease is renewed every HEARTBEAT_INTERVAL
+# while the worker is alive; the items of a crashed worker are claimed again once their lease expires
+LEASE_DURATION = timedelta(minutes=5)
+HEARTBEAT_INTERVAL = 60.0
+# An item is claimed at most this many times before it is marked as 'failed'
+MAX_ATTEMPTS = 5
+# How often a worker without claimable items checks whether the leases of other workers were released
+IDLE_INTERVAL = 5.0
+
+CREATE_QUERIES = [
+    """
+    CREATE TABLE IF NOT EXISTS public.work_queue (
+        source TEXT NOT NULL,
+        name_schema TEXT NOT NULL,
+        entity_id TEXT NOT NULL,
+        state TEXT NOT NULL DEFAULT 'pending',
+        attempts INT NOT NULL DEFAULT 0,
+        worker TEXT,
+        lease_expires TIMESTAMP WITH TIME ZONE,
+        enqueued_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+        finished_at TIMESTAMP WITH TIME ZONE,
+        last_error TEXT,
+        PRIMARY KEY (source, name_schema, entity_id),
+        CHECK (state IN ('pending', 'leased', 'done', 'failed'))
+    );
+    """,
+    # Claims read only the open items of a source, in the order they were enqueued
+    """
+    CREATE INDEX IF NOT EXISTS work_queue_claim_idx
+    ON public.work_queue (source, enqueued_at) WHERE state IN ('pending', 'leased');
+    """
+]
+
+ENQUEUE_QUERY = """
+    INSERT INTO public.work_queue (source, name_schema, entity_id) VALUES (%s, %s, %s)
+    ON CONFLICT (source, name_schema, entity_id) DO UPDATE
+    SET state = 'pending', attempts = 0, worker = NULL, lease_expires = NULL,
+        enqueued_at = now(), finished_at = NULL, last_error = NULL
+    WHERE work_queue.state IN ('done', 'failed');
+"""
+
+# Pending items and the items of expired leases are claimed; SKIP LOCKED lets any number of workers
+# claim concurrently without waiting on each other or claiming the same item twice
+CLAIM_QUERY = """
+    WITH claimable AS (
+        SELECT source, name_schema, entity_id
+        FROM public.work_queue
+        WHERE source = %(source)s
+          AND (%(name_schema)s::TEXT IS NULL OR name_schema = %(name_schema)s)
+          AND (state = 'pending' OR (state = 'leased' AND lease_expires < now()))
+          AND attempts < %(max_attempts)s
+        ORDER BY enqueued_at
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE public.work_queue AS queue
+    SET state = 'leased', worker = %(worker)s, attempts = queue.attempts + 1,
+        lease_expires = now() + %(lease)s
+    FROM claimable
+    WHERE queue.source = claimable.source AND queue.name_schema = claimable.name_schema
+      AND queue.entity_id = claimable.entity_id
+    RETURNING queue.name_schema, queue.entity_id;
+"""
+
+# Items whose lease expired after their last allowed attempt are given up
+EXPIRE_QUERY = """
+    UPDATE public.work_queue
+    SET state = 'failed', worker = NULL, lease_expires = NULL, finished_at = now(),
+        last_error = COALESCE(last_error, 'Lease expired')
+    WHERE source = %(source)s AND state = 'leased' AND lease_expires < now() AND attempts >= %(max_attempts)s;
+"""
+
+HEARTBEAT_QUERY = """
+    UPDATE public.work_queue SET lease_expires = now() + %s WHERE worker = %s AND state = 'leased';
+"""
+
+COMPLETE_QUERY = """
+    UPDATE public.work_queue
+    SET state = 'done', worker = NULL, lease_expires = NULL, finished_at = now(), last_error = NULL
+    WHERE source = %s AND name_schema = %s AND entity_id = %s AND worker = %s AND state = 'leased';
+"""
+
+FAIL_QUERY = """
+    UPDATE public.work_queue
+    SET state = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+        worker = NULL, lease_expires = NULL, last_error = %s,
+        finished_at = CASE WHEN attempts >= %s THEN now() END
+    WHERE source = %s AND name_schema = %s AND entity_id = %s AND worker = %s AND state = 'leased';
+"""
+
+OPEN_ITEMS_QUERY = """
+    SELECT COUNT(*)
+    FROM public.work_queue
+    WHERE source = %(source)s AND (%(name_schema)s::TEXT IS NULL OR name_schema = %(name_schema)s)
+      AND state IN ('pending', 'leased') AND attempts < %(max_attempts)s;
+"""
+
+
+def create_queue(cursor) -> None:
+    """
+    Creates the work queue table shared by the workers of all hosts if it does not exist.
+    """
+    for query in CREATE_QUERIES:
+        cursor.execute(query)
+    cursor.connection.commit()
+
+
+def enqueue(connection: extensions.connection, source: str, name_schema: str, entity_ids: Iterable) -> int:
+    """
+    Adds items to the queue. Finished and failed items are queued again, open ones are left as they are.
+
+    Args:
+        connection (extensions.connection): Database connection object.
+        source (str): The script processing the items ('match_details', 'stadiums' or 'players').
+        name_schema (str): Schema name the items belong to.
+        entity_ids (Iterable): IDs of the items (match IDs, team IDs or page numbers).
+
+    Returns:
+        The number of items given.
+    """
+    rows = [(source, name_schema, str(entity_id)) for entity_id in entity_ids]
+    if not rows:
+        return 0
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.executemany(ENQUEUE_QUERY, rows)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+    METRICS.increment('queue_enqueued_total', len(rows), source=source)
+    return len(rows)
+
+
+class QueueWorker:
+    """
+    A consumer of the work queue with its own connection and a heartbeat thread renewing its leases.
+
+    The worker ID is unique per instance ('<host>:<pid>:<random>'), so several workers may run in one
+    process, and a worker only completes the items it still holds the lease of.
+
+    Args:
+        source (str): The source whose items are claimed.
+        name_schema (Optional[str]): Claim only the items of this schema, all schemas by default.
+    """
+    def __init__(self, source: str, name_schema: Optional[str] = None):
+        self.source = source
+        self.name_schema = name_schema
+        self.worker = f'{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}'
+
+        self.connection: Optional[extensions.connection] = None
+        # The connection is shared by the consuming threads and the heartbeat thread
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def _execute(self, query: str, parameters, fetch: bool = False) -> list:
+        with self._lock:
+            try:
+                with self.connection.cursor() as cursor:
+                    cursor.execute(query, parameters)
+                    rows = cursor.fetchall() if fetch else []
+                self.connection.commit()
+                return rows
+            except Exception:
+                self.connection.rollback()
+                raise
+
+    def _parameters(self, **extra) -> Dict[str, object]:
+        return dict(source=self.source, name_schema=self.name_schema, max_attempts=MAX_ATTEMPTS, **extra)
+
+    def claim(self, limit: int) -> List[Tuple[str, str]]:
+        """
+        Leases up to 'limit' items of the source.
+
+        Returns:
+            The claimed items as (schema name, entity ID) pairs.
+        """
+        self._execute(EXPIRE_QUERY, self._parameters())
+        items = self._execute(CLAIM_QUERY, self._parameters(worker=self.worker, limit=limit, lease=LEASE_DURATION),
+                              fetch=True)
+        METRICS.increment('queue_claimed_total', len(items), source=self.source)
+        return items
+
+    def complete(self, name_schema: str, entity_ids: Iterable[str]) -> None:
+        for entity_id in entity_ids:
+            self._execute(COMPLETE_QUERY, (self.source, name_schema, entity_id, self.worker))
+            METRICS.increment('queue_completed_total', source=self.source)
+
+    def fail(self, name_schema: str, entity_ids: Iterable[str], error: str) -> None:
+        """
+        Releases the items for another attempt, or marks them as 'failed' after MAX_ATTEMPTS.
+        """
+        for entity_id in entity_ids:
+            self._execute(FAIL_QUERY, (MAX_ATTEMPTS, error, MAX_ATTEMPTS,
+                                       self.source, name_schema, entity_id, self.worker))
+            METRICS.increment('queue_failed_total', source=self.source)
+
+    def open_items(self) -> int:
+        """
+        Returns the number of items of the source that are pending or leased by any worker.
+        """
+        return self._execute(OPEN_ITEMS_QUERY, self._parameters(), fetch=True)[0][0]
+
+    def _beat(self) -> None:
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                self._execute(HEARTBEAT_QUERY, (LEASE_DURATION, self.worker))
+            except Exception as e:
+                LOGGER.warning(f'The heartbeat of the worker "{self.worker}" failed: {e}.')
+
+    def __enter__(self) -> 'QueueWorker':
+        self.connection = connect_to_database()
+        self._heartbeat = threading.Thread(target=self._beat, name=f'heartbeat-{self.source}', daemon=True)
+        self._heartbeat.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._stopped.set()
+        self._heartbeat.join()
+        self.connection.close()
+
+
+def drain(source: str, process: Callable[[str, List[str]], Optional[Iterable[str]]],
+          name_schema: Optional[str] = None, batch_size: int = 50, workers: Optional[int] = None) -> int:
+    """
+    Processes the items of a source in the queue with a pool of threads until none is left open.
+
+    Every thread claims a batch, passes its items to 'process' grouped by schema, and completes them.
+    The items 'process' returns as failed are released for another attempt, all of them if it raised.
+    A thread without claimable items keeps waiting while other workers hold leases, so an item of
+    a crashed worker is picked up once its lease expires and the call returns only when the whole
+    source (or schema) is drained.
+
+    Args:
+        source (str): The source to drain.
+        process (Callable[[str, List[str]], Optional[Iterable[str]]]): Called with a schema name and entity IDs
+            of that schema, returns the IDs that failed (None if none did).
+        name_schema (Optional[str]): Drain only the items of this schema, all schemas by default.
+        batch_size (int): Number of items claimed at once.
+        workers (Optional[int]): Number of threads, by default chosen like ThreadPoolExecutor does.
+
+    Returns:
+        The number of items completed by this call.
+    """
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    processed = 0
+    counter_lock = threading.Lock()
+
+    with QueueWorker(source, name_schema) as worker:
+        def consume() -> None:
+            nonlocal processed
+            while True:
+                items = worker.claim(batch_size)
+                if not items:
+                    if not worker.open_items():
+                        return None
+                    sleep(IDLE_INTERVAL)
+                    continue
+
+                for schema, group in groupby(sorted(items), key=lambda item: item[0]):
+                    entity_ids = [entity_id for _, entity_id in group]
+                    try:
+                        failed = set(process(schema, entity_ids) or [])
+                    except Exception as e:
+                        LOGGER.warning(f'Failed to process {len(entity_ids)} items of "{source}" '
+                                       f'for "{schema}": {e}.')
+                        worker.fail(schema, entity_ids, f'{type(e).__name__}: {e}')
+                        continue
+
+                    if failed:
+                        LOGGER.warning(f'{len(failed)} of {len(entity_ids)} items of "{source}" '
+                                       f'for "{schema}" failed.')
+                        worker.fail(schema, sorted(failed), 'Failed item')
+                    completed = [entity_id for entity_id in entity_ids if entity_id not in failed]
+                    worker.complete(schema, completed)
+                    with counter_lock:
+                        processed += len(completed)
+
+        with ScopedExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(consume) for _ in range(workers)]:
+                future.result()
+
+    return processed
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Dict, Any
+from psycopg2 import extensions
+import threading
+
+from utils.database.connector import connect_to_database
+from utils.metrics import METRICS
+
+# Delay before the first retry of a failed item, doubled with every further failure up to RETRY_MAX_DELAY
+RETRY_BASE_DELAY = timedelta(hours=1)
+RETRY_MAX_DELAY = timedelta(days=2)
+# An item failing this many times is no longer retried, but kept in the store for inspection
+MAX_ATTEMPTS = 8
+
+CREATE_QUERY = """
+    CREATE TABLE IF NOT EXISTS public.dead_letters (
+        source TEXT NOT NULL,
+        name_schema TEXT NOT NULL,
+        item_id TEXT NOT NULL,
+        error_class TEXT NOT NULL,
+        error_message TEXT,
+        attempts INT NOT NULL,
+        first_failed TIMESTAMP WITH TIME ZONE NOT NULL,
+        last_failed TIMESTAMP WITH TIME ZONE NOT NULL,
+        next_attempt TIMESTAMP WITH TIME ZONE NOT NULL,
+        PRIMARY KEY (source, name_schema, item_id)
+    );
+"""
+
+# The store is shared by all hosts, so a failure on a worker host is retried by the DAG host.
+# The scripts record failures from several threads, which share one connection per process
+_LOCK = threading.Lock()
+_CONNECTION: Optional[extensions.connection] = None
+
+
+def _execute(query: str, parameters) -> list:
+    """
+    Runs one statement in its own transaction on the connection of the store, opened on first use
+    (and again after it was lost).
+    """
+    global _CONNECTION
+    with _LOCK:
+        if _CONNECTION is None or _CONNECTION.closed:
+            _CONNECTION = connect_to_database()
+            with _CONNECTION.cursor() as cursor:
+                cursor.execute(CREATE_QUERY)
+            _CONNECTION.commit()
+        try:
+            with _CONNECTION.cursor() as cursor:
+                cursor.execute(query, parameters)
+                rows = cursor.fetchall() if cursor.description else []
+            _CONNECTION.commit()
+            return rows
+        except Exception:
+            # A lost connection is closed and opened again by the next call
+            if not _CONNECTION.closed:
+                _CONNECTION.rollback()
+            raise
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    Returns the delay before retrying an item that failed 'attempts' times.
+    """
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def record_failure(source: str, name_schema: str, item_id: Any, error_class: str,
+                   error_message: Optional[str] = None, now: Optional[datetime] = None) -> None:
+    """
+    Records a failed fetch in the dead-letter store and schedules its retry with an exponential backoff.
+
+    Args:
+        source (str): The script the item belongs to ('matches', 'stadiums' or 'match_details').
+        name_schema (str): Schema name of the league.
+        item_id (Any): ID of the item within the source (season, team ID or match ID).
+        error_class (str): Class name of the error, e.g. 'ConnectionError'.
+        error_message (Optional[str]): Message of the error.
+    """
+    now = now or _now()
+    # The attempts are counted by the statement itself, so the failures of one item on several hosts
+    # all count. The delay is 'retry_delay' of the new number of attempts
+    _execute("""
+        INSERT INTO public.dead_letters AS letters
+        VALUES (%(source)s, %(name_schema)s, %(item_id)s, %(error_class)s, %(error_message)s, 1,
+                %(now)s, %(now)s, %(now)s::TIMESTAMPTZ + %(base_delay)s)
+        ON CONFLICT (source, name_schema, item_id) DO UPDATE
+        SET error_class = EXCLUDED.error_class, error_message = EXCLUDED.error_message,
+            attempts = letters.attempts + 1, last_failed = EXCLUDED.last_failed,
+            next_attempt = EXCLUDED.last_failed + LEAST(%(base_delay)s * power(2, letters.attempts), %(max_delay)s);
+        """, dict(source=source, name_schema=name_schema, item_id=str(item_id), error_class=error_class,
+                  error_message=error_message, now=now, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY))
+    METRICS.increment('dead_letters_total', source=source, error=error_class)
+
+
+def resolve(source: str, name_schema: str, item_ids: Iterable[Any]) -> int:
+    """
+    Removes successfully fetched items from the dead-letter store.
+
+    Returns:
+        The number of items that were in the store.
+    """
+    item_ids = [str(item_id) for item_id in item_ids]
+    if not item_ids:
+        return 0
+
+    resolved = len(_execute('DELETE FROM public.dead_letters WHERE source = %s AND name_schema = %s '
+                            'AND item_id = ANY(%s) RETURNING item_id;', (source, name_schema, item_ids)))
+    if resolved:
+        METRICS.increment('dead_letters_resolved_total', resolved, source=source)
+    return resolved
+
+
+def due_items(source: str, name_schema: str, now: Optional[datetime] = None) -> List[str]:
+    """
+    Returns the IDs of the failed items whose retry is due and which have attempts left.
+    """
+    rows = _execute('SELECT item_id FROM public.dead_letters WHERE source = %s AND name_schema = %s '
+                    'AND attempts < %s AND next_attempt <= %s ORDER BY next_attempt;',
+                    (source, name_schema, MAX_ATTEMPTS, now or _now()))
+    return [row[0] for row in rows]
+
+
+def has_due_items(name_schema: str, now: Optional[datetime] = None) -> bool:
+    """
+    Checks whether any item of a league is due for a retry, without the abandoned ones.
+    """
+    return bool(_execute('SELECT 1 FROM public.dead_letters WHERE name_schema = %s '
+                         'AND attempts < %s AND next_attempt <= %s LIMIT 1;',
+                         (name_schema, MAX_ATTEMPTS, now or _now())))
+
+
+def pending(name_schema: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Returns all items of the store (of one league if 'name_schema' is given), including the abandoned ones.
+    """
+    columns = ['source', 'name_schema', 'item_id', 'error_class', 'error_message', 'attempts',
+               'first_failed', 'last_failed', 'next_attempt']
+    rows = _execute(f'SELECT {", ".join(columns)} FROM public.dead_letters '
+                    f'WHERE %(name_schema)s::TEXT IS NULL OR name_schema = %(name_schema)s '
+                    f'ORDER BY source, name_schema, next_attempt;', dict(name_schema=name_schema))
+    return [dict(zip(columns, row)) for row in rows]
@@ -1,6 +1,10 @@
-from typing import Optional, Any
+from typing import Optional, Any, Type
+from urllib.parse import urlparse
 from time import sleep
 import requests
+import msgspec
+
+from utils.metrics import METRICS
 
 
 class Fetcher:
@@ -8,6 +12,7 @@ class Fetcher:
     A simple data fetching utility.
 
     This class provides methods to fetch data from a specified URL, supporting both HTML and JSON content types.
+    JSON is decoded into dictionaries, or into a typed struct from 'utils.payloads' if 'struct' is given.
     """
     def __init__(self):
         self.headers = {
@@ -15,15 +20,24 @@ class Fetcher:
                           'Chrome/91.0.4472.124 Safari/537.36'
         }
 
-    def fetch_data(self, url: str, content_type: str = 'html', retries=3, delay=1) -> Optional[Any]:
+    def fetch_data(self, url: str, content_type: str = 'html', retries=3, delay=1,
+                   struct: Optional[Type] = None) -> Optional[Any]:
+        host = urlparse(url).netloc
         attempt = 0
         while attempt < retries:
             try:
-                response = requests.get(url, headers=self.headers)
+                with METRICS.timer('fetch_seconds', host=host):
+                    response = requests.get(url, headers=self.headers)
+                METRICS.increment('fetch_requests_total', host=host, status=response.status_code)
                 response.raise_for_status()
 
                 if content_type == 'json':
-                    return response.json()
+                    with METRICS.timer('decode_seconds', host=host):
+                        if struct is not None:
+                            # Only the fields declared by the struct are decoded, the rest is skipped.
+                            # Lax mode accepts numbers sent as strings (see 'utils.payloads')
+                            return msgspec.json.decode(response.content, type=struct, strict=False)
+                        return response.json()
                 elif content_type == 'html':
                     return response.content
                 else:
@@ -31,9 +45,11 @@ class Fetcher:
 
             except requests.RequestException as e:
                 if isinstance(e, requests.exceptions.ConnectionError) and '104' in str(e):
+                    METRICS.increment('fetch_retries_total', host=host)
                     attempt += 1
                     sleep(delay)
                 else:
+                    METRICS.increment('fetch_errors_total', host=host, error=type(e).__name__)
                     raise e
         
         error_message = f'Failed to complete request after {retries} attempts.'
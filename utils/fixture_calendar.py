@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from psycopg2 import extensions
+
+# A match is considered finished this long after its kickoff (90 minutes, half-time, stoppage and extra time)
+MATCH_DURATION = timedelta(hours=2, minutes=30)
+# A calendar older than this is refreshed by the check of the league before it decides,
+# so that rescheduled fixtures are picked up while the runs of the league are skipped
+CALENDAR_REFRESH_AGE = timedelta(days=1)
+# A calendar older than this (its refresh kept failing) gives the league work anyway,
+# so that new seasons of idle leagues are picked up by a full run
+CALENDAR_MAX_AGE = timedelta(days=7)
+
+# The calendars are shared by the hosts running the DAG, the scripts and the live mode
+CREATE_QUERIES = [
+    """
+    CREATE TABLE IF NOT EXISTS public.fixture_calendars (
+        name_schema TEXT NOT NULL,
+        match_id INT NOT NULL,
+        kickoff TIMESTAMP WITH TIME ZONE NOT NULL,
+        home_id INT NOT NULL,
+        away_id INT NOT NULL,
+        season INT NOT NULL,
+        PRIMARY KEY (name_schema, match_id)
+    );
+    """,
+    # The live mode reads the fixtures of all leagues around the current time
+    """
+    CREATE INDEX IF NOT EXISTS fixture_calendars_kickoff_idx ON public.fixture_calendars (kickoff);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS public.league_runs (
+        name_schema TEXT PRIMARY KEY,
+        calendar_updated TIMESTAMP WITH TIME ZONE,
+        last_success TIMESTAMP WITH TIME ZONE
+    );
+    """
+]
+
+UPSERT_FIXTURE_QUERY = """
+    INSERT INTO public.fixture_calendars (name_schema, match_id, kickoff, home_id, away_id, season)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    ON CONFLICT (name_schema, match_id) DO UPDATE
+    SET kickoff = EXCLUDED.kickoff, home_id = EXCLUDED.home_id, away_id = EXCLUDED.away_id, season = EXCLUDED.season
+    WHERE (fixture_calendars.kickoff, fixture_calendars.home_id, fixture_calendars.away_id, fixture_calendars.season)
+          IS DISTINCT FROM (EXCLUDED.kickoff, EXCLUDED.home_id, EXCLUDED.away_id, EXCLUDED.season);
+"""
+
+# The league has work if a fixture finished (kickoff + MATCH_DURATION) since the start of its last successful run
+HAS_WORK_QUERY = """
+    SELECT runs.last_success IS NULL OR runs.calendar_updated IS NULL OR runs.calendar_updated < %(stale)s
+           OR EXISTS (SELECT 1 FROM public.fixture_calendars AS fixtures
+                      WHERE fixtures.name_schema = runs.name_schema
+                        AND fixtures.kickoff > runs.last_success - %(duration)s
+                        AND fixtures.kickoff <= %(now)s::TIMESTAMPTZ - %(duration)s)
+    FROM (SELECT %(name_schema)s::TEXT AS name_schema) AS league
+    LEFT JOIN public.league_runs AS runs USING (name_schema);
+"""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _parse_time(value: str) -> datetime:
+    # FOTMOB times look like '2024-08-16T19:00:00.000Z'
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def create_calendars(cursor) -> None:
+    """
+    Creates the calendar tables shared by the hosts of all leagues if they do not exist.
+    """
+    for query in CREATE_QUERIES:
+        cursor.execute(query)
+    cursor.connection.commit()
+
+
+def _execute(connection: extensions.connection, query: str, parameters) -> list:
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(query, parameters)
+            rows = cursor.fetchall() if cursor.description else []
+        connection.commit()
+        return rows
+    except Exception:
+        connection.rollback()
+        raise
+
+
+def update_calendar(connection: extensions.connection, name_schema: str, matches: List[dict], season: str) -> None:
+    """
+    Merges the fixtures of a season from the 'allMatches' payload of FOTMOB into the calendar.
+
+    Args:
+        connection (extensions.connection): Database connection object.
+        name_schema (str): Schema name of the league.
+        matches (List[dict]): Matches of the 'allMatches' payload.
+        season (str): The season of the matches.
+    """
+    fixtures, cancelled = [], []
+    for match in matches:
+        kickoff = match.get('status', {}).get('utcTime')
+        if kickoff is None or match.get('status', {}).get('cancelled', False):
+            cancelled.append(match['id'])
+            continue
+        fixtures.append((name_schema, match['id'], _parse_time(kickoff),
+                         match['home']['id'], match['away']['id'], int(season[:4])))
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM public.fixture_calendars WHERE name_schema = %s AND match_id = ANY(%s);',
+                           (name_schema, cancelled))
+            cursor.executemany(UPSERT_FIXTURE_QUERY, fixtures)
+            cursor.execute("""
+                INSERT INTO public.league_runs (name_schema, calendar_updated) VALUES (%s, %s)
+                ON CONFLICT (name_schema) DO UPDATE SET calendar_updated = EXCLUDED.calendar_updated;
+                """, (name_schema, _now()))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+
+def is_stale(connection: extensions.connection, name_schema: str, now: Optional[datetime] = None) -> bool:
+    """
+    Checks whether the calendar of a league is missing or older than CALENDAR_REFRESH_AGE.
+    """
+    now = now or _now()
+    rows = _execute(connection, 'SELECT calendar_updated FROM public.league_runs WHERE name_schema = %s;',
+                    (name_schema,))
+    return not rows or rows[0][0] is None or now - rows[0][0] > CALENDAR_REFRESH_AGE
+
+
+def has_finished_matches(connection: extensions.connection, name_schema: str,
+                         now: Optional[datetime] = None) -> bool:
+    """
+    Checks whether a league has work: a match finished since the start of its last successful run.
+
+    A league without a calendar or a successful run, or with a calendar older
+    than CALENDAR_MAX_AGE, is always considered to have work.
+    """
+    now = now or _now()
+    rows = _execute(connection, HAS_WORK_QUERY, dict(name_schema=name_schema, now=now, duration=MATCH_DURATION,
+                                                     stale=now - CALENDAR_MAX_AGE))
+    return bool(rows[0][0])
+
+
+def fixtures_between(connection: extensions.connection, name_schemas: List[str],
+                     start: datetime, end: datetime) -> List[Tuple[str, int, int, datetime]]:
+    """
+    Returns the fixtures of the given leagues kicking off between 'start' and 'end'
+    as (schema name, match ID, season, kickoff).
+    """
+    return _execute(connection, """
+        SELECT name_schema, match_id, season, kickoff FROM public.fixture_calendars
+        WHERE kickoff BETWEEN %s AND %s AND name_schema = ANY(%s);
+        """, (start, end, name_schemas))
+
+
+def mark_success(connection: extensions.connection, name_schema: str, started: datetime) -> None:
+    """
+    Records the start time of a successful run of the league.
+
+    The start time rather than the end is stored, so a match finishing during the run is processed by the next one.
+    """
+    _execute(connection, """
+        INSERT INTO public.league_runs (name_schema, last_success) VALUES (%s, %s)
+        ON CONFLICT (name_schema) DO UPDATE SET last_success = EXCLUDED.last_success;
+        """, (name_schema, started))
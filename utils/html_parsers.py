@@ -0,0 +1,164 @@
+from typing import Optional, Tuple, Union, List
+from datetime import date, datetime
+from bs4 import BeautifulSoup
+import re
+
+# Pure parsing functions of the HTML sources, executed in the worker processes of 'utils.parse_pool'.
+# They receive the raw HTML and return compact tuples, and neither log nor touch the database:
+# the module is imported by every worker, so it must stay free of loggers and connections.
+
+Number = Union[int, float]
+
+
+def extract_num(text: str) -> Optional[int]:
+    """
+    Helper function to extract a number from the text.
+
+    Args:
+        text (str): Text from which to extract the number.
+
+    Returns:
+        Optional[int]: Extracted number (if possible), otherwise None.
+    """
+    try:
+        return int(''.join(filter(lambda x: x.isdigit(), text)))
+    except ValueError:
+        return None
+
+
+def _skysports_stadium(info_block) -> Optional[str]:
+    stadium_element = info_block.find('span', class_='sdc-site-match-header__detail-venue--with-seperator')
+    if stadium_element:
+        return stadium_element.text.strip()
+
+    stadium_element = info_block.find('span', class_='sdc-site-match-header__detail-venue')
+    if stadium_element:
+        # The last character is not considered because the page
+        # element's code for the stadium name includes a period (".") at the end
+        # Example 'Stade Bollaert-Delelis.'
+        return stadium_element.text.strip()[:-1]
+
+    return None
+
+
+def _skysports_values(block_events) -> Tuple[Number, ...]:
+    values = []
+    for event in block_events:
+        value_event = event.find(class_='sdc-site-match-stats__val').text.strip()
+        try:
+            values.append(int(value_event))
+        except ValueError:
+            values.append(float(value_event))
+    return tuple(values)
+
+
+def parse_skysports_statistics(html_content: bytes) -> Tuple[Optional[str], Optional[int],
+                                                             Tuple[Number, ...], Tuple[Number, ...]]:
+    """
+    Parses a SkySports match page.
+
+    Args:
+        html_content (bytes): HTML of the page.
+
+    Returns:
+        The stadium and the attendance (None if absent on the page), followed by
+        the statistics values of the home and of the away team.
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    info_block = soup.find(class_='sdc-site-match-header__detail')
+    attendance_element = info_block.find('span', class_='sdc-site-match-header__detail-attendance')
+    attendance = extract_num(attendance_element.text.strip()) if attendance_element else None
+
+    table_statistics = soup.find(class_='sdc-site-match-stats__inner')
+    return (
+        _skysports_stadium(info_block),
+        attendance,
+        _skysports_values(table_statistics.find_all(class_='sdc-site-match-stats__stats-home')),
+        _skysports_values(table_statistics.find_all(class_='sdc-site-match-stats__stats-away'))
+    )
+
+
+def parse_transfermarkt_attendance(html_content: bytes) -> Optional[int]:
+    """
+    Parses the attendance from a Transfermarkt match page, None if it is absent.
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+    attendance_block = soup.find('p', class_='sb-zusatzinfos')
+    if attendance_block is None or attendance_block.find('strong') is None:
+        return None
+    return extract_num(attendance_block.find('strong').text.strip())
+
+
+def _transfermarkt_date(text: str) -> Optional[date]:
+    # Dates of transfermarkt.com look like 'Jun 10, 1998', on the squad page followed by the age '(26)'
+    match = re.search(r'[A-Z][a-z]{2} \d{1,2}, \d{4}', text)
+    return datetime.strptime(match.group(), '%b %d, %Y').date() if match else None
+
+
+def parse_transfermarkt_clubs(html_content: bytes) -> List[Tuple[str, int]]:
+    """
+    Parses the clubs of a Transfermarkt competition page.
+
+    Returns:
+        The (slug, club ID) pairs of the clubs, in the order of the table.
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+    clubs = []
+    for link in soup.select('table.items td.hauptlink a[href*="/startseite/verein/"]'):
+        match = re.match(r'/([^/]+)/startseite/verein/(\d+)', link.get('href', ''))
+        if match and (match.group(1), int(match.group(2))) not in clubs:
+            clubs.append((match.group(1), int(match.group(2))))
+    return clubs
+
+
+def parse_transfermarkt_squad(html_content: bytes) -> List[Tuple[int, str, Optional[date], Optional[str],
+                                                                 Optional[float], Optional[str], Optional[date]]]:
+    """
+    Parses the detailed squad page ('/kader/verein/<id>/saison_id/<season>/plus/1') of a Transfermarkt club.
+
+    Returns:
+        A tuple per player: ID, name, date of birth, nationality, height in meters, foot
+        and the date the player joined the club.
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+    players = []
+    for row in soup.select('table.items > tbody > tr'):
+        link = row.select_one('td.hauptlink a[href*="/profil/spieler/"]')
+        if link is None:
+            continue
+        player_id = int(re.search(r'/profil/spieler/(\d+)', link['href']).group(1))
+
+        # Centered columns: number, date of birth (age), nationality, height, foot, joined, signed from, contract
+        cells = row.find_all('td', class_='zentriert', recursive=False)
+        texts = [cell.text.strip() for cell in cells]
+        nationality = cells[2].find('img') if len(cells) > 2 else None
+        height = re.match(r'(\d),(\d{2})', texts[3]) if len(texts) > 3 else None
+
+        players.append((
+            player_id,
+            link.text.strip(),
+            _transfermarkt_date(texts[1]) if len(texts) > 1 else None,
+            nationality.get('title') if nationality else None,
+            float(f'{height.group(1)}.{height.group(2)}') if height else None,
+            texts[4] if len(texts) > 4 and texts[4] not in ('', '-') else None,
+            _transfermarkt_date(texts[5]) if len(texts) > 5 else None
+        ))
+    return players
+
+
+def parse_futgg_last_page(html_content: str) -> int:
+    """
+    Parses the number of the last page from the pagination of a fut.gg players page.
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+    last_page_href = soup.find('div', class_='pagination__control pagination__control--next').find('a').get('href')
+    return int(last_page_href.split('=')[1])
+
+
+def count_futgg_cards(html_content: str) -> int:
+    """
+    Counts the cards on a fut.gg players page.
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+    return len(soup.find_all('div', class_='-my-1'))
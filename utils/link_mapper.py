@@ -1,28 +1,76 @@
-from utils.constants import LINK_MAPPER_FILE_LOG
-from utils.logger import configure_logger
+from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
 
-# Define constants for logging and directory structure
-LOGGER = configure_logger(__name__, LINK_MAPPER_FILE_LOG)
+# The module is imported by the DAG file on every scheduler parse, so it must stay free of
+# heavy imports and side effects at import time (such as creating log files)
+from utils.constants import HASHMAP_LEAGUE_IDS, LEAGUE_PRIORITIES, DEFAULT_LEAGUE_WEIGHT, LEAGUE_WEIGHTS
 
+# Special character replacements, compiled once into a translation table.
+# Spaces are replaced here as well, since lowercasing never produces or removes them
+SPECIAL_REPLACEMENTS = str.maketrans({
+    'ú': 'u', '-': '_', "'": '', '’': '', 'Ö': 'o', 'ß': 'ss', 'ü': 'u',
+    'Č': 'c', 'á': 'a', 'Ž': 'z', '.': '', ' ': '_'
+})
+FIRST_LETTER = {'1': 'first_', '3': 'third_'}
+# Characters removed by the translation table. The first letter is the first
+# character that is not removed, e.g. "'1" is still formatted as 'first_'
+REMOVED_CHARACTERS = "'’."
 
+
+@lru_cache(maxsize=None)
 def format_string(team_name: str) -> str:
     """
     Formats the team name string according to the specified template.
     """
-    # Handle special character replacements
-    special_replacements = {'ú': 'u', '-': '_', "'": '', '’': '', 'Ö': 'o', 'ß': 'ss', 'ü': 'u', 'Č': 'c', 'á': 'a', 'Ž': 'z', '.': ''}
-    first_letter = {'1': 'first_', '3': 'third_'}
+    remainder = team_name.lstrip(REMOVED_CHARACTERS)
+
+    if remainder and remainder[0] in FIRST_LETTER:
+        formatted_string = FIRST_LETTER[remainder[0]] + remainder[1:].translate(SPECIAL_REPLACEMENTS)
+    else:
+        formatted_string = remainder.translate(SPECIAL_REPLACEMENTS)
+
+    return formatted_string.lower()
 
-    formatted_string = ''
-    for letter in team_name:
-        if formatted_string == '' and letter in first_letter:
-            formatted_string += first_letter[letter]
-        elif letter in special_replacements:
-            formatted_string += special_replacements[letter]
-        else:
-            formatted_string += letter
 
-    # Convert to lowercase and replace spaces with hyphens
-    formatted_string = formatted_string.lower().replace(' ', '_')
+@lru_cache(maxsize=None)
+def league_schemas() -> Dict[str, str]:
+    """
+    Returns the schema name of every league from HASHMAP_LEAGUE_IDS, keyed by the league name.
+    """
+    return {league: format_string(league) for league in HASHMAP_LEAGUE_IDS}
+
 
-    return formatted_string
+@lru_cache(maxsize=None)
+def schema_leagues() -> Dict[str, str]:
+    """
+    Returns the reverse index of 'league_schemas': league names keyed by their schema name.
+    """
+    return {name_schema: league for league, name_schema in league_schemas().items()}
+
+
+def schema_to_league(name_schema: str) -> Optional[str]:
+    """
+    Returns the league name for a schema name, or None if the schema does not belong to any league.
+    """
+    return schema_leagues().get(name_schema)
+
+
+@lru_cache(maxsize=None)
+def league_manifest() -> List[Tuple[str, str]]:
+    """
+    Returns the (league, schema name) pairs of the leagues that have data in the FOTMOB source.
+
+    Leagues without a FOTMOB ID are skipped, since every script would finish without any work for them.
+    """
+    return [(league, league_schemas()[league])
+            for league, ids in HASHMAP_LEAGUE_IDS.items() if ids[0] is not None]
+
+
+def league_weight(league: str) -> float:
+    """
+    Returns the scheduling weight of a league: from LEAGUE_WEIGHTS if it is configured,
+    otherwise from the priority table LEAGUE_PRIORITIES.
+    """
+    if league in LEAGUE_WEIGHTS:
+        return float(LEAGUE_WEIGHTS[league])
+    return float(LEAGUE_PRIORITIES.get(league, DEFAULT_LEAGUE_WEIGHT))
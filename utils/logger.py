@@ -1,36 +1,113 @@
-from utils.constants import PROJECT_DIRECTORY, LOG_CATALOG
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler, TimedRotatingFileHandler
+from typing import Dict, Tuple, Optional
+from queue import SimpleQueue
+import threading
 import logging
+import atexit
 import os
 
+from utils.constants import PROJECT_DIRECTORY, LOG_CATALOG, LOG_BACKUP_COUNT
 
-def configure_logger(logger_name: str, file_name: str) -> logging.Logger:
+# One queue and one background writer per log file, shared by all loggers that write to it,
+# with the rotation interval the file was registered with
+LISTENERS: Dict[str, Tuple[QueueHandler, QueueListener, Optional[str]]] = {}
+LISTENERS_LOCK = threading.Lock()
+
+
+def _get_queue_handler(file_path: str, when: Optional[str]) -> QueueHandler:
+    """
+    Returns the queue handler of a log file, starting its background writer on the first call.
+
+    The DAG tasks, the queue workers and 'run_leagues' append to the same files from many processes,
+    which is safe for appends but not for a rotation done by one of them. So a shared file is only
+    reopened when it was rotated externally (WatchedFileHandler), and a file rotated by time in the
+    process gets the process ID in its name ('matches.1234.log'), so no other process writes to it.
+
+    Args:
+        file_path (str): Absolute path of the log file.
+        when (Optional[str]): Interval of the time-based rotation (e.g. 'midnight'),
+            if None the file is shared and rotated externally.
+
+    Returns:
+        logging.handlers.QueueHandler: Handler that only puts records into the queue of the file.
+
+    Raises:
+        ValueError: The file was already registered with another rotation interval.
+    """
+    with LISTENERS_LOCK:
+        if file_path in LISTENERS:
+            registered_when = LISTENERS[file_path][2]
+            if registered_when != when:
+                raise ValueError(f'The log file "{os.path.basename(file_path)}" is rotated with '
+                                 f'when={registered_when!r}, it cannot be configured with when={when!r}.')
+        else:
+            # Define log formatter
+            formatter = logging.Formatter(fmt='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
+                                          datefmt='%m/%d/%Y %I:%M:%S %p')
+
+            # The file is opened on the first record, so processes that never log create no files
+            if when is not None:
+                stem, extension = os.path.splitext(file_path)
+                file_handler = TimedRotatingFileHandler(filename=f'{stem}.{os.getpid()}{extension}', when=when,
+                                                        backupCount=LOG_BACKUP_COUNT, delay=True)
+            else:
+                file_handler = WatchedFileHandler(filename=file_path, mode='a', delay=True)
+            file_handler.setFormatter(formatter)
+
+            # The file I/O happens in the listener's thread, the calling thread only enqueues the record
+            queue = SimpleQueue()
+            listener = QueueListener(queue, file_handler, respect_handler_level=True)
+            listener.start()
+
+            LISTENERS[file_path] = (QueueHandler(queue), listener, when)
+
+        return LISTENERS[file_path][0]
+
+
+def stop_listeners() -> None:
+    """
+    Flushes the queued records and stops the background writers of all log files.
+    """
+    with LISTENERS_LOCK:
+        for _, listener, _ in LISTENERS.values():
+            listener.stop()
+        LISTENERS.clear()
+
+
+atexit.register(stop_listeners)
+
+
+def configure_logger(logger_name: str, file_name: str, when: Optional[str] = None) -> logging.Logger:
     """
     Configures and returns a logger with a specified file name.
 
+    Logging does not block on file I/O: records are put into a queue that is written
+    to the file by a background thread. Calling the function again for the same logger
+    and file does not add another handler.
+
     Args:
         logger_name (str): The name of the module from which the log originated.
         file_name (str): The name of the file where logs are recorded for each competition.
+        when (Optional[str]): Interval of the time-based rotation (e.g. 'midnight') of a log file
+            of this process only, by default the file is shared by all processes and rotated externally.
 
     Returns:
         logging.Logger: Configured logger.
-    """
-
-    # Define log formatter
-    formatter = logging.Formatter(fmt='%(asctime)s - %(levelname)s - %(name)s - %(message)s',
-                                  datefmt='%m/%d/%Y %I:%M:%S %p')
 
+    Raises:
+        ValueError: The file was already configured with another rotation interval.
+    """
     logs_directory = os.path.join(PROJECT_DIRECTORY, LOG_CATALOG)
 
     if not os.path.exists(logs_directory):
-        os.makedirs(logs_directory)
+        os.makedirs(logs_directory, exist_ok=True)
 
-    # Create a file handler and set the formatter
-    handler = logging.FileHandler(filename=os.path.join(logs_directory, file_name), mode='a')
-    handler.setFormatter(formatter)
+    handler = _get_queue_handler(os.path.join(logs_directory, file_name), when)
 
     # Create and configure the logger
     logger = logging.getLogger(logger_name)
     logger.setLevel(logging.INFO)
-    logger.addHandler(handler)
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
 
     return logger
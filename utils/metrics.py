@@ -0,0 +1,241 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Tuple, List, Optional, Iterator, Callable, Any
+from contextvars import ContextVar, copy_context
+from contextlib import contextmanager
+from collections import defaultdict
+from time import perf_counter
+from bisect import bisect_left
+import threading
+import json
+import os
+
+from utils.constants import PROJECT_DIRECTORY, LOG_CATALOG, METRICS_CATALOG, METRICS_FORMAT
+
+# Upper bounds (in seconds) of the histogram buckets, the last bucket is '+Inf'
+HISTOGRAM_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    """
+    A cumulative histogram with the fixed HISTOGRAM_BUCKETS.
+
+    Attributes:
+        counts (List[int]): Number of observations per bucket (not cumulative), the last one is '+Inf'.
+        total (float): Sum of all observed values.
+        count (int): Number of observations.
+    """
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(HISTOGRAM_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Timer:
+    """
+    The result of 'Metrics.timer', holds the elapsed time once the block is finished.
+    """
+    __slots__ = ('elapsed',)
+
+    def __init__(self):
+        self.elapsed = 0.0
+
+
+class Metrics:
+    """
+    A thread-safe registry of counters, gauges and histograms shared by the fetcher, the connector and the scripts.
+
+    Every metric is identified by its name and labels, e.g. 'fetch_seconds' with the label 'host'.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[MetricKey, float] = defaultdict(float)
+        self.gauges: Dict[MetricKey, float] = {}
+        self.histograms: Dict[MetricKey, Histogram] = defaultdict(Histogram)
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, object]) -> MetricKey:
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Increases the counter 'name' with the given labels by 'value'.
+        """
+        with self._lock:
+            self.counters[self._key(name, labels)] += value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """
+        Sets the gauge 'name' with the given labels to 'value'.
+        """
+        with self._lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """
+        Records 'value' in the histogram 'name' with the given labels.
+        """
+        with self._lock:
+            self.histograms[self._key(name, labels)].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[Timer]:
+        """
+        Measures the execution time of the block and records it in the histogram 'name'.
+        The time is recorded even if the block raises an exception.
+        """
+        timer = Timer()
+        started = perf_counter()
+        try:
+            yield timer
+        finally:
+            timer.elapsed = perf_counter() - started
+            self.observe(name, timer.elapsed, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    @staticmethod
+    def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(labels) + ([extra] if extra else [])
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{label}="{value}"' for label, value in pairs) + '}'
+
+    def to_prometheus(self) -> str:
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        lines: List[str] = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f'{name}{self._format_labels(labels)} {value}')
+            for (name, labels), value in sorted(self.gauges.items()):
+                lines.append(f'{name}{self._format_labels(labels)} {value}')
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                cumulative = 0
+                for bound, count in zip(HISTOGRAM_BUCKETS + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    bucket = ('le', '+Inf' if bound == float('inf') else str(bound))
+                    lines.append(f'{name}_bucket{self._format_labels(labels, bucket)} {cumulative}')
+                lines.append(f'{name}_sum{self._format_labels(labels)} {histogram.total}')
+                lines.append(f'{name}_count{self._format_labels(labels)} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self) -> Dict[str, List[dict]]:
+        """
+        Returns all metrics as a JSON-serializable dictionary.
+        """
+        with self._lock:
+            return {
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                           for (name, labels), value in sorted(self.gauges.items())],
+                'histograms': [{'name': name, 'labels': dict(labels),
+                                'buckets': dict(zip([str(bound) for bound in HISTOGRAM_BUCKETS] + ['+Inf'],
+                                                    histogram.counts)),
+                                'sum': histogram.total, 'count': histogram.count}
+                               for (name, labels), histogram in sorted(self.histograms.items(),
+                                                                       key=lambda item: item[0])]
+            }
+
+    def export(self, file_name: str) -> str:
+        """
+        Writes all metrics to 'logs/metrics/<file_name>'.
+        Files ending with '.json' are written as JSON, any other in the Prometheus text format.
+
+        Args:
+            file_name (str): Name of the file, e.g. 'matches_premier_league.prom'.
+
+        Returns:
+            str: Absolute path of the written file.
+        """
+        metrics_directory = os.path.join(PROJECT_DIRECTORY, LOG_CATALOG, METRICS_CATALOG)
+        os.makedirs(metrics_directory, exist_ok=True)
+
+        file_path = os.path.join(metrics_directory, file_name)
+        content = json.dumps(self.to_dict(), indent=2) if file_name.endswith('.json') else self.to_prometheus()
+
+        # Write to a temporary file first, so a scraper never reads a half-written file
+        temporary_path = f'{file_path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        os.replace(temporary_path, file_path)
+
+        return file_path
+
+
+# Registry of the job running in the current context, see 'metrics_scope'
+_SCOPE: ContextVar[Optional[Metrics]] = ContextVar('metrics_scope', default=None)
+
+
+class ScopedMetrics:
+    """
+    The registry used by the modules of the project: every call goes to the registry of the job
+    running in the current context (see 'metrics_scope'), outside of a job to the registry of the process.
+    """
+    def __init__(self):
+        self.process = Metrics()
+
+    def current(self) -> Metrics:
+        return _SCOPE.get() or self.process
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.current(), name)
+
+
+@contextmanager
+def metrics_scope() -> Iterator[Metrics]:
+    """
+    Records the metrics of the block (and of the tasks it submits to a ScopedExecutor) in a registry
+    of its own, so the jobs running at once in a process (see 'scripts.run_leagues') export only their metrics.
+    """
+    registry = Metrics()
+    token = _SCOPE.set(registry)
+    try:
+        yield registry
+    finally:
+        _SCOPE.reset(token)
+
+
+class ScopedExecutor(ThreadPoolExecutor):
+    """
+    A ThreadPoolExecutor whose tasks record their metrics in the scope of the thread that submitted them.
+    """
+    def submit(self, function: Callable[..., Any], /, *args, **kwargs) -> Future:
+        return super().submit(copy_context().run, function, *args, **kwargs)
+
+
+METRICS = ScopedMetrics()
+
+
+def export_run_metrics(script_name: str, name_schema: str, rows: int, elapsed: float) -> None:
+    """
+    Records the throughput of a finished run, exports all metrics of the current scope and resets them.
+
+    Args:
+        script_name (str): Name of the script, e.g. 'matches'.
+        name_schema (str): Schema name of the league the run was made for.
+        rows (int): Number of rows written by the run.
+        elapsed (float): Duration of the run in seconds.
+    """
+    METRICS.set('run_seconds', elapsed, script=script_name, league=name_schema)
+    METRICS.set('run_rows', rows, script=script_name, league=name_schema)
+    METRICS.set('run_rows_per_second', rows / elapsed if elapsed > 0 else 0.0,
+                script=script_name, league=name_schema)
+
+    METRICS.export(f'{script_name}_{name_schema}.{METRICS_FORMAT}')
+    METRICS.reset()
@@ -0,0 +1,41 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Any
+import multiprocessing
+
+from utils.constants import PARSE_WORKERS
+from utils.metrics import METRICS
+
+
+class ParsePool:
+    """
+    A pool of worker processes that parses HTML for the whole run.
+
+    The fetching threads of a script hand the raw HTML to 'parse' and wait for the result,
+    which releases the GIL, so the fetches keep running while the parsing is spread
+    over all cores instead of one. The functions must be pure module-level functions
+    (see 'utils.html_parsers'), since they and their results are pickled.
+
+    Args:
+        max_workers (Optional[int]): Number of worker processes, by default PARSE_WORKERS
+            (the number of CPUs if the environment variable is not set).
+    """
+    def __init__(self, max_workers: Optional[int] = PARSE_WORKERS):
+        # 'spawn' instead of 'fork': the workers are started from a process that already runs
+        # threads (the logging listeners and the fetchers), and forking it could copy held locks
+        self.executor = ProcessPoolExecutor(max_workers=max_workers,
+                                            mp_context=multiprocessing.get_context('spawn'))
+
+    def __enter__(self) -> 'ParsePool':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.executor.shutdown()
+
+    def parse(self, function: Callable[..., Any], *args, script: str) -> Any:
+        """
+        Runs a parsing function in a worker process and returns its result.
+
+        Exceptions raised by the function are re-raised in the calling thread.
+        """
+        with METRICS.timer('parse_seconds', script=script):
+            return self.executor.submit(function, *args).result()
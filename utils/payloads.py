@@ -0,0 +1,130 @@
+from typing import Optional, List, Type, TypeVar
+import msgspec
+
+from utils.metrics import METRICS
+
+# Typed views of the FOTMOB payloads, decoded with 'msgspec' (see 'Fetcher.fetch_data').
+# Only the declared fields are decoded, everything else in the payload (statistics, momentum,
+# player data, which make up most of a 'matchDetails' response) is skipped by the parser
+# without creating a single Python object for it.
+#
+# The payloads are decoded in lax mode, so numbers sent as strings are still read. Only the fields
+# needed for the rows of a match are required. The other fields have defaults, and the blocks of
+# 'content' are kept raw and decoded on access, so type drift in one of them costs that block
+# (e.g. the stadium or the lineups) instead of the whole match.
+
+T = TypeVar('T')
+
+
+def decode_block(raw: msgspec.Raw, struct: Type[T]) -> Optional[T]:
+    """
+    Decodes a raw block of a payload, None if it is missing or its types no longer match the struct.
+    """
+    if not len(raw):
+        return None
+    try:
+        return msgspec.json.decode(raw, type=Optional[struct], strict=False)
+    except msgspec.ValidationError:
+        METRICS.increment('payload_drift_total', block=struct.__name__)
+        return None
+
+
+class Reason(msgspec.Struct):
+    long: Optional[str] = None
+    short: Optional[str] = None
+
+
+class LiveTime(msgspec.Struct):
+    short: Optional[str] = None
+
+
+class Status(msgspec.Struct):
+    finished: bool = False
+    started: bool = False
+    cancelled: bool = False
+    utcTime: Optional[str] = None
+    reason: Optional[Reason] = None
+    liveTime: Optional[LiveTime] = None
+
+
+class Team(msgspec.Struct):
+    id: int
+    name: Optional[str] = None
+    score: Optional[int] = None
+
+
+class Header(msgspec.Struct):
+    teams: List[Team]
+    status: Status
+
+
+class General(msgspec.Struct):
+    matchTimeUTCDate: str
+
+
+class Venue(msgspec.Struct):
+    name: Optional[str] = None
+
+
+class InfoBox(msgspec.Struct, rename={'stadium': 'Stadium', 'attendance': 'Attendance'}):
+    stadium: Optional[Venue] = None
+    attendance: Optional[int] = None
+
+
+class MatchFacts(msgspec.Struct):
+    infoBox: Optional[InfoBox] = None
+
+
+class SubstitutionEvent(msgspec.Struct):
+    time: Optional[int] = None
+    type: Optional[str] = None
+
+
+class Performance(msgspec.Struct):
+    rating: Optional[float] = None
+    substitutionEvents: List[SubstitutionEvent] = []
+
+
+# A player without an ID (e.g. a late addition to the squad) is skipped by 'FotmobDetails'
+class LineupPlayer(msgspec.Struct):
+    id: Optional[int] = None
+    name: Optional[str] = None
+    usualPlayingPositionId: Optional[int] = None
+    performance: Optional[Performance] = None
+
+
+class LineupTeam(msgspec.Struct):
+    id: Optional[int] = None
+    formation: Optional[str] = None
+    starters: List[LineupPlayer] = []
+    subs: List[LineupPlayer] = []
+
+
+class Lineup(msgspec.Struct):
+    homeTeam: LineupTeam = msgspec.field(default_factory=LineupTeam)
+    awayTeam: LineupTeam = msgspec.field(default_factory=LineupTeam)
+
+
+class Content(msgspec.Struct):
+    matchFacts: msgspec.Raw = msgspec.Raw()
+    lineup2: msgspec.Raw = msgspec.Raw()
+
+    def match_facts(self) -> Optional[MatchFacts]:
+        return decode_block(self.matchFacts, MatchFacts)
+
+    def lineup(self) -> Optional[Lineup]:
+        return decode_block(self.lineup2, Lineup)
+
+
+class MatchDetails(msgspec.Struct):
+    """
+    The fields of a 'matchDetails' response read by 'FotmobDetails' and the live mode.
+
+    A match without data is returned as {"error": true, "message": "Data not found", "matchId": ...},
+    so every block is optional. A match with data needs 'general' and 'header', the blocks of 'content'
+    are optional for its rows.
+    """
+    error: bool = False
+    general: Optional[General] = None
+    header: Optional[Header] = None
+    content: Optional[Content] = None
@@ -0,0 +1,140 @@
+from typing import Optional, List, Iterator, Dict
+from contextlib import contextmanager
+from collections import Counter
+from datetime import datetime
+import threading
+import cProfile
+import pstats
+import sys
+import os
+
+from utils.constants import PROJECT_DIRECTORY, LOG_CATALOG, PROFILES_CATALOG, PROFILE_RUNS, PROFILER_FILE_LOG
+from utils.logger import configure_logger
+
+LOGGER = configure_logger(__name__, PROFILER_FILE_LOG)
+
+# Interval between two wall-clock samples of all thread stacks, in seconds
+SAMPLING_INTERVAL = 0.005
+# Held by the running 'profile_run': the profilers hook every thread of the process
+# ('threading.setprofile') and the sampler sees all of them, so only one block is profiled at a time
+_PROFILE_LOCK = threading.Lock()
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the stacks of all threads at a fixed wall-clock interval.
+
+    Unlike cProfile, waiting (on the network, the database or a lock) is sampled as well,
+    so the result shows where the run spends its time rather than its CPU.
+    The samples are kept in the "folded" format of flame graphs: one line per unique
+    stack, frames separated by ';', followed by the number of samples.
+    """
+    def __init__(self, interval: float = SAMPLING_INTERVAL):
+        super().__init__(name='stack-sampler', daemon=True)
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            thread_names: Dict[int, str] = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+
+                stack: List[str] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                    frame = frame.f_back
+
+                stack.append(thread_names.get(thread_id, str(thread_id)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+    def dump(self, file_path: str) -> None:
+        with open(file_path, 'w', encoding='utf-8') as file:
+            for stack, count in self.samples.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+@contextmanager
+def profile_run(script_name: str, name_schema: str,
+                enabled: Optional[bool] = None, run_id: Optional[str] = None) -> Iterator[None]:
+    """
+    Profiles the block if profiling is enabled, otherwise does nothing.
+
+    Profiling is single-job only: it hooks every thread started in the process during the block
+    and samples all of them, so a nested block, or one entered while another job of the process is
+    profiled (e.g. the concurrent leagues of 'run_leagues'), is refused with a warning and runs unprofiled.
+
+    Writes two files to 'logs/profiles', tagged with the script, the league and the run id:
+    '<tag>.pstats' (cProfile of the calling thread and of every thread started inside the block,
+    readable with 'pstats' or snakeviz) and '<tag>.folded' (sampled wall-clock stacks of all threads,
+    readable with flamegraph.pl or speedscope).
+
+    Args:
+        script_name (str): Name of the script, e.g. 'matches'.
+        name_schema (str): Schema name of the league.
+        enabled (Optional[bool]): Profiling switch, by default taken from the PROFILE environment variable.
+        run_id (Optional[str]): Identifier of the run, by default the start time and the process ID.
+    """
+    if enabled is None:
+        enabled = PROFILE_RUNS
+    if not enabled:
+        yield
+        return
+    if not _PROFILE_LOCK.acquire(blocking=False):
+        LOGGER.warning(f'The run of "{script_name}" for "{name_schema}" is not profiled: '
+                       f'another run of the process is already profiled.')
+        yield
+        return
+
+    try:
+        with _profile(script_name, name_schema, run_id):
+            yield
+    finally:
+        _PROFILE_LOCK.release()
+
+
+@contextmanager
+def _profile(script_name: str, name_schema: str, run_id: Optional[str]) -> Iterator[None]:
+    """
+    Profiles the block into the files of 'profile_run', the caller holds '_PROFILE_LOCK'.
+    """
+    run_id = run_id or f'{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}'
+    profiles_directory = os.path.join(PROJECT_DIRECTORY, LOG_CATALOG, PROFILES_CATALOG)
+    os.makedirs(profiles_directory, exist_ok=True)
+    file_path = os.path.join(profiles_directory, f'{script_name}_{name_schema}_{run_id}')
+
+    # cProfile only sees the thread that enabled it, so every thread started
+    # inside the block (e.g. by a ThreadPoolExecutor) gets a profiler of its own
+    thread_profilers: List[cProfile.Profile] = []
+
+    def start_thread_profiler(*args) -> None:
+        sys.setprofile(None)
+        thread_profiler = cProfile.Profile()
+        thread_profilers.append(thread_profiler)
+        thread_profiler.enable()
+
+    sampler = StackSampler()
+    profiler = cProfile.Profile()
+
+    sampler.start()
+    threading.setprofile(start_thread_profiler)
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        threading.setprofile(None)
+        sampler.stop()
+
+        statistics = pstats.Stats(profiler)
+        for thread_profiler in thread_profilers:
+            statistics.add(thread_profiler)
+        statistics.dump_stats(f'{file_path}.pstats')
+        sampler.dump(f'{file_path}.folded')
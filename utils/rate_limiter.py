@@ -0,0 +1,49 @@
+from time import monotonic, sleep
+import threading
+
+from utils.metrics import METRICS
+
+
+class RateLimiter:
+    """
+    A thread-safe token bucket limiting the rate of requests to a source.
+
+    Up to 'burst' requests are let through at once, after that one request
+    every 1 / 'rate' seconds. Every caller reserves its token under the lock
+    and sleeps outside of it, so waiting threads do not block each other.
+
+    Args:
+        rate (float): Sustained number of requests per second.
+        burst (int): Number of requests allowed without waiting.
+        name (str): Name of the limited source, used as the label of the metrics.
+    """
+    def __init__(self, rate: float, burst: int = 1, name: str = 'default'):
+        if rate <= 0:
+            raise ValueError(f'The rate must be positive, got {rate}.')
+
+        self.rate = rate
+        self.burst = burst
+        self.name = name
+        self._tokens = float(burst)
+        self._updated = monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Blocks until a request is allowed.
+
+        Returns:
+            Number of seconds the caller has waited.
+        """
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # The token is taken even if the bucket is empty: a negative balance is the queue of waiting callers
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait:
+            sleep(wait)
+        METRICS.observe('rate_limit_wait_seconds', wait, limiter=self.name)
+        return wait
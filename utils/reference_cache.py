@@ -0,0 +1,208 @@
+from typing import Optional, List, Tuple, Callable
+from psycopg2 import extensions
+import hashlib
+import struct
+import mmap
+import os
+
+from utils.constants import PROJECT_DIRECTORY, RESOURCE_CATALOG, REFERENCE_CACHE_CATALOG, HASHMAP_LEAGUE_IDS
+from utils.database.connector import get_watermarks
+from utils.link_mapper import league_schemas
+from utils.metrics import METRICS
+
+# File layout: header, sorted fixed-size records of the three sections, then the UTF-8 strings
+# the records point to (absolute offset and length). Every lookup is a binary search over the
+# records of the memory-mapped file, so the file is shared by all processes through the page cache.
+MAGIC = b'REFC'
+VERSION = 1
+HEADER = struct.Struct('<4sH32sIII')  # magic, version, fingerprint, teams, stadiums, leagues
+TEAM_RECORD = struct.Struct('<iIH')  # team_id, title offset, title length
+STADIUM_RECORD = struct.Struct('<IH')  # name offset, name length
+LEAGUE_RECORD = struct.Struct('<IHIH')  # league offset, league length, schema offset, schema length
+
+
+def cache_path(name_schema: str) -> str:
+    return os.path.join(PROJECT_DIRECTORY, RESOURCE_CATALOG, REFERENCE_CACHE_CATALOG, f'{name_schema}.bin')
+
+
+def _bisect(count: int, key_at: Callable[[int], object], target: object) -> Optional[int]:
+    """
+    Returns the index of the record with the target key among 'count' sorted records, or None.
+    """
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if key_at(middle) < target:
+            low = middle + 1
+        else:
+            high = middle
+    return low if low < count and key_at(low) == target else None
+
+
+def fingerprint(connection: extensions.connection, name_schema: str) -> bytes:
+    """
+    Returns a digest of the version of the source tables of the cache: their ingestion watermarks
+    (see 'utils.database.connector.get_watermarks'). Every write that changes rows of a table sets its
+    watermark to the ID of its transaction, so a changed table never reproduces an old fingerprint,
+    while the rows written again unchanged ('DO NOTHING' or an upsert without distinct values) leave it
+    as it is. Only the watermarks are read, the tables themselves are not scanned.
+    """
+    watermarks = get_watermarks(connection, name_schema)
+    teams_version, stadiums_version = watermarks.get('teams', 0), watermarks.get('stadiums', 0)
+
+    digest = hashlib.sha256(f'{VERSION}:{teams_version}:{stadiums_version}'.encode())
+    digest.update(repr(sorted(HASHMAP_LEAGUE_IDS.items())).encode())
+    return digest.digest()
+
+
+def build(file_path: str, digest: bytes, teams: List[Tuple[int, str]],
+          stadiums: List[str], leagues: List[Tuple[str, str]]) -> None:
+    """
+    Writes the cache file, replacing an existing one atomically
+    (processes that attached to the old file keep reading it until they close it).
+    """
+    teams = sorted(teams)
+    stadium_names = sorted(stadium.encode() for stadium in stadiums)
+    leagues = sorted((league.encode(), schema.encode()) for league, schema in leagues)
+
+    strings = bytearray()
+    strings_offset = (HEADER.size + len(teams) * TEAM_RECORD.size +
+                      len(stadium_names) * STADIUM_RECORD.size + len(leagues) * LEAGUE_RECORD.size)
+
+    def add_string(value: bytes) -> Tuple[int, int]:
+        offset = strings_offset + len(strings)
+        strings.extend(value)
+        return offset, len(value)
+
+    records = bytearray(HEADER.pack(MAGIC, VERSION, digest, len(teams), len(stadium_names), len(leagues)))
+    for team_id, title in teams:
+        records.extend(TEAM_RECORD.pack(team_id, *add_string(title.encode())))
+    for stadium in stadium_names:
+        records.extend(STADIUM_RECORD.pack(*add_string(stadium)))
+    for league, schema in leagues:
+        records.extend(LEAGUE_RECORD.pack(*add_string(league), *add_string(schema)))
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    temporary_path = f'{file_path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(records)
+        file.write(strings)
+    os.replace(temporary_path, file_path)
+
+
+class ReferenceCache:
+    """
+    Read-only view of a reference cache file: team ID -> title, stadium names and league -> schema.
+
+    The file is memory-mapped, so every process of a run attached to it reads the same
+    physical pages and decodes only the values it looks up.
+
+    Args:
+        file_path (str): Path of the cache file.
+    """
+    def __init__(self, file_path: str):
+        # An empty file cannot be mapped and raises ValueError as well
+        with open(file_path, 'rb') as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, self.fingerprint, self.total_teams, self.total_stadiums, self.total_leagues = \
+                HEADER.unpack_from(self._buffer, 0)
+        except struct.error:
+            magic, version = None, None
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'The file "{file_path}" is not a reference cache of version {VERSION}.')
+
+        self._teams_offset = HEADER.size
+        self._stadiums_offset = self._teams_offset + self.total_teams * TEAM_RECORD.size
+        self._leagues_offset = self._stadiums_offset + self.total_stadiums * STADIUM_RECORD.size
+        # A truncated file (e.g. a disk filled up while it was copied) would fail or return cut strings
+        # on a later lookup. The strings are written in the order of the records, the last one ends the file
+        records_end = self._leagues_offset + self.total_leagues * LEAGUE_RECORD.size
+        if len(self._buffer) < records_end or len(self._buffer) < self._strings_end():
+            self.close()
+            raise ValueError(f'The reference cache "{file_path}" is truncated.')
+
+    def __enter__(self) -> 'ReferenceCache':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._buffer.close()
+
+    def _strings_end(self) -> int:
+        if self.total_leagues:
+            return sum(self._league(self.total_leagues - 1)[2:])
+        if self.total_stadiums:
+            return sum(STADIUM_RECORD.unpack_from(self._buffer, self._leagues_offset - STADIUM_RECORD.size))
+        if self.total_teams:
+            return sum(self._team(self.total_teams - 1)[1:])
+        return HEADER.size
+
+    def _string(self, offset: int, length: int) -> bytes:
+        return self._buffer[offset:offset + length]
+
+    def _team(self, index: int) -> Tuple[int, int, int]:
+        return TEAM_RECORD.unpack_from(self._buffer, self._teams_offset + index * TEAM_RECORD.size)
+
+    def _stadium(self, index: int) -> bytes:
+        return self._string(*STADIUM_RECORD.unpack_from(self._buffer,
+                                                        self._stadiums_offset + index * STADIUM_RECORD.size))
+
+    def _league(self, index: int) -> Tuple[int, int, int, int]:
+        return LEAGUE_RECORD.unpack_from(self._buffer, self._leagues_offset + index * LEAGUE_RECORD.size)
+
+    def team_ids(self) -> List[int]:
+        return [self._team(index)[0] for index in range(self.total_teams)]
+
+    def team_title(self, team_id: int) -> Optional[str]:
+        index = _bisect(self.total_teams, lambda i: self._team(i)[0], team_id)
+        return None if index is None else self._string(*self._team(index)[1:]).decode()
+
+    def has_stadium(self, stadium: str) -> bool:
+        return _bisect(self.total_stadiums, self._stadium, stadium.encode()) is not None
+
+    def stadiums(self) -> List[str]:
+        return [self._stadium(index).decode() for index in range(self.total_stadiums)]
+
+    def schema(self, league: str) -> Optional[str]:
+        index = _bisect(self.total_leagues, lambda i: self._string(*self._league(i)[:2]), league.encode())
+        return None if index is None else self._string(*self._league(index)[2:]).decode()
+
+
+def attach(connection: extensions.connection, name_schema: str) -> ReferenceCache:
+    """
+    Attaches to the reference cache of a league, building it first if it is missing
+    or if its source tables have changed since it was built.
+
+    Args:
+        connection (extensions.connection): Database connection object.
+        name_schema (str): Schema name of the league.
+    """
+    file_path = cache_path(name_schema)
+    digest = fingerprint(connection, name_schema)
+
+    if os.path.exists(file_path):
+        try:
+            cache = ReferenceCache(file_path)
+            if cache.fingerprint == digest:
+                METRICS.increment('cache_hits_total', cache='reference')
+                return cache
+            cache.close()
+        except ValueError:
+            pass
+
+    METRICS.increment('cache_misses_total', cache='reference')
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT team_id, title FROM {name_schema}.teams;')
+        teams = cursor.fetchall()
+        cursor.execute(f'SELECT stadium FROM {name_schema}.stadiums;')
+        stadiums = [row[0] for row in cursor.fetchall()]
+
+    # The fingerprint was taken before the tables were read: if they changed in between,
+    # the next run sees a different fingerprint and rebuilds the file, it is never stale
+    build(file_path, digest, teams, stadiums, list(league_schemas().items()))
+    return ReferenceCache(file_path)
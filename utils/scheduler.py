@@ -0,0 +1,115 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any
+from time import monotonic
+import threading
+import heapq
+
+from utils.metrics import METRICS
+
+
+class Job:
+    """
+    A unit of work of the scheduler, e.g. the whole run of one league.
+
+    Attributes:
+        deadline (float): Seconds after the start of the run by which the job should be finished.
+        started (Optional[float]): Seconds after the start of the run at which the job was started.
+        finished (Optional[float]): Seconds after the start of the run at which the job was finished.
+        error (Optional[BaseException]): The exception raised by the job, if any.
+    """
+    __slots__ = ('name', 'host', 'weight', 'function', 'deadline', 'started', 'finished', 'result', 'error')
+
+    def __init__(self, name: str, host: str, weight: float, function: Callable[[], Any], deadline: float):
+        self.name = name
+        self.host = host
+        self.weight = weight
+        self.function = function
+        self.deadline = deadline
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def lateness(self) -> float:
+        return max(0.0, (self.finished or 0.0) - self.deadline)
+
+
+class FairShareScheduler:
+    """
+    Runs jobs in the order of their deadlines within a number of slots per source host.
+
+    The deadline of a job is 'deadline_seconds' / weight after the start of the run, so a league of weight 8
+    is due within an eighth of the time of a league of weight 1, and the heavier jobs are started first.
+    Every host has its own slots: the jobs of one source (e.g. the fut.gg crawl) never take the slots
+    of another, and the jobs of a host share its slots in the order of their deadlines, so the light jobs
+    fill the capacity left by the heavy ones.
+
+    Args:
+        host_slots (Dict[str, int]): Number of jobs running at once per host.
+        deadline_seconds (float): Deadline of a job of weight 1 in seconds after the start of the run.
+    """
+    def __init__(self, host_slots: Dict[str, int], deadline_seconds: float):
+        self.host_slots = host_slots
+        self.deadline_seconds = deadline_seconds
+        self.jobs: List[Job] = []
+
+        self._ready: Dict[str, List[tuple]] = {host: [] for host in host_slots}
+        self._running: Dict[str, int] = {host: 0 for host in host_slots}
+        self._condition = threading.Condition()
+        self._started_at = 0.0
+
+    def submit(self, name: str, host: str, weight: float, function: Callable[[], Any]) -> Job:
+        if self.host_slots.get(host, 0) < 1:
+            raise ValueError(f'The host "{host}" has no slots, expected one of {list(self.host_slots)}.')
+        if weight <= 0:
+            raise ValueError(f'The weight must be positive, got {weight} for "{name}".')
+
+        job = Job(name, host, weight, function, self.deadline_seconds / weight)
+        # Jobs of equal deadlines run in the order they were submitted
+        heapq.heappush(self._ready[host], (job.deadline, len(self.jobs), job))
+        self.jobs.append(job)
+        return job
+
+    def _next_job(self) -> Optional[Job]:
+        """
+        Returns the job with the earliest deadline among the hosts with a free slot.
+        """
+        candidates = [(ready[0], host) for host, ready in self._ready.items()
+                      if ready and self._running[host] < self.host_slots[host]]
+        if not candidates:
+            return None
+
+        _, host = min(candidates)
+        self._running[host] += 1
+        return heapq.heappop(self._ready[host])[2]
+
+    def _execute(self, job: Job) -> None:
+        job.started = monotonic() - self._started_at
+        METRICS.observe('scheduler_queue_seconds', job.started, host=job.host)
+        try:
+            job.result = job.function()
+        except Exception as e:
+            job.error = e
+        finally:
+            job.finished = monotonic() - self._started_at
+            METRICS.observe('scheduler_lateness_seconds', job.lateness, host=job.host)
+            with self._condition:
+                self._running[job.host] -= 1
+                self._condition.notify()
+
+    def run(self) -> List[Job]:
+        """
+        Runs all submitted jobs and returns them with their timings, results and errors.
+        """
+        self._started_at = monotonic()
+        with ThreadPoolExecutor(max_workers=sum(self.host_slots.values())) as executor:
+            with self._condition:
+                while any(self._ready.values()) or any(self._running.values()):
+                    job = self._next_job()
+                    if job is None:
+                        self._condition.wait()
+                        continue
+                    executor.submit(self._execute, job)
+
+        return self.jobs